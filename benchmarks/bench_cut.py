@@ -0,0 +1,37 @@
+"""Times every clip cut mode on a generated test video.
+
+python -m benchmarks.bench_cut --duration 300 --clip 30
+"""
+
+import argparse
+import os
+import tempfile
+
+from benchmarks.fixtures import make_video
+from media.cut import CUT_MODES, cut_clip, stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=int, default=300)
+    parser.add_argument("--clip", type=int, default=30)
+    parser.add_argument("--size", default="1280x720")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "source.mp4")
+        make_video(src, args.duration, args.size, gop=60)
+
+        start = args.duration // 2 + 0.5
+        # MoviePy first so the other modes can report the time they saved
+        for mode in sorted(CUT_MODES, key=lambda mode: mode != "moviepy"):
+            result = cut_clip(
+                src, os.path.join(tmp, f"{mode}.mp4"), start, start + args.clip, mode
+            )
+            print(
+                f"{mode:>8}: {result.elapsed:.2f}s ({stats.rate(mode):.3f}s per clip second)"
+            )
+
+
+if __name__ == "__main__":
+    main()
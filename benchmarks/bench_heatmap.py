@@ -0,0 +1,61 @@
+"""Times heat map parsing and window selection on synthetic heat maps.
+
+python -m benchmarks.bench_heatmap --count 5000
+"""
+
+import argparse
+import re
+import time
+
+import numpy as np
+
+from benchmarks.fixtures import synthetic_path
+from engagement.heatmap import engagement_per_second, top_windows
+
+
+def legacy(path: str, duration: int, threshold: int = 40):
+    """The per-segment loop `_get_video_engagement` used to run."""
+    bezier_pattern = re.compile(
+        r"C (\d+\.?\d*),(\d+\.?\d*) (\d+\.?\d*),(\d+\.?\d*) (\d+\.?\d*),(\d+\.?\d*)"
+    )
+    engagement = []
+    for segment in bezier_pattern.findall(path):
+        x1, y1, x2, y2, x3, y3 = [float(num) for num in segment]
+        ys = [int(100 - y1), int(100 - y2), int(100 - y3)]
+        if max(ys) > threshold:
+            seconds = int(max([x1, x2, x3]) * duration / 1000)
+            engagement.append((seconds, int(seconds / 60), max(ys)))
+    return engagement
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--length", type=int, default=30)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    paths = [synthetic_path(rng) for _ in range(args.count)]
+    durations = rng.integers(120, 3 * 3600, size=args.count)
+
+    start = time.perf_counter()
+    for path, duration in zip(paths, durations):
+        legacy(path, int(duration))
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for path, duration in zip(paths, durations):
+        curve = engagement_per_second(path, int(duration))
+        top_windows(curve, args.length, args.k, threshold=40)
+    engine_time = time.perf_counter() - start
+
+    print(f"{args.count} heat maps, {args.k} windows of {args.length}s each")
+    print(f"legacy loop (no window selection): {legacy_time:.3f}s")
+    print(f"numpy engine (parse + sample + top-k): {engine_time:.3f}s")
+    print(f"per heat map: {engine_time / args.count * 1000:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
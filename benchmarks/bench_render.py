@@ -0,0 +1,55 @@
+"""Compares wall and CPU time of the MoviePy and ffmpeg short renderers.
+
+python -m benchmarks.bench_render --duration 30
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.fixtures import make_srt, make_video
+from render import ffmpeg_renderer, moviepy_renderer
+
+RENDERERS = {"moviepy": moviepy_renderer, "ffmpeg": ffmpeg_renderer}
+
+
+def measure(fn, *args):
+    before = os.times()
+    start = time.perf_counter()
+    fn(*args)
+    wall = time.perf_counter() - start
+    after = os.times()
+    # ffmpeg and ImageMagick run as child processes
+    cpu = sum(after[:4]) - sum(before[:4])
+    return wall, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=int, default=30)
+    parser.add_argument("--renderer", choices=list(RENDERERS), action="append")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        clip = os.path.join(tmp, "clip.mp4")
+        filler = os.path.join(tmp, "filler.mp4")
+        srt = os.path.join(tmp, "clip.srt")
+        make_video(clip, args.duration, "1280x720", 440)
+        make_video(filler, args.duration, "1080x1920", 220)
+        make_srt(srt, args.duration)
+
+        for name in args.renderer or list(RENDERERS):
+            output = os.path.join(tmp, f"{name}.mp4")
+            try:
+                wall, cpu = measure(
+                    RENDERERS[name].render_short, clip, srt, output, filler
+                )
+            except Exception as e:
+                print(f"{name:>8}: failed ({e})")
+                continue
+            print(f"{name:>8}: {wall:.2f}s wall, {cpu:.2f}s CPU")
+
+
+if __name__ == "__main__":
+    main()
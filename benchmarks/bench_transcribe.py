@@ -0,0 +1,63 @@
+"""Times whole-file and chunked transcription against a local stub of the API.
+
+The stub answers like Whisper would, after a delay proportional to the
+length of the uploaded audio, so chunking shows up as wall-clock time.
+
+python -m benchmarks.bench_transcribe --duration 3600 --chunk 600
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from openai import AsyncOpenAI
+
+from benchmarks.fixtures import make_speech, serve_stub_openai
+from llm.api import OpenAIApi, RateLimit
+from transcription.service import WHISPER_MODEL, TranscriptService
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=int, default=3600)
+    parser.add_argument("--chunk", type=float, default=600)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    server, base_url = serve_stub_openai()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "speech.mp3")
+        make_speech(src, args.duration)
+
+        for label, chunk_seconds in [("whole", 0), ("chunked", args.chunk)]:
+            print(
+                f"{label:>8}: {asyncio.run(transcribe(src, base_url, chunk_seconds, args.concurrency))}"
+            )
+
+    server.shutdown()
+
+
+async def transcribe(src: str, base_url: str, chunk_seconds: float, concurrency: int):
+    # the stub has no rate limits, the limiter must not skew the timing
+    limits = {WHISPER_MODEL: RateLimit(60000)}
+    api = OpenAIApi(
+        client=AsyncOpenAI(api_key="stub", base_url=base_url, max_retries=0),
+        limits=limits,
+    )
+    service = TranscriptService(
+        api, store=None, chunk_seconds=chunk_seconds, concurrency=concurrency
+    )
+    start = time.time()
+    words = await service.transcribe(src)
+    await api.close()
+    return (
+        f"{time.time() - start:.2f}s, {len(words)} words "
+        f"in {service.transcriptions} request(s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Times serial and fanned-out uploads against a local mock of the platforms.
+
+The mock speaks the TikTok, YouTube and Instagram upload protocols, takes
+its time per megabyte like a real uplink and fails a share of the chunk
+requests halfway, so chunk retries and resumption get exercised too.
+
+python -m benchmarks.bench_upload --renders 6 --size 24 --failure-rate 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from uploader.fanout import Publisher
+from uploader.instagram import InstagramReelsUploader
+from uploader.tiktok import TikTokUploader
+from uploader.yt_shorts import YouTubeShortsUploader
+
+# seconds the mock takes per megabyte on one connection
+SECONDS_PER_MB = 0.02
+
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+
+
+class MockPlatforms(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    failure_rate = 0.0
+    sessions = {}
+    lock = threading.Lock()
+
+    def _reply(self, status: int, body: dict = None, headers: dict = None):
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _open(self, kind: str, size: int = None) -> str:
+        upload_id = uuid.uuid4().hex
+        with self.lock:
+            self.sessions[upload_id] = {"kind": kind, "size": size, "received": 0}
+        return upload_id
+
+    def _receive(self, session: dict, offset: int, data: bytes) -> bool:
+        """Takes the chunk, False when the mock fails it after half the bytes."""
+        if offset > session["received"]:
+            raise ValueError("gap in upload")
+        time.sleep(len(data) / 1e6 * SECONDS_PER_MB)
+        if random.random() < self.failure_rate:
+            session["received"] = offset + len(data) // 2
+            return False
+        session["received"] = offset + len(data)
+        return True
+
+    def _base(self) -> str:
+        return f"http://{self.headers['Host']}"
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self._body()
+
+        if path == "/upload/youtube/v3/videos":
+            upload_id = self._open(
+                "youtube", int(self.headers["X-Upload-Content-Length"])
+            )
+            self._reply(
+                200, headers={"Location": f"{self._base()}/session/{upload_id}"}
+            )
+        elif path == "/v2/post/publish/video/init/":
+            size = json.loads(body)["source_info"]["video_size"]
+            upload_id = self._open("tiktok", size)
+            self._reply(
+                200,
+                {
+                    "data": {
+                        "publish_id": f"v_pub_{upload_id}",
+                        "upload_url": f"{self._base()}/session/{upload_id}",
+                    },
+                    "error": {"code": "ok"},
+                },
+            )
+        elif path.endswith("/media"):
+            upload_id = self._open("instagram")
+            self._reply(
+                200, {"id": upload_id, "uri": f"{self._base()}/rupload/{upload_id}"}
+            )
+        elif path.startswith("/rupload/"):
+            session = self.sessions[path.rsplit("/", 1)[1]]
+            session["size"] = int(self.headers["file_size"])
+            if self._receive(session, int(self.headers["offset"]), body):
+                self._reply(200, {"success": True})
+            else:
+                self._reply(503, {"debug_info": {"message": "try again"}})
+        elif path.endswith("/media_publish"):
+            self._reply(200, {"id": f"ig_{uuid.uuid4().hex[:12]}"})
+        else:
+            self._reply(404)
+
+    def do_PUT(self):
+        path = urlparse(self.path).path
+        body = self._body()
+        session = self.sessions.get(path.rsplit("/", 1)[1])
+        if session is None:
+            return self._reply(404)
+
+        match = _CONTENT_RANGE.match(self.headers.get("Content-Range", ""))
+        if match is not None and not self._receive(session, int(match[1]), body):
+            return self._reply(503)
+
+        if session["received"] == session["size"]:
+            if session["kind"] == "tiktok":
+                return self._reply(201)
+            return self._reply(200, {"id": f"yt_{uuid.uuid4().hex[:11]}"})
+        status = 206 if session["kind"] == "tiktok" else 308
+        headers = {}
+        if session["received"]:
+            headers["Range"] = f"bytes=0-{session['received'] - 1}"
+        self._reply(status, headers=headers)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path.startswith("/rupload/"):
+            session = self.sessions[path.rsplit("/", 1)[1]]
+            self._reply(200, {"offset": session["received"]})
+        else:
+            # a container is ready as soon as it is asked about
+            self._reply(200, {"status_code": "FINISHED"})
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionResetError:
+            # clients drop their pooled connections when they close
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+def uploaders(base_url: str, state_dir: str, chunk_size: int, concurrency: int):
+    options = {
+        "base_url": base_url,
+        "concurrency": concurrency,
+        "chunk_size": chunk_size,
+        "state_dir": state_dir,
+    }
+    return [
+        TikTokUploader(token="mock", **options),
+        YouTubeShortsUploader(token="mock", **options),
+        InstagramReelsUploader(token="mock", user_id="17841400000000000", **options),
+    ]
+
+
+async def serial(paths: list[str], publisher: Publisher):
+    for path in paths:
+        for uploader in publisher.uploaders:
+            await uploader.upload(path, os.path.basename(path))
+
+
+async def fanned_out(paths: list[str], publisher: Publisher):
+    await publisher.publish_all(paths)
+
+
+async def run(label: str, upload, paths: list[str], base_url: str, args) -> str:
+    with tempfile.TemporaryDirectory() as state_dir:
+        publisher = Publisher(
+            uploaders(base_url, state_dir, args.chunk * 1024 * 1024, args.concurrency)
+        )
+        start = time.time()
+        await upload(paths, publisher)
+        elapsed = time.time() - start
+        await publisher.close()
+
+    stats = publisher.stats().values()
+    sent = sum(s["bytes_sent"] for s in stats) / 1e6
+    return (
+        f"{label:>10}: {elapsed:.2f}s, {sent:.0f} MB at {sent / elapsed:.1f} MB/s, "
+        f"{sum(s['uploads'] for s in stats)} uploads, "
+        f"{sum(s['retries'] for s in stats)} retries, "
+        f"{sum(s['failed'] for s in stats)} failed"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--renders", type=int, default=6)
+    parser.add_argument("--size", type=int, default=24, help="MB per render")
+    parser.add_argument("--chunk", type=int, default=8, help="MB per chunk")
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    MockPlatforms.failure_rate = args.failure_rate
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockPlatforms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.renders):
+            path = os.path.join(tmp, f"short_{i}.mp4")
+            with open(path, "wb") as file:
+                file.write(os.urandom(args.size * 1024 * 1024))
+            paths.append(path)
+
+        for label, upload in [("serial", serial), ("fanned out", fanned_out)]:
+            print(asyncio.run(run(label, upload, paths, base_url, args)))
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Synthetic inputs for the benchmarks, so none of them needs the network.
+
+Media comes from ffmpeg's test sources, transcripts and heat maps are
+generated, and a stub of the OpenAI API answers transcription and chat
+requests with a delay proportional to their size.
+"""
+
+import email
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from media.ffmpeg import duration, run_ffmpeg
+
+WORDS = ["the", "and", "I", "no", "way", "this", "happened", "watch", "haha", "what?!"]
+WORD_INTERVAL = 0.5
+# seconds of stub latency per second of audio and per thousand prompt tokens
+TRANSCRIBE_REALTIME_FACTOR = 0.002
+CHAT_SECONDS_PER_KTOKEN = 0.05
+
+_SPAN_START = re.compile(r"^\[(\d+):(\d\d)\]", re.MULTILINE)
+
+
+def make_video(
+    path: str, duration: int, size: str = "1280x720", frequency: int = 440, gop=None
+):
+    run_ffmpeg(
+        ["-f", "lavfi", "-i", f"testsrc2=size={size}:rate=30"]
+        + ["-f", "lavfi", "-i", f"sine=frequency={frequency}:sample_rate=44100"]
+        + ["-t", duration, "-c:v", "libx264", "-preset", "veryfast"]
+        + (["-g", gop] if gop else [])
+        + ["-c:a", "aac", "-movflags", "+faststart", path]
+    )
+
+
+def make_speech(path: str, seconds: int):
+    # nine seconds of tone then two of silence, like sentences and pauses
+    run_ffmpeg(
+        ["-f", "lavfi", "-i", "sine=frequency=440:duration=9"]
+        + ["-f", "lavfi", "-i", "anullsrc=r=44100:cl=mono:d=2"]
+        + ["-filter_complex", "[0][1]concat=n=2:v=0:a=1,aloop=loop=-1:size=485100"]
+        + ["-t", seconds, "-ar", 44100, "-b:a", "128k", path]
+    )
+
+
+def _timestamp(seconds: float) -> str:
+    ms = int(seconds * 1000)
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+
+def make_srt(path: str, duration: int, word_length: float = 0.3):
+    """One word per cue, like the transcripts Whisper returns for our prompt."""
+    cues = []
+    for i in range(int(duration / word_length)):
+        start = i * word_length
+        cues.append(
+            f"{i + 1}\n{_timestamp(start)} --> {_timestamp(start + word_length)}\n"
+            f"{WORDS[i % len(WORDS)]}\n"
+        )
+    with open(path, "w") as file:
+        file.write("\n".join(cues))
+
+
+def synthetic_path(rng: np.random.Generator, segments: int = 100) -> str:
+    """Builds a heat map path shaped like the ones YouTube renders."""
+    y = (
+        100
+        - np.clip(np.convolve(rng.random(segments + 8), np.ones(8) / 8, "valid"), 0, 1)
+        * 100
+    )
+    y = y[: segments + 1]
+    step = 1000 / segments
+
+    parts = [f"M 0.0,{y[0]:.1f}"]
+    for i in range(segments):
+        x0, x3 = i * step, (i + 1) * step
+        parts.append(
+            f"C {x0 + step / 3:.1f},{y[i]:.1f} {x3 - step / 3:.1f},{y[i + 1]:.1f} {x3:.1f},{y[i + 1]:.1f}"
+        )
+    return " ".join(parts)
+
+
+def watch_page(path: str, duration: int) -> str:
+    """The parts of a watch page `_get_video_engagement` reads, amid some filler."""
+    minutes, seconds = divmod(duration, 60)
+    filler = "".join(
+        f'<div class="ytd-item"><a id="thumbnail" href="/watch?v={i:011d}"></a></div>'
+        for i in range(200)
+    )
+    return (
+        "<html><body><div id='player'>"
+        f'<span class="ytp-time-duration">{minutes}:{seconds:02d}</span>'
+        '<svg class="ytp-heat-map-svg" viewBox="0 0 1000 100">'
+        f'<path class="ytp-heat-map-path" d="{path}"></path></svg>'
+        f"</div>{filler}</body></html>"
+    )
+
+
+class StubOpenAI(BaseHTTPRequestHandler):
+    """Answers like Whisper and the chat API would, after a size-bound delay."""
+
+    def _reply(self, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path.endswith("/audio/transcriptions"):
+            self._transcribe(body)
+        elif self.path.endswith("/chat/completions"):
+            self._chat(body)
+        else:
+            self.send_error(404)
+
+    def _transcribe(self, body: bytes):
+        message = email.message_from_bytes(
+            b"Content-Type: "
+            + self.headers["Content-Type"].encode()
+            + b"\r\n\r\n"
+            + body
+        )
+        audio = next(
+            part.get_payload(decode=True)
+            for part in message.get_payload()
+            if part.get_param("name", header="content-disposition") == "file"
+        )
+
+        with tempfile.NamedTemporaryFile(suffix=".ogg") as file:
+            file.write(audio)
+            file.flush()
+            seconds = duration(file.name)
+        time.sleep(seconds * TRANSCRIBE_REALTIME_FACTOR)
+
+        words = [
+            {"word": "word", "start": i * WORD_INTERVAL, "end": i * WORD_INTERVAL + 0.3}
+            for i in range(int(seconds / WORD_INTERVAL))
+        ]
+        self._reply({"text": "", "duration": seconds, "words": words})
+
+    def _chat(self, body: bytes):
+        request = json.loads(body)
+        prompt = request["messages"][-1]["content"]
+        tokens = len(prompt) // 4
+        time.sleep(tokens / 1000 * CHAT_SECONDS_PER_KTOKEN)
+
+        # every tenth sentence of the window is a "viral" part of 30 seconds
+        starts = [int(m) * 60 + int(s) for m, s in _SPAN_START.findall(prompt)][::10]
+        parts = [
+            {
+                "start": f"{start // 60}:{start % 60:02d}",
+                "end": f"{(start + 30) // 60}:{(start + 30) % 60:02d}",
+                "title": "NO WAY",
+                "score": (start * 7) % 10,
+            }
+            for start in starts
+        ]
+        self._reply(
+            {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": json.dumps(parts)},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": tokens,
+                    "completion_tokens": 20 * len(parts),
+                    "total_tokens": tokens + 20 * len(parts),
+                },
+            }
+        )
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_stub_openai() -> tuple[ThreadingHTTPServer, str]:
+    """Starts the stub in a thread, returns the server and its API base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenAI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
+
+
+def fixture(directory: str, name: str, make, *args) -> str:
+    """The path of a generated fixture, made on first use and reused after."""
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        tmp = os.path.join(directory, "tmp-" + name)
+        make(tmp, *args)
+        os.replace(tmp, path)
+    return path
@@ -0,0 +1,318 @@
+"""Runs every offline benchmark and checks the results against a baseline.
+
+Each case runs in a fresh process, so its peak RSS is its own, and reports
+wall time, CPU time (children such as ffmpeg included) and peak RSS. A
+case fails when any of them exceeds the baseline by more than the
+tolerance. Fixtures are generated once and reused between runs.
+
+python -m benchmarks.suite --quick
+python -m benchmarks.suite --update-baseline
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from benchmarks.fixtures import (
+    fixture,
+    make_speech,
+    make_srt,
+    make_video,
+    serve_stub_openai,
+    synthetic_path,
+    watch_page,
+)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+FIXTURE_DIR = os.path.join(tempfile.gettempdir(), "marketeer-bench")
+# a case fails once it is this much slower or bigger than its baseline
+TOLERANCE = 1.3
+# differences below these are noise, not regressions
+MIN_SECONDS = 0.25
+MIN_RSS_MB = 10
+
+# name: (seconds, size); --quick keeps the first two
+SOURCES = {
+    "60s-480p": (60, "854x480"),
+    "60s-720p": (60, "1280x720"),
+    "300s-1080p": (300, "1920x1080"),
+}
+CLIP_LENGTH = 30
+HEATMAP_PAGES = 500
+SPEECH_SECONDS = 1200
+TRANSCRIPT_SECONDS = 3600
+
+
+def make_fixtures(directory: str, quick: bool) -> dict:
+    os.makedirs(directory, exist_ok=True)
+    sources = dict(list(SOURCES.items())[:2]) if quick else SOURCES
+
+    fixtures = {"sources": {}}
+    for name, (seconds, size) in sources.items():
+        fixtures["sources"][name] = fixture(
+            directory, f"source-{name}.mp4", make_video, seconds, size, 440, 60
+        )
+    fixtures["clip"] = fixture(
+        directory, "clip-720p.mp4", make_video, CLIP_LENGTH, "1280x720"
+    )
+    fixtures["filler"] = fixture(
+        directory, "filler-1080x1920.mp4", make_video, CLIP_LENGTH, "1080x1920", 220
+    )
+    fixtures["clip_srt"] = fixture(directory, "clip.srt", make_srt, CLIP_LENGTH)
+    fixtures["transcript"] = fixture(
+        directory, "transcript.srt", make_srt, TRANSCRIPT_SECONDS
+    )
+    fixtures["speech"] = fixture(directory, "speech.mp3", make_speech, SPEECH_SECONDS)
+
+    def make_pages(path):
+        rng = np.random.default_rng(0)
+        pages = [
+            watch_page(synthetic_path(rng), int(rng.integers(120, 3 * 3600)))
+            for _ in range(HEATMAP_PAGES)
+        ]
+        with open(path, "w") as file:
+            json.dump(pages, file)
+
+    fixtures["pages"] = fixture(directory, "watch_pages.json", make_pages)
+    return fixtures
+
+
+# cases, each takes the fixtures and runs in its own process
+
+
+def engagement_parse(fixtures: dict):
+    """What `_get_video_engagement` does with the page, for many pages."""
+    from engagement.heatmap import top_windows
+    from engagement.page import engagement_from_page
+
+    with open(fixtures["pages"]) as file:
+        pages = json.load(file)
+    for page in pages:
+        top_windows(engagement_from_page(page), CLIP_LENGTH, 3, threshold=40)
+
+
+def cut(mode: str, source: str):
+    def run(fixtures: dict):
+        from media.cut import cut_clip
+
+        src = fixtures["sources"][source]
+        seconds = SOURCES[source][0]
+        with tempfile.TemporaryDirectory() as tmp:
+            # off keyframes, so the smart cut has edges to re-encode
+            start = (seconds - CLIP_LENGTH) / 2 + 0.5
+            cut_clip(
+                src, os.path.join(tmp, "clip.mp4"), start, start + CLIP_LENGTH, mode
+            )
+
+    return run
+
+
+def render(renderer: str):
+    """The render `create_video_with_subtitles` hands to the process pool."""
+
+    def run(fixtures: dict):
+        from render import ffmpeg_renderer, moviepy_renderer
+
+        module = ffmpeg_renderer if renderer == "ffmpeg" else moviepy_renderer
+        with tempfile.TemporaryDirectory() as tmp:
+            module.render_short(
+                fixtures["clip"],
+                fixtures["clip_srt"],
+                os.path.join(tmp, "short.mp4"),
+                fixtures["filler"],
+            )
+
+    return run
+
+
+def transcript_compact(fixtures: dict):
+    from transcription.compact import compact_transcript, render_spans
+
+    with open(fixtures["transcript"]) as file:
+        render_spans(compact_transcript(file.read()))
+
+
+def transcribe(chunk_seconds: float):
+    def run(fixtures: dict):
+        from benchmarks.bench_transcribe import transcribe
+
+        asyncio.run(transcribe(fixtures["speech"], fixtures["api"], chunk_seconds, 4))
+
+    return run
+
+
+def viral_score(fixtures: dict):
+    from openai import AsyncOpenAI
+
+    from llm.api import OpenAIApi, RateLimit
+    from llm.viral import VIRAL_MODEL, ViralScorer
+
+    async def score():
+        api = OpenAIApi(
+            client=AsyncOpenAI(api_key="stub", base_url=fixtures["api"], max_retries=0),
+            limits={VIRAL_MODEL: RateLimit(60000)},
+        )
+        with open(fixtures["transcript"]) as file:
+            await ViralScorer(api).score(file.read(), count=3)
+        await api.close()
+
+    asyncio.run(score())
+
+
+def cases(fixtures: dict) -> dict:
+    found = {"engagement.parse": engagement_parse}
+    for source in fixtures["sources"]:
+        for mode in ["copy", "smart"]:
+            found[f"cut.{mode}.{source}"] = cut(mode, source)
+    found["cut.moviepy.60s-480p"] = cut("moviepy", "60s-480p")
+    for renderer in ["ffmpeg", "moviepy"]:
+        found[f"render.{renderer}"] = render(renderer)
+    found["transcript.compact"] = transcript_compact
+    found["transcript.transcribe.whole"] = transcribe(0)
+    found["transcript.transcribe.chunked"] = transcribe(300)
+    found["transcript.viral"] = viral_score
+    return found
+
+
+def _measure(name: str, fixtures: dict) -> dict:
+    case = cases(fixtures)[name]
+    before = os.times()
+    start = time.perf_counter()
+    # stdout is kept for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        case(fixtures)
+    wall = time.perf_counter() - start
+    after = os.times()
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return {
+        "wall": wall,
+        "cpu": sum(after[:4]) - sum(before[:4]),
+        "peak_rss_mb": peak * unit / 1e6,
+    }
+
+
+def measure(name: str, fixtures: dict, repeat: int) -> dict:
+    runs = []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        ) as process:
+            runs.append(process.submit(_measure, name, fixtures).result())
+    # the best run is the least disturbed by the rest of the machine
+    return {
+        "wall": min(run["wall"] for run in runs),
+        "cpu": min(run["cpu"] for run in runs),
+        "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """The metrics that regressed past the tolerance."""
+    slack = {"wall": MIN_SECONDS, "cpu": MIN_SECONDS, "peak_rss_mb": MIN_RSS_MB}
+    return [
+        metric
+        for metric, value in result.items()
+        if metric in baseline
+        and value > baseline[metric] * tolerance
+        and value - baseline[metric] > slack[metric]
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quick", action="store_true", help="skip the 1080p source")
+    parser.add_argument("--only", action="append", help="case name prefix")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--fixtures", default=FIXTURE_DIR)
+    parser.add_argument("--output", help="write the JSON report here too")
+    args = parser.parse_args()
+
+    print("--- Generating fixtures", file=sys.stderr)
+    fixtures = make_fixtures(args.fixtures, args.quick)
+    server, fixtures["api"] = serve_stub_openai()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)["cases"]
+
+    results = {}
+    for name in cases(fixtures):
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        print(f"--- {name}", file=sys.stderr)
+        try:
+            result = measure(name, fixtures, args.repeat)
+        except Exception as e:
+            results[name] = {"status": "error", "error": repr(e)}
+            continue
+
+        if name not in baseline:
+            result["status"] = "new"
+        else:
+            regressed = compare(result, baseline[name], args.tolerance)
+            result["status"] = "fail" if regressed else "pass"
+            result["regressed"] = regressed
+            result["baseline"] = baseline[name]
+        results[name] = result
+    server.shutdown()
+
+    report = {
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "tolerance": args.tolerance,
+        "passed": all(r["status"] in ("pass", "new") for r in results.values()),
+        "cases": results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+
+    if args.update_baseline:
+        measured = {
+            name: {
+                metric: round(result[metric], 3)
+                for metric in ("wall", "cpu", "peak_rss_mb")
+            }
+            for name, result in results.items()
+            if result["status"] != "error"
+        }
+        with open(args.baseline, "w") as file:
+            json.dump(
+                {"machine": report["machine"], "cases": {**baseline, **measured}},
+                file,
+                indent=2,
+            )
+            file.write("\n")
+        print(f"--- Baseline written to {args.baseline}", file=sys.stderr)
+
+    sys.exit(0 if report["passed"] or args.update_baseline else 1)
+
+
+if __name__ == "__main__":
+    main()
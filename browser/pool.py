@@ -0,0 +1,155 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from logger import log
+
+
+class PoolExhausted(Exception):
+    pass
+
+
+class PooledDriver:
+    """Wraps a WebDriver and counts the page loads done through it."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.loads = 0
+        self.created_at = time.time()
+
+    def get(self, url: str):
+        self.loads += 1
+        return self.driver.get(url)
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            log.warn("Failed to quit driver:", e)
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+
+class DriverPool:
+    """A bounded pool of WebDriver instances.
+
+    Drivers are spawned lazily on checkout, health checked before they are
+    handed out and recycled once they have served `max_loads` page loads.
+    """
+
+    def __init__(self, factory, size: int = 4, max_loads: int = 50):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+
+        self.factory = factory
+        self.size = size
+        self.max_loads = max_loads
+
+        self._idle: list[PooledDriver] = []
+        self._total = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    @property
+    def in_use(self) -> int:
+        return self._total - len(self._idle)
+
+    def _healthy(self, driver: PooledDriver) -> bool:
+        if driver.loads >= self.max_loads:
+            log.info(f"Recycling driver after {driver.loads} page loads")
+            return False
+        try:
+            driver.current_url
+            return True
+        except Exception as e:
+            log.warn("Driver failed health check:", e)
+            return False
+
+    def _discard(self, driver: PooledDriver):
+        driver.quit()
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+
+    def checkout(self, timeout: float = None) -> PooledDriver:
+        deadline = None if timeout is None else time.time() + timeout
+
+        while True:
+            spawn = False
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolExhausted("Driver pool is closed")
+                    if self._idle:
+                        driver = self._idle.pop()
+                        break
+                    if self._total < self.size:
+                        self._total += 1
+                        spawn = True
+                        break
+
+                    remaining = None if deadline is None else deadline - time.time()
+                    if remaining is not None and remaining <= 0:
+                        raise PoolExhausted(
+                            f"No driver available after {timeout} seconds"
+                        )
+                    self._cond.wait(remaining)
+
+            if spawn:
+                # spawning a browser is slow, so do it outside the lock
+                try:
+                    driver = PooledDriver(self.factory())
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+                log.info(f"Spawned driver {self._total}/{self.size}")
+                return driver
+
+            if self._healthy(driver):
+                return driver
+            self._discard(driver)
+
+    def checkin(self, driver: PooledDriver):
+        with self._cond:
+            if not self._closed:
+                self._idle.append(driver)
+                self._cond.notify()
+                return
+        self._discard(driver)
+
+    @contextmanager
+    def driver(self, timeout: float = None):
+        driver = self.checkout(timeout)
+        try:
+            yield driver
+        finally:
+            # a failed page is left to the health check on the next checkout
+            self.checkin(driver)
+
+    def warm(self, count: int = 1):
+        """Spawns up to `count` drivers ahead of the first checkout."""
+        drivers = []
+        try:
+            for _ in range(min(count, self.size) - self._total):
+                drivers.append(self.checkout())
+        except Exception as e:
+            # the first page load tries again
+            log.warn("Failed to warm up a driver:", e)
+        for driver in drivers:
+            self.checkin(driver)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            drivers, self._idle = self._idle, []
+            self._cond.notify_all()
+
+        for driver in drivers:
+            self._discard(driver)
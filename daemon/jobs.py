@@ -0,0 +1,183 @@
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Optional
+
+from logger import log, metrics, trace
+
+# finished jobs kept for status queries, the oldest are forgotten first
+JOB_HISTORY = 1000
+
+STATUSES = ["queued", "running", "cancelling", "done", "failed", "cancelled"]
+FINISHED = {"done", "failed", "cancelled"}
+
+
+class JobRequestError(ValueError):
+    pass
+
+
+@dataclass
+class JobRequest:
+    """What a client asks for: a channel, or one video with an optional window."""
+
+    channel: Optional[str] = None
+    url: Optional[str] = None
+    window: Optional[tuple[int, int]] = None
+    profile: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: dict, profiles) -> "JobRequest":
+        if not isinstance(data, dict):
+            raise JobRequestError("Expected a JSON object")
+        unknown = set(data) - {"channel", "url", "window", "profile"}
+        if unknown:
+            raise JobRequestError(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+        request = cls(
+            data.get("channel"),
+            data.get("url"),
+            data.get("window"),
+            data.get("profile"),
+        )
+        if (request.channel is None) == (request.url is None):
+            raise JobRequestError("Give either a channel or a video url")
+        for name in ("channel", "url", "profile"):
+            if not isinstance(getattr(request, name), (str, type(None))):
+                raise JobRequestError(f"{name} has to be a string")
+        if request.window is not None:
+            if request.url is None:
+                raise JobRequestError("A window needs a video url")
+            try:
+                start, end = (int(t) for t in request.window)
+            except (TypeError, ValueError):
+                raise JobRequestError("A window is [start, end] in seconds") from None
+            if not 0 <= start < end:
+                raise JobRequestError("A window has to start before it ends")
+            request.window = (start, end)
+        if request.profile is not None and request.profile not in profiles:
+            raise JobRequestError(
+                f"Unknown profile {request.profile}, one of {', '.join(profiles)}"
+            )
+        return request
+
+    def to_dict(self) -> dict:
+        found = {
+            "channel": self.channel,
+            "url": self.url,
+            "window": list(self.window) if self.window else None,
+            "profile": self.profile,
+        }
+        return {name: value for name, value in found.items() if value is not None}
+
+
+@dataclass
+class Job:
+    id: str
+    request: JobRequest
+    status: str = "queued"
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    error: Optional[str] = None
+    # keys of the clip jobs this request turned into, and where they ended up
+    clips: list[str] = field(default_factory=list)
+    outputs: list[str] = field(default_factory=list)
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "request": self.request.to_dict(),
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "error": self.error,
+            "clips": self.clips,
+            "outputs": self.outputs,
+        }
+
+
+class JobRunner:
+    """Runs submitted jobs on the daemon's loop, `concurrency` at a time.
+
+    `handler` takes a job and does the work, recording its clips on it. Each
+    job is a task of its own, so cancelling one stops it at its next await
+    without touching the others.
+    """
+
+    def __init__(self, handler, concurrency: int = 4, history: int = JOB_HISTORY):
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.history = history
+        self.jobs: dict[str, Job] = {}
+        self.first_done_at = None
+        # created inside the loop that runs the jobs
+        self._slots = None
+
+    def submit(self, request: JobRequest) -> Job:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        job = Job(uuid.uuid4().hex[:12], request)
+        self.jobs[job.id] = job
+        job.task = asyncio.ensure_future(self._run(job))
+        metrics.count("daemon_jobs_total", status="queued")
+        self._forget()
+        return job
+
+    async def _run(self, job: Job):
+        try:
+            async with self._slots:
+                job.status = "running"
+                job.started = time.time()
+                with trace.span("daemon.job", job=job.id, **job.request.to_dict()):
+                    await self.handler(job)
+            job.status = "done"
+            if self.first_done_at is None:
+                self.first_done_at = time.time()
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            log.error(f"Job {job.id} failed:", e)
+            job.status = "failed"
+            job.error = repr(e)
+        finally:
+            job.finished = time.time()
+            metrics.count("daemon_jobs_total", status=job.status)
+            if job.started is not None:
+                metrics.observe("daemon_job_seconds", job.finished - job.started)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def select(self, status: str = None) -> list[Job]:
+        return [job for job in self.jobs.values() if status in (None, job.status)]
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancels a queued or running job, returns None if there is no such job."""
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINISHED:
+            return job
+        # the handler tells a cancel apart from a shutdown by this status
+        job.status = "cancelling"
+        job.task.cancel()
+        return job
+
+    def _forget(self):
+        finished = [job for job in self.jobs.values() if job.status in FINISHED]
+        for job in finished[: max(len(finished) - self.history, 0)]:
+            del self.jobs[job.id]
+
+    def stats(self) -> dict:
+        counts = {status: 0 for status in STATUSES}
+        for job in self.jobs.values():
+            counts[job.status] += 1
+        return {"concurrency": self.concurrency, **counts}
+
+    async def shutdown(self):
+        """Stops every unfinished job, they stay resumable in the ledger."""
+        tasks = [job.task for job in self.jobs.values() if not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
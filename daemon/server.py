@@ -0,0 +1,113 @@
+"""Local HTTP API of the worker daemon.
+
+POST   /jobs       {"channel": ...} or {"url": ..., "window": [s, e], "profile": ...}
+GET    /jobs       every known job, ?status= filters
+GET    /jobs/{id}  one job
+DELETE /jobs/{id}  cancels it
+GET    /stats      the daemon's counters
+GET    /metrics    Prometheus text
+
+curl -s localhost:8765/jobs -d '{"channel": "BetaSquad"}'
+curl -s --unix-socket marketeer.sock http://daemon/jobs
+"""
+
+import asyncio
+import json
+import os
+import signal
+
+from aiohttp import web
+
+from daemon.jobs import JobRequest, JobRequestError, JobRunner
+from logger import log, metrics
+
+DAEMON_HOST = os.environ.get("DAEMON_HOST", "127.0.0.1")
+DAEMON_PORT = int(os.environ.get("DAEMON_PORT", 8765))
+# listening on a socket file instead keeps the API off the network entirely
+DAEMON_SOCKET = os.environ.get("DAEMON_SOCKET")
+
+
+def _error(status: int, message: str) -> web.Response:
+    return web.json_response({"error": message}, status=status)
+
+
+def create_app(runner: JobRunner, profiles, stats=None) -> web.Application:
+    """The routes above over `runner`, `stats` adds the daemon's own counters."""
+
+    async def submit(request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            return _error(400, "Expected a JSON body")
+        try:
+            job = runner.submit(JobRequest.from_dict(body, profiles))
+        except JobRequestError as e:
+            return _error(400, str(e))
+        return web.json_response(job.to_dict(), status=202)
+
+    async def jobs(request: web.Request) -> web.Response:
+        found = runner.select(request.query.get("status"))
+        return web.json_response([job.to_dict() for job in found])
+
+    async def job(request: web.Request) -> web.Response:
+        found = runner.get(request.match_info["id"])
+        if found is None:
+            return _error(404, "No such job")
+        return web.json_response(found.to_dict())
+
+    async def cancel(request: web.Request) -> web.Response:
+        found = runner.cancel(request.match_info["id"])
+        if found is None:
+            return _error(404, "No such job")
+        return web.json_response(found.to_dict())
+
+    async def daemon_stats(request: web.Request) -> web.Response:
+        return web.json_response({"jobs": runner.stats(), **(stats() if stats else {})})
+
+    async def prometheus(request: web.Request) -> web.Response:
+        return web.Response(text=metrics.prometheus(), content_type="text/plain")
+
+    app = web.Application()
+    app.add_routes(
+        [
+            web.post("/jobs", submit),
+            web.get("/jobs", jobs),
+            web.get("/jobs/{id}", job),
+            web.delete("/jobs/{id}", cancel),
+            web.get("/stats", daemon_stats),
+            web.get("/metrics", prometheus),
+        ]
+    )
+    return app
+
+
+async def serve(
+    app: web.Application,
+    host: str = DAEMON_HOST,
+    port: int = DAEMON_PORT,
+    socket_path: str = DAEMON_SOCKET,
+):
+    """Serves the app until SIGINT or SIGTERM."""
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+
+    server = web.AppRunner(app, access_log=None)
+    await server.setup()
+    if socket_path:
+        site = web.UnixSite(server, socket_path)
+        where = socket_path
+    else:
+        site = web.TCPSite(server, host, port)
+        where = f"http://{host}:{port}"
+    await site.start()
+    log.emphasize(f"Daemon listening on {where}")
+
+    try:
+        await stopping.wait()
+    finally:
+        log.info("Daemon stopping")
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(signum)
+        await server.cleanup()
@@ -0,0 +1,106 @@
+import re
+from functools import lru_cache
+from dataclasses import dataclass
+
+import numpy as np
+
+# the heat map SVG is drawn in a 1000x100 viewBox, y grows downwards
+HEATMAP_WIDTH = 1000
+HEATMAP_HEIGHT = 100
+
+_UNSUPPORTED_COMMANDS = re.compile(r"[A-BD-LN-Za-df-z]")
+_NUMBER_SEPARATORS = str.maketrans({"M": " ", "C": " ", ",": " "})
+
+
+class HeatmapParseError(Exception):
+    pass
+
+
+@dataclass
+class Window:
+    start: int
+    end: int
+    score: float
+
+
+def parse_path(path: str) -> np.ndarray:
+    """Parses an `M x,y C x1,y1 x2,y2 x3,y3 ...` path into control points.
+
+    Returns an array of shape (segments, 4, 2) holding the start point and the
+    three control points of every cubic Bézier segment.
+    """
+    if not path.lstrip().startswith("M"):
+        raise HeatmapParseError("Heat map path must start with a move command")
+    if _UNSUPPORTED_COMMANDS.search(path):
+        raise HeatmapParseError("Only M and C commands are supported")
+
+    try:
+        numbers = np.array(path.translate(_NUMBER_SEPARATORS).split(), dtype=float)
+    except ValueError as e:
+        raise HeatmapParseError(f"Malformed number in path: {e}") from e
+    if (len(numbers) - 2) % 6 != 0 or len(numbers) < 8:
+        raise HeatmapParseError(f"Unexpected number count {len(numbers)} in path")
+
+    points = numbers.reshape(-1, 2)
+    controls = points[1:].reshape(-1, 3, 2)
+    # every segment starts where the previous one ended
+    starts = np.concatenate([points[:1], controls[:-1, 2]])
+    return np.concatenate([starts[:, None, :], controls], axis=1)
+
+
+@lru_cache(maxsize=8)
+def _bernstein(samples: int) -> np.ndarray:
+    t = np.linspace(0.0, 1.0, samples, endpoint=False)
+    u = 1.0 - t
+    return np.stack([u**3, 3 * u**2 * t, 3 * u * t**2, t**3], axis=1)
+
+
+def sample_segments(segments: np.ndarray, samples: int = 8):
+    """Evaluates every Bézier segment at `samples` points, returns (x, y)."""
+    curve = np.matmul(_bernstein(samples), segments).reshape(-1, 2)
+    curve = np.concatenate([curve, segments[-1:, 3]])
+    return curve[:, 0], curve[:, 1]
+
+
+def engagement_per_second(
+    path: str,
+    duration: int,
+    samples: int = 8,
+    width: int = HEATMAP_WIDTH,
+    height: int = HEATMAP_HEIGHT,
+) -> np.ndarray:
+    """Returns the engagement (0-100) for every second of the video."""
+    x, y = sample_segments(parse_path(path), samples)
+    order = np.argsort(x, kind="stable")
+    seconds = x[order] * duration / width
+    engagement = (height - y[order]) * 100 / height
+
+    grid = np.arange(duration) + 0.5
+    return np.clip(np.interp(grid, seconds, engagement), 0, 100)
+
+
+def top_windows(curve: np.ndarray, length: int, k: int = 1, threshold: float = 0):
+    """Picks the k non-overlapping windows with the highest summed engagement.
+
+    Window sums come from a single prefix-sum pass, windows are then taken
+    greedily and every start that would overlap a picked window is masked.
+    Windows whose mean engagement is below `threshold` are dropped, the
+    threshold applies to the window as a whole, not to its single points.
+    """
+    n = len(curve)
+    if n == 0 or k < 1:
+        return []
+    length = min(length, n)
+
+    prefix = np.concatenate([[0.0], np.cumsum(curve, dtype=float)])
+    sums = prefix[length:] - prefix[:-length]
+
+    windows: list[Window] = []
+    for _ in range(k):
+        start = int(np.argmax(sums))
+        if not np.isfinite(sums[start]) or sums[start] / length < threshold:
+            break
+        windows.append(Window(start, start + length, float(sums[start] / length)))
+        sums[max(0, start - length + 1) : start + length] = -np.inf
+
+    return windows
@@ -0,0 +1,24 @@
+from typing import Optional
+
+import numpy as np
+from bs4 import BeautifulSoup
+
+from engagement.heatmap import HeatmapParseError, engagement_per_second
+
+
+def parse_duration(text: str) -> int:
+    """Seconds in a `h:mm:ss` or `m:ss` player duration."""
+    return sum(int(x) * 60**i for i, x in enumerate(reversed(text.strip().split(":"))))
+
+
+def engagement_from_page(html: str) -> Optional[np.ndarray]:
+    """Engagement per second from a watch page's heat map, None if it has none."""
+    soup = BeautifulSoup(html, "html.parser")
+
+    duration = soup.find("span", class_="ytp-time-duration")
+    if duration is None:
+        raise HeatmapParseError("Watch page has no player duration")
+    wave = soup.find("path", class_="ytp-heat-map-path")
+    if wave is None:
+        return None
+    return engagement_per_second(wave.get("d"), parse_duration(duration.text))
@@ -0,0 +1,115 @@
+import re
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from engagement.heatmap import Window, top_windows
+
+# windows taken from the heatmap before the transcript has its say
+N_CANDIDATES = 8
+# how much every signal counts, each is scaled to 0-1 first
+WEIGHTS = {
+    "heatmap": 0.5,
+    "speech": 0.15,
+    "exclamations": 0.1,
+    "laughter": 0.15,
+}
+# a pick is clear when it beats the first left-out candidate by this much
+CLEAR_MARGIN = 0.08
+# the signal rates at which a window counts as fully lively
+FAST_SPEECH = 3.0  # words per second
+MANY_EXCLAMATIONS = 5  # per window
+MANY_LAUGHS = 3  # per window
+
+_LAUGHTER = re.compile(r"\b(?:ha(?:ha)+|lol|lmao)\b|[\[(]laugh", re.IGNORECASE)
+
+
+@dataclass
+class Candidate:
+    window: Window
+    score: float
+    features: dict = field(default_factory=dict)
+
+
+def window_features(curve: np.ndarray, window: Window, words: list = None) -> dict:
+    """Scales every signal of the window to 0-1, None where there is no data."""
+    length = window.end - window.start
+    features = {
+        "heatmap": float(np.mean(curve[window.start : window.end])) / 100,
+        "speech": None,
+        "exclamations": None,
+        "laughter": None,
+    }
+
+    if words is not None:
+        inside = [w for w in words if window.start <= w.start < window.end]
+        text = " ".join(w.text for w in inside)
+        features["speech"] = min(len(inside) / length / FAST_SPEECH, 1.0)
+        exclamations = text.count("!") + text.count("?") / 2
+        features["exclamations"] = min(exclamations / MANY_EXCLAMATIONS, 1.0)
+        features["laughter"] = min(len(_LAUGHTER.findall(text)) / MANY_LAUGHS, 1.0)
+
+    return features
+
+
+class WindowRanker:
+    """Ranks clip windows offline from the heatmap and the transcript.
+
+    When the best windows clearly beat the rest the choice is made locally,
+    close calls are left to the LLM. The ranker counts both so the avoided
+    LLM calls show up in the run stats.
+    """
+
+    def __init__(
+        self,
+        weights: dict = None,
+        margin: float = CLEAR_MARGIN,
+        candidates: int = N_CANDIDATES,
+    ):
+        self.weights = weights or WEIGHTS
+        self.margin = margin
+        self.candidates = candidates
+        self.decided_locally = 0
+        self.escalated = 0
+
+    def score(self, features: dict) -> float:
+        # signals without data are left out instead of counting as zero
+        present = {name: value for name, value in features.items() if value is not None}
+        total = sum(self.weights[name] for name in present)
+        return (
+            sum(self.weights[name] * value for name, value in present.items()) / total
+        )
+
+    def rank(
+        self,
+        curve: np.ndarray,
+        length: int,
+        words: list = None,
+        threshold: float = 0,
+    ) -> list[Candidate]:
+        ranked = []
+        for window in top_windows(curve, length, self.candidates, threshold):
+            features = window_features(curve, window, words)
+            ranked.append(Candidate(window, self.score(features), features))
+        ranked.sort(key=lambda candidate: candidate.score, reverse=True)
+        return ranked
+
+    def is_clear(self, ranked: list[Candidate], count: int = 1) -> bool:
+        if len(ranked) <= count:
+            return True
+        return ranked[count - 1].score - ranked[count].score >= self.margin
+
+    def record(self, escalated: bool):
+        if escalated:
+            self.escalated += 1
+        else:
+            self.decided_locally += 1
+
+    def stats(self) -> dict:
+        decisions = self.decided_locally + self.escalated
+        return {
+            "decided_locally": self.decided_locally,
+            "llm_calls": self.escalated,
+            "llm_calls_avoided": self.decided_locally,
+            "avoided_rate": self.decided_locally / decisions if decisions else 0.0,
+        }
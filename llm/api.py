@@ -0,0 +1,246 @@
+import asyncio
+import os
+import random
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from logger import log, metrics, trace
+
+MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", 5))
+MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", 20))
+RETRY_BASE = 1.0
+RETRY_MAX = 60.0
+# tokens are estimated from characters before the call, corrected after it
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=1)
+def retryable_errors() -> tuple:
+    # openai takes most of a second to import, only pay for it on the first call
+    import openai
+
+    return (
+        openai.RateLimitError,
+        openai.APIConnectionError,
+        openai.APITimeoutError,
+        openai.InternalServerError,
+    )
+
+
+@dataclass
+class RateLimit:
+    requests_per_minute: float
+    tokens_per_minute: Optional[float] = None
+
+
+# the lowest paid tier, raise them with the account's real limits
+MODEL_LIMITS = {
+    "gpt-4": RateLimit(500, 10000),
+    "gpt-4-turbo-preview": RateLimit(500, 30000),
+    "whisper-1": RateLimit(50),
+}
+DEFAULT_LIMIT = RateLimit(500, 10000)
+
+
+class TokenBucket:
+    """Allows `capacity` units at once, refilled at `rate` units per second."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        # a request bigger than the bucket waits for a full one instead of forever
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount: float):
+        """Charges (or refunds, if negative) the difference to the estimate."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class ApiMetrics:
+    """Latency, retries and token usage of the API calls, per model."""
+
+    def __init__(self, window: int = 1000):
+        self.calls = defaultdict(int)
+        self.failures = defaultdict(int)
+        self.retries = defaultdict(int)
+        self.prompt_tokens = defaultdict(int)
+        self.completion_tokens = defaultdict(int)
+        self.latencies = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, model: str, latency: float, usage=None):
+        self.calls[model] += 1
+        self.latencies[model].append(latency)
+        metrics.observe("api_seconds", latency, model=model)
+        if usage is not None:
+            prompt = getattr(usage, "prompt_tokens", 0) or 0
+            completion = getattr(usage, "completion_tokens", 0) or 0
+            self.prompt_tokens[model] += prompt
+            self.completion_tokens[model] += completion
+            metrics.count("api_tokens_total", prompt, model=model, kind="prompt")
+            metrics.count(
+                "api_tokens_total", completion, model=model, kind="completion"
+            )
+
+    def stats(self) -> dict:
+        stats = {}
+        for model in set(self.calls) | set(self.failures):
+            latencies = sorted(self.latencies[model])
+            stats[model] = {
+                "calls": self.calls[model],
+                "failures": self.failures[model],
+                "retries": self.retries[model],
+                "prompt_tokens": self.prompt_tokens[model],
+                "completion_tokens": self.completion_tokens[model],
+                "latency_p50": latencies[len(latencies) // 2] if latencies else None,
+                "latency_p95": (
+                    latencies[int(len(latencies) * 0.95)] if latencies else None
+                ),
+            }
+        return stats
+
+
+def estimate_tokens(*texts: str) -> int:
+    return sum(len(text) for text in texts) // CHARS_PER_TOKEN + 1
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class OpenAIApi:
+    """Async access to the OpenAI API that stays within the account's limits.
+
+    Every model gets a request and a token bucket sized from MODEL_LIMITS.
+    Rate limits, timeouts and server errors are retried with jittered
+    exponential backoff, honouring `retry-after` when the API sends one.
+    """
+
+    def __init__(
+        self,
+        api_key: str = None,
+        limits: dict = None,
+        max_retries: int = MAX_RETRIES,
+        max_connections: int = MAX_CONNECTIONS,
+        client=None,
+    ):
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        self.limits = {**MODEL_LIMITS, **(limits or {})}
+        self.max_retries = max_retries
+        self.max_connections = max_connections
+        self.metrics = ApiMetrics()
+
+        self._client = client
+        self._requests = {}
+        self._tokens = {}
+
+    @property
+    def client(self):
+        # created on first use so it binds to the running event loop
+        if self._client is None:
+            import httpx
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                max_retries=0,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections,
+                    ),
+                    timeout=httpx.Timeout(600.0, connect=10.0),
+                ),
+            )
+        return self._client
+
+    def _buckets(self, model: str):
+        if model not in self._requests:
+            limit = self.limits.get(model, DEFAULT_LIMIT)
+            rpm, tpm = limit.requests_per_minute, limit.tokens_per_minute
+            self._requests[model] = TokenBucket(rpm / 60, max(rpm / 60, 1))
+            self._tokens[model] = TokenBucket(tpm / 60, tpm) if tpm else None
+        return self._requests[model], self._tokens[model]
+
+    async def _call(self, model: str, estimate: int, call):
+        with trace.span("api.call", model=model):
+            requests, tokens = self._buckets(model)
+
+            for attempt in range(self.max_retries + 1):
+                await requests.acquire()
+                if tokens is not None:
+                    await tokens.acquire(estimate)
+
+                start = time.time()
+                try:
+                    response = await call()
+                except retryable_errors() as e:
+                    if attempt == self.max_retries:
+                        self.metrics.failures[model] += 1
+                        raise
+                    delay = _retry_after(e) or min(RETRY_BASE * 2**attempt, RETRY_MAX)
+                    delay *= random.uniform(0.5, 1.5)
+                    self.metrics.retries[model] += 1
+                    log.warn(f"{model}: {type(e).__name__}, retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                except Exception:
+                    self.metrics.failures[model] += 1
+                    raise
+
+                usage = getattr(response, "usage", None)
+                self.metrics.record(model, time.time() - start, usage)
+                if tokens is not None and usage is not None:
+                    tokens.adjust(getattr(usage, "total_tokens", estimate) - estimate)
+                return response
+
+    async def chat(self, model: str, messages: list[dict], **params) -> str:
+        """Returns the content of the first choice."""
+        estimate = estimate_tokens(*(m["content"] for m in messages))
+        estimate += params.get("max_tokens") or 0
+        response = await self._call(
+            model,
+            estimate,
+            lambda: self.client.chat.completions.create(
+                model=model, messages=messages, **params
+            ),
+        )
+        return response.choices[0].message.content
+
+    async def transcribe(self, path: str, model: str, **params):
+        async def call():
+            # reopened per attempt, a retry must upload the file from the start
+            with open(path, "rb") as file:
+                return await self.client.audio.transcriptions.create(
+                    model=model, file=file, **params
+                )
+
+        return await self._call(model, 0, call)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
@@ -0,0 +1,133 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+
+from logger import log
+
+LLM_CACHE_DIR = os.environ.get("LLM_CACHE_DIR", "llm_cache")
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL_DAYS", 30)) * 24 * 3600
+LLM_CACHE_BYTES = int(os.environ.get("LLM_CACHE_MB", 64)) * 1024 * 1024
+
+
+class ResponseCache:
+    """A disk-backed cache of LLM responses.
+
+    Entries are keyed by the hashed input text, the prompt template, the
+    model and its sampling parameters. They expire after `ttl` seconds and the
+    oldest are evicted once the cache grows past `max_bytes`. Concurrent
+    identical requests share one call instead of each paying for it.
+    """
+
+    def __init__(
+        self,
+        directory: str = LLM_CACHE_DIR,
+        ttl: float = LLM_CACHE_TTL,
+        max_bytes: int = LLM_CACHE_BYTES,
+    ):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.expired = 0
+        self.evictions = 0
+
+        self._inflight = {}
+        os.makedirs(directory, exist_ok=True)
+
+        # key -> (size, created), rebuilt from the files so nothing else to keep in sync
+        self._entries = {}
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                stat = os.stat(os.path.join(directory, name))
+                self._entries[name[:-5]] = stat.st_size, stat.st_mtime
+
+    @staticmethod
+    def key(model: str, template: str, text: str, params: dict = None) -> str:
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        blob = json.dumps([model, template, text_hash, params or {}], sort_keys=True)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str):
+        """Returns the cached response, or None if it is missing or expired."""
+        if key not in self._entries:
+            return None
+
+        _, created = self._entries[key]
+        if time.time() - created > self.ttl:
+            self.expired += 1
+            self._remove(key)
+            return None
+
+        try:
+            with open(self._path(key), "r") as file:
+                return json.load(file)["response"]
+        except (OSError, ValueError, KeyError) as e:
+            log.warn("Ignoring unreadable LLM cache entry:", e)
+            self._remove(key)
+            return None
+
+    def put(self, key: str, response):
+        tmp_path = self._path(key) + f".{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump({"created": time.time(), "response": response}, file)
+        os.replace(tmp_path, self._path(key))
+
+        self._entries[key] = os.path.getsize(self._path(key)), time.time()
+        self._evict()
+
+    async def get_or_call(self, key: str, call):
+        """Returns the cached response, or awaits `call()` once and caches it."""
+        response = self.get(key)
+        if response is not None:
+            self.hits += 1
+            return response
+
+        if key in self._inflight:
+            self.coalesced += 1
+            return await asyncio.shield(self._inflight[key])
+
+        self.misses += 1
+        self._inflight[key] = asyncio.ensure_future(call())
+        try:
+            response = await asyncio.shield(self._inflight[key])
+        finally:
+            self._inflight.pop(key, None)
+        self.put(key, response)
+        return response
+
+    def _remove(self, key: str):
+        self._entries.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        total = sum(size for size, _ in self._entries.values())
+        by_age = sorted(self._entries.items(), key=lambda item: item[1][1])
+        for key, (size, _) in by_age:
+            if total <= self.max_bytes:
+                break
+            self._remove(key)
+            self.evictions += 1
+            total -= size
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.coalesced) / requests if requests else 0.0,
+        }
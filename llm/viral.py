@@ -0,0 +1,168 @@
+import asyncio
+import json
+import os
+import re
+from dataclasses import dataclass
+
+from llm.api import OpenAIApi, estimate_tokens
+from llm.cache import ResponseCache
+from logger import log
+from transcription.compact import (
+    compact_transcript,
+    format_time,
+    parse_time,
+    render_spans,
+)
+
+VIRAL_MODEL = os.environ.get("VIRAL_MODEL", "gpt-4")
+# transcript tokens sent per request, gpt-4's 8k context minus prompt and answer
+WINDOW_TOKENS = int(os.environ.get("VIRAL_WINDOW_TOKENS", 6000))
+MAX_TOKENS = 512
+
+MARKETER_ROLE = "You are a highly intelligent and helpful assistant. You are a skilled marketer. You create tiktoks and youtube shorts with a high chance of going viral."
+VIRAL_PARTS_PROMPT = """Below is a transcript of a YouTube video, one line per sentence, each starting with [minutes:seconds].
+Find the parts (15 to 60 seconds) that could go viral on YouTube Shorts and TikTok.
+Answer only with a JSON list, best first, of at most {count} objects like
+{{"start": "m:ss", "end": "m:ss", "title": "short catchy title", "score": 0-10}}
+
+{transcript}"""
+
+_JSON_LIST = re.compile(r"\[.*\]", re.DOTALL)
+
+
+@dataclass
+class ViralPart:
+    start_time: int
+    end_time: int
+    title: str
+    path_to_transcript: str
+
+
+def parse_viral_parts(
+    response: str, path_to_transcript: str = ""
+) -> list[tuple[float, ViralPart]]:
+    """Reads the (score, part) pairs out of a model answer, skipping malformed ones."""
+    match = _JSON_LIST.search(response or "")
+    if match is None:
+        log.warn("No viral parts in the answer:", (response or "")[:200])
+        return []
+    try:
+        items = json.loads(match.group(0))
+    except ValueError as e:
+        log.warn("Unreadable viral parts:", e)
+        return []
+
+    parts = []
+    for item in items:
+        try:
+            start, end = parse_time(item["start"]), parse_time(item["end"])
+            part = ViralPart(
+                int(start), int(end), str(item["title"]), path_to_transcript
+            )
+            score = float(item.get("score", 0))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if part.end_time > part.start_time:
+            parts.append((score, part))
+    return parts
+
+
+def split_windows(lines: list[str], budget: int) -> list[list[str]]:
+    """Groups the transcript lines into windows of at most `budget` tokens."""
+    windows = [[]]
+    used = 0
+    for line in lines:
+        tokens = estimate_tokens(line)
+        if windows[-1] and used + tokens > budget:
+            windows.append([])
+            used = 0
+        windows[-1].append(line)
+        used += tokens
+    return windows
+
+
+class ViralScorer:
+    """Finds the viral parts of a transcript with as few tokens as possible.
+
+    The SRT is compacted into timestamped sentences first. Transcripts that
+    still exceed the token budget are mapped window by window, concurrently,
+    and the candidates of all windows are reduced to one ranking.
+    """
+
+    def __init__(
+        self,
+        api: OpenAIApi,
+        cache: ResponseCache = None,
+        model: str = VIRAL_MODEL,
+        window_tokens: int = WINDOW_TOKENS,
+    ):
+        self.api = api
+        self.cache = cache
+        self.model = model
+        self.window_tokens = window_tokens
+
+    async def _ask(self, transcript: str, count: int) -> str:
+        params = {"temperature": 0.2, "max_tokens": MAX_TOKENS}
+
+        def call():
+            return self.api.chat(
+                model=self.model,
+                messages=[
+                    {"role": "assistant", "content": MARKETER_ROLE},
+                    {
+                        "role": "user",
+                        "content": VIRAL_PARTS_PROMPT.format(
+                            count=count, transcript=transcript
+                        ),
+                    },
+                ],
+                **params,
+            )
+
+        if self.cache is None:
+            return await call()
+        key = self.cache.key(
+            self.model, VIRAL_PARTS_PROMPT, transcript, {**params, "count": count}
+        )
+        return await self.cache.get_or_call(key, call)
+
+    async def score(
+        self, srt: str, path_to_transcript: str = "", count: int = 3
+    ) -> list[ViralPart]:
+        """Returns up to `count` viral parts of the transcript, best first."""
+        spans = compact_transcript(srt)
+        if len(spans) == 0:
+            return []
+        lines = render_spans(spans).split("\n")
+        windows = split_windows(lines, self.window_tokens)
+        log.info(
+            f"Scoring {estimate_tokens(srt)} transcript tokens as "
+            f"{sum(estimate_tokens(line) for line in lines)} in {len(windows)} window(s)"
+        )
+
+        answers = await asyncio.gather(
+            *(self._ask("\n".join(window), count) for window in windows)
+        )
+
+        # reduce: every window's candidates ranked together, overlaps dropped
+        candidates = []
+        for answer in answers:
+            candidates.extend(parse_viral_parts(answer, path_to_transcript))
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+        parts = []
+        for _, part in candidates:
+            if any(
+                part.start_time < other.end_time and other.start_time < part.end_time
+                for other in parts
+            ):
+                continue
+            parts.append(part)
+            if len(parts) == count:
+                break
+
+        for part in parts:
+            log.info(
+                f"Viral part {format_time(part.start_time)}-{format_time(part.end_time)}: {part.title}"
+            )
+        return parts
@@ -1,5 +1,9 @@
+import asyncio
 import time
 from datetime import datetime
+from functools import partial, wraps
+
+from logger import trace
 
 HEADER = "\033[95m"  # Purple
 OKBLUE = "\033[94m"  # Blue
@@ -13,21 +17,62 @@ BOLD = "\033[1m"  # Bold
 UNDERLINE = "\033[4m"  # Underline
 
 
-def logger(func):
+def _started(func):
+    print(f"{HEADER}Starting {func.__name__}()...{ENDC}")
+    return time.time()
+
+
+def _finished(func, start_time):
+    current_time = datetime.now().strftime("%H:%M:%S")
+    print(
+        f"{OKCYAN}{current_time} [INFO] {BOLD}{func.__name__}() took {round(time.time() - start_time, 3)} seconds.{ENDC}"
+    )
+
+
+def _failed(func, e):
+    current_time = datetime.now().strftime("%H:%M:%S")
+    print(f"{FAIL}{current_time} [ERROR] {BOLD}{func.__name__}()\n{e}{ENDC}")
+
+
+def logger(func=None, *, reraise=False):
+    """Logs and traces every call of the function, plain or coroutine.
+
+    Errors are printed and the call returns None, unless `reraise` is set.
+    """
+    if func is None:
+        return partial(logger, reraise=reraise)
+
+    if asyncio.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start_time = _started(func)
+            try:
+                with trace.span(func.__qualname__):
+                    result = await func(*args, **kwargs)
+            except Exception as e:
+                _failed(func, e)
+                if reraise:
+                    raise
+                return
+            _finished(func, start_time)
+            return result
+
+        return async_wrapper
+
+    @wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = time.time()
-        print(f"{HEADER}Starting {func.__name__}()...{ENDC}")
-        current_time = datetime.now().strftime("%H:%M:%S")
+        start_time = _started(func)
         try:
-            result = func(*args, **kwargs)
-            end_time = time.time()
-            print(
-                f"{OKCYAN}{current_time} [INFO] {BOLD}{func.__name__}() took {round(end_time - start_time, 3)} seconds.{ENDC}"
-            )
-            return result
+            with trace.span(func.__qualname__):
+                result = func(*args, **kwargs)
         except Exception as e:
-            print(f"{FAIL}{current_time} [ERROR] {BOLD}{func.__name__}()\n{e}{ENDC}")
+            _failed(func, e)
+            if reraise:
+                raise
             return
+        _finished(func, start_time)
+        return result
 
     return wrapper
 
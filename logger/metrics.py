@@ -0,0 +1,139 @@
+import os
+import threading
+from bisect import bisect_left
+
+METRICS_PATH = os.environ.get("METRICS_PATH", "metrics.prom")
+PREFIX = "marketeer_"
+
+# seconds, from a cached lookup to a full render
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+FPS_BUCKETS = (5, 10, 25, 50, 100, 200, 400, 800)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the quantile, the last bound past it."""
+        if self.count == 0:
+            return 0.0
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= q * self.count:
+                return bound
+        return self.buckets[-1]
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Registry:
+    """Counters and histograms by name and labels, shared by every thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def count(self, name: str, amount: float = 1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(buckets)
+            self.histograms[key].observe(value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = {
+                name + _format_labels(labels): value
+                for (name, labels), value in self.counters.items()
+            }
+            histograms = {
+                name
+                + _format_labels(labels): {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                }
+                for (name, labels), histogram in self.histograms.items()
+            }
+        return {"counters": counters, "histograms": histograms}
+
+    def prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        lines = []
+        typed = set()
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {PREFIX}{name} counter")
+                    typed.add(name)
+                lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value:g}")
+
+            for (name, labels), histogram in sorted(
+                self.histograms.items(), key=lambda item: item[0]
+            ):
+                if name not in typed:
+                    lines.append(f"# TYPE {PREFIX}{name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        f"{PREFIX}{name}_bucket"
+                        f"{_format_labels(labels, (('le', f'{bound:g}'),))} {cumulative}"
+                    )
+                lines.append(
+                    f"{PREFIX}{name}_bucket"
+                    f"{_format_labels(labels, (('le', '+Inf'),))} {histogram.count}"
+                )
+                lines.append(
+                    f"{PREFIX}{name}_sum{_format_labels(labels)} {histogram.sum:g}"
+                )
+                lines.append(
+                    f"{PREFIX}{name}_count{_format_labels(labels)} {histogram.count}"
+                )
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+REGISTRY = Registry()
+count = REGISTRY.count
+observe = REGISTRY.observe
+snapshot = REGISTRY.snapshot
+prometheus = REGISTRY.prometheus
+
+
+def write_prometheus(path: str = METRICS_PATH, registry: Registry = REGISTRY):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as file:
+        file.write(registry.prometheus())
+    os.replace(tmp, path)
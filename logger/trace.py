@@ -0,0 +1,113 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from functools import partial
+from typing import Optional
+
+from logger import metrics
+
+TRACE_PATH = os.environ.get("TRACE_PATH", "trace.jsonl")
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    duration: Optional[float] = None
+    attributes: dict = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+class TraceWriter:
+    """Appends every finished span to a JSON-lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def write(self, span: Span):
+        line = json.dumps(asdict(span), default=str)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a")
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+# tasks copy the context they are created in, so spans nest across coroutines
+_current = contextvars.ContextVar("span", default=None)
+_writer = None
+
+
+def export_to(path: str = TRACE_PATH):
+    """Writes the spans finished from now on to `path`."""
+    global _writer
+    if _writer is not None:
+        _writer.close()
+    _writer = TraceWriter(path) if path else None
+
+
+def close():
+    export_to(None)
+
+
+def current() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Times the block as a child of the current span.
+
+    Every span's duration also goes into the `span_seconds` histogram, so the
+    name should not carry ids; those belong in the attributes.
+    """
+    parent = _current.get()
+    new = Span(
+        name=name,
+        trace_id=parent.trace_id if parent else uuid.uuid4().hex[:16],
+        span_id=uuid.uuid4().hex[:16],
+        parent_id=parent.span_id if parent else None,
+        start=time.time(),
+        attributes=attributes,
+    )
+    token = _current.set(new)
+    started = time.perf_counter()
+    try:
+        yield new
+    except BaseException as e:
+        new.error = repr(e)
+        raise
+    finally:
+        new.duration = time.perf_counter() - started
+        _current.reset(token)
+        metrics.observe("span_seconds", new.duration, span=name)
+        if _writer is not None:
+            _writer.write(new)
+
+
+def in_context(fn, *args, **kwargs):
+    """Binds the call to the current context, for executors that drop it.
+
+    `asyncio.to_thread` carries the context over itself, `run_in_executor`
+    does not.
+    """
+    return partial(contextvars.copy_context().run, fn, *args, **kwargs)
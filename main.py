@@ -1,450 +1,1038 @@
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
-import os
 import time
 
-from pytube import YouTube
-from bs4 import BeautifulSoup
-from openai import OpenAI
+# taken before the other imports so the startup report includes them
+STARTED_AT = time.time()
+
+import argparse
+import asyncio
+import json
+import os
+import sys
 
-import re
 from dataclasses import dataclass
 from dotenv import load_dotenv
 
-import pysrt
-from moviepy.editor import (
-    VideoFileClip,
-    TextClip,
-    CompositeVideoClip,
-    clips_array,
-)
-from moviepy.config import change_settings
-from moviepy.video.fx import resize
-import moviepy.video.fx.all as vfx
-import textwrap
-
-
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-
-print("--- Initializing Marketeer...")
+# moviepy, selenium, pytube, bs4, numpy, aiohttp and openai are imported where
+# they are used, a command only pays for the ones it needs
+from browser.pool import DriverPool
+from llm.api import OpenAIApi
+from llm.cache import ResponseCache
+from llm.viral import ViralScorer
+from logger import log, metrics, trace
+from media.ffmpeg import probe, use_ffmpeg
+from render.background import BackgroundAssets
+from pipeline.stages import Pipeline, Stage
+from render.scheduler import RENDER_WORKERS, RenderScheduler
+from store.artifacts import ArtifactStore, video_id
+from store.ledger import Ledger, job_key
+from transcription.service import TranscriptService
+from transcription.words import words_to_srt
+
+IMPORT_SECONDS = time.time() - STARTED_AT
+
+log.info("Initializing Marketeer...")
 load_dotenv()
-ENGAGEMENT_THRESHOLD = 40
+# mean engagement (0-100) over a whole clip window for it to be a candidate.
+# It used to be compared against single heat map points, where one spike was
+# enough; a window mean is stricter, so lower it to let more videos past the
+# default 150-180s window
+ENGAGEMENT_THRESHOLD = float(os.environ.get("ENGAGEMENT_THRESHOLD", 40))
+CLIP_LENGTH = 30
+CLIPS_PER_VIDEO = 1
+# "range" fetches only the bytes of the clip window, "full" the whole video
+DOWNLOAD_MODE = os.environ.get("DOWNLOAD_MODE", "range")
+# one of media.cut.CUT_MODES: "moviepy", "copy" or "smart"
+CUT_MODE = os.environ.get("CUT_MODE", "copy")
+# "moviepy" composites frame by frame, "ffmpeg" renders in one filter graph
+RENDERER = os.environ.get("RENDERER", "moviepy")
 DEV = os.environ.get("ENV") == "development"
+DRIVER_POOL_SIZE = int(os.environ.get("DRIVER_POOL_SIZE", 4))
+DRIVER_MAX_LOADS = int(os.environ.get("DRIVER_MAX_LOADS", 50))
+# workers per pipeline stage; downloads also bound how many sources sit on disk
+STAGE_WORKERS = {
+    "engagement": DRIVER_POOL_SIZE,
+    "download": int(os.environ.get("DOWNLOAD_WORKERS", 2)),
+    "cut": RENDER_WORKERS,
+    "transcribe": 4,
+    "render": RENDER_WORKERS,
+    # uploaders cap their own platform, these only bound the renders in flight
+    "publish": int(os.environ.get("PUBLISH_WORKERS", 4)),
+}
+STAGE_QUEUE_SIZE = int(os.environ.get("STAGE_QUEUE_SIZE", 2))
+PIPELINE_STATS_INTERVAL = 30
+# seconds between the polls of `main.py watch`
+WATCH_INTERVAL = float(os.environ.get("WATCH_INTERVAL", 900))
+# the stages of a clip job, each one checkpointed in the ledger
+JOB_STAGES = ["download", "cut", "transcribe", "render", "publish"]
+# what a daemon job can ask for instead of CUT_MODE and RENDERER
+RENDER_PROFILES = {
+    "fast": {"cut": "copy", "renderer": "ffmpeg"},
+    "precise": {"cut": "smart", "renderer": "ffmpeg"},
+    "moviepy": {"cut": "smart", "renderer": "moviepy"},
+}
+# daemon jobs worked on at once, their stages share the pools below
+DAEMON_JOBS = int(os.environ.get("DAEMON_JOBS", 4))
+DAEMON_WARM_DRIVERS = int(os.environ.get("DAEMON_WARM_DRIVERS", 1))
 
 ffmpeg_path = "/usr/local/bin/ffmpeg" if DEV else "/usr/bin/ffmpeg"
-change_settings({"FFMPEG_BINARY": ffmpeg_path})
 
-if DEV:
-    from selenium.webdriver.firefox.options import Options as FirefoxOptions
-else:
-    from selenium.webdriver.chrome.service import Service
-    from selenium.webdriver.chrome.options import Options as ChromeOptions
 
+def create_driver():
+    from selenium import webdriver
 
-@dataclass
-class Engagement:
-    seconds: int
-    minutes: int
-    engagement: int
+    if DEV:
+        from selenium.webdriver.firefox.options import Options as FirefoxOptions
 
+        log.info("Using Firefox (DEV)")
+        options = FirefoxOptions()
+        options.binary_location = "/usr/bin/chromium-browser"
+    else:
+        from selenium.webdriver.chrome.options import Options as ChromeOptions
 
-class Marketeer:
-    options = FirefoxOptions() if DEV else ChromeOptions()
-    driver = None
+        log.info("Using Chrome (PROD)")
+        options = ChromeOptions()
 
-    if DEV:
-        options.binary_location = "/usr/bin/chromium-browser"
     # options.add_extension("adblock.crx")
     options.add_argument("--headless")
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
 
     if DEV:
-        print("--- Using Firefox (DEV)\n")
-        driver = webdriver.Firefox(options=options)
-    else:
-        print("--- Using Chrome (PROD)\n")
-        chrome_driver_path = "/usr/bin/chromedriver"
-        service = Service(executable_path=chrome_driver_path)
-        driver = webdriver.Chrome(service=service, options=options)
-
-    def __init__(self):
-        self.executor = ThreadPoolExecutor(max_workers=8)
-        self.client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-        self.driver = self.driver
-        self.transcript_folder = "transcripts"
-        self.video_folder = "video"
-        self.out_folder = "out"
+        return webdriver.Firefox(options=options)
 
-    async def get_video_urls(self, channel_name):
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(
-            self.executor, self._get_video_urls, channel_name
-        )
+    from selenium.webdriver.chrome.service import Service
 
-    def _get_video_urls(self, channel_name):
-        print("--- Fetching video URLs")
-        self.driver.get(f"https://www.youtube.com/c/{channel_name}/videos")
+    chrome_driver_path = "/usr/bin/chromedriver"
+    service = Service(executable_path=chrome_driver_path)
+    return webdriver.Chrome(service=service, options=options)
 
-        try:
-            aria_label = "Reject all"
 
-            button = self.driver.find_element(
-                By.XPATH, f"//button[@aria-label='{aria_label}']"
+@dataclass
+class ClipJob:
+    url: str
+    video_id: str
+    start_time: int
+    end_time: int
+    clip_path: str = None
+    srt_path: str = None
+    output_path: str = None
+    title: str = "NO WAY THIS HAPPENED😱 (watch until the end)"
+    # one of RENDER_PROFILES, None for the Marketeer's own settings
+    profile: str = None
+
+    @property
+    def window(self):
+        return [self.start_time, self.end_time]
+
+    @property
+    def key(self):
+        key = job_key(self.video_id, self.start_time, self.end_time)
+        # the same window rendered another way is another job
+        return f"{key}@{self.profile}" if self.profile else key
+
+
+class Marketeer:
+    def __init__(
+        self,
+        driver_pool_size=DRIVER_POOL_SIZE,
+        cut_mode=CUT_MODE,
+        renderer=RENDERER,
+        render_workers=RENDER_WORKERS,
+    ):
+        # only a path here, MoviePy is configured in the workers that render
+        use_ffmpeg(ffmpeg_path)
+        # I/O-bound work runs on threads, encoding and compositing on processes
+        self.scheduler = RenderScheduler(render_workers=render_workers)
+        self.executor = self.scheduler.io
+        self.api = OpenAIApi()
+        self.driver_pool_size = driver_pool_size
+        self.cut_mode = cut_mode
+        self.renderer = renderer
+        # source transcriptions running next to the downloads, by video ID
+        self._transcribing = {}
+        # created on first use, a command only opens the files and pools it needs
+        self._llm_cache = None
+        self._viral = None
+        self._ranker = None
+        self._drivers = None
+        self._lister = None
+        self._videos = None
+        self._watcher = None
+        self._backgrounds = None
+        self._store = None
+        self._transcripts = None
+        self._ledger = None
+        self._publisher = None
+        self.ready_at = time.time()
+
+    @property
+    def llm_cache(self) -> ResponseCache:
+        if self._llm_cache is None:
+            self._llm_cache = ResponseCache()
+        return self._llm_cache
+
+    @property
+    def viral(self) -> ViralScorer:
+        if self._viral is None:
+            self._viral = ViralScorer(self.api, self.llm_cache)
+        return self._viral
+
+    @property
+    def ranker(self):
+        if self._ranker is None:
+            from engagement.ranker import WindowRanker
+
+            self._ranker = WindowRanker()
+        return self._ranker
+
+    @property
+    def drivers(self) -> DriverPool:
+        if self._drivers is None:
+            self._drivers = DriverPool(
+                create_driver, size=self.driver_pool_size, max_loads=DRIVER_MAX_LOADS
             )
-            button.click()
-            print("--- Clicked button")
-            self.driver.implicitly_wait(2)
-        except Exception as e:
-            print(e)
+        return self._drivers
 
-        print("--- Waited 1/2")
-        self.driver.implicitly_wait(2)
+    @property
+    def lister(self):
+        if self._lister is None:
+            from scraper.channel import ChannelLister
 
-        # scroll once to load more videos
-        print("--- Scrolling to the bottom of the page")
-        self.driver.find_element(By.TAG_NAME, "body").send_keys(Keys.END)
-        self.driver.implicitly_wait(1)
+            self._lister = ChannelLister()
+        return self._lister
 
-        soup = BeautifulSoup(self.driver.page_source, "html.parser")
+    @property
+    def videos(self):
+        if self._videos is None:
+            from store.videos import VideoIndex
 
-        if len(soup.find_all("a", {"id": "thumbnail"})) <= 1:
-            print("--- Initially, no videos found, scrolling and waiting")
-            self.driver.find_element(By.TAG_NAME, "body").send_keys(Keys.END)
-            self.driver.implicitly_wait(1)
-            print("--- Scrolled and done waiting")
+            self._videos = VideoIndex()
+        return self._videos
 
-        soup = BeautifulSoup(self.driver.page_source, "html.parser")
+    @property
+    def watcher(self):
+        if self._watcher is None:
+            from scraper.watcher import ChannelWatcher
 
-        video_urls = []
-        for link in soup.find_all("a", {"id": "thumbnail"}):
-            href = link.get("href")
-            if href is None:
-                continue
-            if href.startswith("/watch"):
-                video_urls.append(f"https://www.youtube.com{href}")
+            self._watcher = ChannelWatcher(
+                self.videos, self.lister, fallback=self.browse_video_urls
+            )
+        return self._watcher
+
+    @property
+    def backgrounds(self) -> BackgroundAssets:
+        if self._backgrounds is None:
+            self._backgrounds = BackgroundAssets()
+        return self._backgrounds
+
+    @property
+    def store(self) -> ArtifactStore:
+        if self._store is None:
+            self._store = ArtifactStore()
+        return self._store
+
+    @property
+    def transcripts(self) -> TranscriptService:
+        if self._transcripts is None:
+            self._transcripts = TranscriptService(self.api, self.store)
+        return self._transcripts
+
+    @property
+    def ledger(self) -> Ledger:
+        if self._ledger is None:
+            self._ledger = Ledger(JOB_STAGES)
+        return self._ledger
+
+    @property
+    def publisher(self):
+        if self._publisher is None:
+            from uploader.fanout import Publisher, uploaders_from_env
+
+            self._publisher = Publisher(uploaders_from_env())
+        return self._publisher
+
+    async def close(self):
+        for task in self._transcribing.values():
+            task.cancel()
+        if self._drivers is not None:
+            self._drivers.close()
+        self.scheduler.shutdown()
+        await self.api.close()
+        if self._publisher is not None:
+            await self._publisher.close()
+        if self._watcher is not None:
+            await self._watcher.close()
+        for resource in (self._ledger, self._videos, self._store):
+            if resource is not None:
+                resource.close()
 
-        if len(video_urls) > 3:
-            end = min(10, len(video_urls) - 1)
-            video_urls = video_urls[2:end]
+    async def get_video_urls(self, channel_name):
+        log.info("Listing channel videos over HTTP")
+        video_urls = await self.lister.video_urls(channel_name)
+        if len(video_urls) > 0:
+            log.info(f"{len(video_urls)} videos found")
+            return video_urls
 
-        print(len(video_urls), "videos found")
-        return video_urls
+        log.warn("HTTP listing found nothing, falling back to the browser")
+        return await self.browse_video_urls(channel_name)
 
-    async def create_video_clip(self, url, start_time, end_time):
+    async def browse_video_urls(self, channel_name):
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(
-            self.executor, self._create_video_clip, url, start_time, end_time
+        video_urls = await loop.run_in_executor(
+            self.executor, trace.in_context(self._get_video_urls, channel_name)
         )
+        log.info(f"{len(video_urls)} videos found")
+        return video_urls
 
-    def _create_video_clip(self, url, start_time, end_time):
-        yt = YouTube(url)
-        filename = yt.title.replace(" ", "_").lower() + ".mp4"
-
-        full_path = f"{self.video_folder}/{filename}"
-        clip_filename = f"clip_{start_time}_{end_time}_{filename}"
-        full_clip_path = f"{self.video_folder}/{clip_filename}"
-
-        # if the video is not already downloaded, download it
-        if not os.path.exists(full_clip_path):
-            if not os.path.exists(full_path):
-                print("--- Downloading video", filename)
-                try:
-                    yt.streams.filter(progressive=True, file_extension="mp4").order_by(
-                        "resolution"
-                    ).desc().first().download(
-                        output_path=self.video_folder, filename=filename
-                    )
-                    print("--- Download done")
-                except Exception as e:
-                    print("--- Download failed")
-                    print(e)
+    def _get_video_urls(self, channel_name):
+        from bs4 import BeautifulSoup
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.common.keys import Keys
 
-                    # since the video failed to download, we can't create a clip
-                    return None
+        with self.drivers.driver() as driver:
+            log.info("Fetching video URLs")
+            driver.get(f"https://www.youtube.com/c/{channel_name}/videos")
 
-            print("--- Creating clip")
             try:
-                with VideoFileClip(full_path) as video:
-                    new = video.subclip(start_time, end_time)
-                    new.write_videofile(
-                        full_clip_path, codec="libx264", audio_codec="aac"
-                    )
-                    print("--- Clip done")
+                aria_label = "Reject all"
+
+                button = driver.find_element(
+                    By.XPATH, f"//button[@aria-label='{aria_label}']"
+                )
+                button.click()
+                log.info("Clicked button")
+                driver.implicitly_wait(2)
             except Exception as e:
-                print("--- Clip failed -> aborting process")
-                print(e)
+                log.warn("No consent button to reject:", e)
+
+            log.info("Waited 1/2")
+            driver.implicitly_wait(2)
+
+            # scroll once to load more videos
+            log.info("Scrolling to the bottom of the page")
+            driver.find_element(By.TAG_NAME, "body").send_keys(Keys.END)
+            driver.implicitly_wait(1)
+
+            soup = BeautifulSoup(driver.page_source, "html.parser")
+
+            if len(soup.find_all("a", {"id": "thumbnail"})) <= 1:
+                log.info("Initially, no videos found, scrolling and waiting")
+                driver.find_element(By.TAG_NAME, "body").send_keys(Keys.END)
+                driver.implicitly_wait(1)
+                log.info("Scrolled and done waiting")
+
+            soup = BeautifulSoup(driver.page_source, "html.parser")
+
+            video_urls = []
+            for link in soup.find_all("a", {"id": "thumbnail"}):
+                href = link.get("href")
+                if href is None:
+                    continue
+                if href.startswith("/watch"):
+                    video_urls.append(f"https://www.youtube.com{href}")
+
+            return video_urls
+
+    def _source_params(self, job):
+        # a partial download only holds this window, a full one serves any window
+        if DOWNLOAD_MODE == "range":
+            return {"window": job.window, "download": DOWNLOAD_MODE}
+        return {"download": DOWNLOAD_MODE}
+
+    def _cut_mode(self, job):
+        return RENDER_PROFILES.get(job.profile, {}).get("cut", self.cut_mode)
+
+    def _renderer(self, job):
+        return RENDER_PROFILES.get(job.profile, {}).get("renderer", self.renderer)
+
+    def _clip_params(self, job):
+        return {"window": job.window, "cut": self._cut_mode(job)}
+
+    def _short_params(self, job):
+        return {**self._clip_params(job), "renderer": self._renderer(job)}
+
+    async def discover_stage(self, channel_name):
+        # only what the video index has not seen, or sees trending again
+        urls = [video.url for video in await self.watcher.poll_channel(channel_name)]
+        if len(urls) == 0:
+            log.info(f"Nothing new on {channel_name}")
+        return urls
+
+    async def engagement_stage(self, url, profile=None):
+        engagement = await self.get_video_engagement(url)
+        windows = []
+        if engagement is not None:
+            windows = await self.choose_windows(url, engagement)
+        if len(windows) == 0:
+            log.warn(
+                f"No window above {ENGAGEMENT_THRESHOLD:.0f} mean engagement,"
+                " using the default window"
+            )
+            from engagement.heatmap import Window
 
-                # since the clip failed, we can't transcribe it
-                return None
+            windows = [Window(150, 180, 0)]
 
+        jobs = []
+        for window in windows:
+            job = ClipJob(url, video_id(url), window.start, window.end, profile=profile)
+            # known jobs are either done or already resumed from the ledger
+            if not await self.scheduler.run_io(self.ledger.add, job):
+                log.info(f"Already clipped {window.start}-{window.end}, skipping")
+                continue
+            log.info(f"Clipping {window.start}-{window.end} ({window.score:.0f})")
+            jobs.append(job)
+        # only now the watcher may forget the video, it is in the ledger
+        await self.scheduler.run_io(self.videos.queue, video_id(url))
+        if jobs:
+            self._transcribe_source(jobs[0])
+        return jobs
+
+    def _transcribe_source(self, job):
+        """Starts transcribing the source on its own, next to download and cut.
+
+        The transcribe stage waits for the same transcription instead of
+        starting another one, and retries it if this one failed.
+        """
+        if job.video_id in self._transcribing:
+            return
+        if self.store.get(job.video_id, "transcript", self._clip_params(job)):
+            return
+
+        def done(task):
+            self._transcribing.pop(job.video_id, None)
+            if not task.cancelled() and task.exception() is not None:
+                log.warn(f"Transcribing {job.video_id} failed:", task.exception())
+
+        task = asyncio.ensure_future(self.transcripts.words(job.video_id, job.url))
+        task.add_done_callback(done)
+        self._transcribing[job.video_id] = task
+
+    async def download_stage(self, job):
+        if self.store.get(job.video_id, "clip", self._clip_params(job)) is not None:
+            return job
+
+        source_params = self._source_params(job)
+        if self.store.get(job.video_id, "source", source_params) is None:
+            with self.store.writer(
+                job.video_id, "source", source_params, ".mp4"
+            ) as tmp_path:
+                await self.scheduler.run_io(self._download, job, tmp_path)
+        return job
+
+    async def cut_stage(self, job):
+        from media.cut import cut_clip
+        from media.cut import stats as cut_stats
+
+        clip_params = self._clip_params(job)
+        job.clip_path = self.store.get(job.video_id, "clip", clip_params)
+        if job.clip_path is not None:
+            log.info("Clip already exists")
+            return job
+
+        source_params = self._source_params(job)
+        with self.store.pinned(
+            job.video_id, "source", source_params
+        ) as source_path, self.store.writer(
+            job.video_id, "clip", clip_params, ".mp4"
+        ) as tmp_path:
+            if source_path is None:
+                raise FileNotFoundError(f"No downloaded source for {job.video_id}")
+
+            log.info("Creating clip")
+            result = await self.scheduler.run_cpu(
+                cut_clip,
+                source_path,
+                tmp_path,
+                job.start_time,
+                job.end_time,
+                self._cut_mode(job),
+            )
+        # the worker's tally stays in its process, the result comes back here
+        cut_stats.record(result)
+        # a stream copy moves the start, the transcript has to follow it
+        self.store.put(
+            job.video_id,
+            "cut",
+            clip_params,
+            json.dumps([result.start, result.end]),
+            ".json",
+        )
+        log.info("Clip done")
+
+        if DOWNLOAD_MODE == "range":
+            # nothing but this clip can use a partial download
+            self.store.remove(job.video_id, "source", source_params)
+
+        job.clip_path = self.store.get(job.video_id, "clip", clip_params)
+        return job
+
+    async def transcribe_stage(self, job):
+        await self._transcribe(job)
+        return job
+
+    async def render_stage(self, job):
+        short_params = self._short_params(job)
+        job.output_path = self.store.get(job.video_id, "short", short_params)
+        if job.output_path is not None:
+            log.info("Subtitled video already exists")
+            return job
+
+        log.info("Creating subtitled video")
+        clip_params = self._clip_params(job)
+        with self.store.pinned(
+            job.video_id, "clip", clip_params
+        ) as clip_path, self.store.pinned(
+            job.video_id, "transcript", clip_params
+        ) as srt_path, self.store.writer(
+            job.video_id, "short", short_params, ".mp4"
+        ) as output_path:
+            await self.create_video_with_subtitles(
+                clip_path or job.clip_path,
+                srt_path or job.srt_path,
+                output_path,
+                self._renderer(job),
+            )
+        job.output_path = self.store.get(job.video_id, "short", short_params)
+        log.info("Subtitled video done")
+        return job
+
+    async def publish_stage(self, job):
+        await self._publish(job)
+        return job
+
+    def _artifact(self, stage, job):
+        """The file a finished stage leaves behind, what its checkpoint verifies."""
+        if stage == "download":
+            return self.store.get(job.video_id, "source", self._source_params(job))
+        if stage == "cut":
+            return self.store.get(job.video_id, "clip", self._clip_params(job))
+        if stage == "transcribe":
+            return self.store.get(job.video_id, "transcript", self._clip_params(job))
+        if stage == "render":
+            return self.store.get(job.video_id, "short", self._short_params(job))
+        return None
+
+    def _checkpointed(self, stage, fn):
+        """Skips stages the ledger has intact checkpoints for, counts attempts of the rest."""
+
+        async def run(job):
+            if await self.scheduler.run_io(self.ledger.completed, job, stage):
+                # what later stages read from the job
+                job.clip_path = job.clip_path or self._artifact("cut", job)
+                job.srt_path = job.srt_path or self._artifact("transcribe", job)
+                job.output_path = job.output_path or self._artifact("render", job)
+                job.title = self.ledger.title(job) or job.title
+                return job
+
+            if not await self.scheduler.run_io(self.ledger.begin, job, stage):
+                log.error(f"{stage} of {job.key} ran out of attempts, giving up")
+                return None
             try:
-                os.remove(full_path)
+                job = await fn(job)
             except Exception as e:
-                print(e)
+                await self.scheduler.run_io(self.ledger.fail, job, stage, e)
+                raise
+            await self.scheduler.run_io(
+                self.ledger.checkpoint, job, stage, self._artifact(stage, job)
+            )
+            return job
+
+        return run
+
+    def resumable_jobs(self) -> list[ClipJob]:
+        jobs = []
+        for row in self.ledger.unfinished():
+            job = ClipJob(
+                row["url"],
+                row["video_id"],
+                row["start_time"],
+                row["end_time"],
+                profile=row["job_id"].partition("@")[2] or None,
+            )
+            log.info(f"Resuming {job.key} after {row['stage'] or 'nothing'}")
+            jobs.append(job)
+        return jobs
+
+    def pipeline(self) -> Pipeline:
+        """The stages from channel to upload, each with its own workers and queue."""
+        stages = [
+            ("discover", self.discover_stage),
+            ("engagement", self.engagement_stage),
+        ] + [
+            (name, self._checkpointed(name, getattr(self, f"{name}_stage")))
+            for name in JOB_STAGES
+        ]
+        from scraper.watcher import WATCH_CONCURRENCY
+
+        # channels are polled side by side, the watcher caps them too
+        workers = {**STAGE_WORKERS, "discover": WATCH_CONCURRENCY}
+        return Pipeline(
+            [
+                Stage(name, fn, workers.get(name, 1), STAGE_QUEUE_SIZE)
+                for name, fn in stages
+            ],
+            stats_interval=PIPELINE_STATS_INTERVAL,
+        )
 
-        clip_filename = clip_filename[:-4]
-        srt_path = f"{self.transcript_folder}/{clip_filename}.srt"
-        title = "NO WAY THIS HAPPENED😱 (watch until the end)"
+    async def warm(self, drivers=DAEMON_WARM_DRIVERS):
+        """Starts what the first job would otherwise wait for, for the daemon."""
+        started = time.time()
+        renderers = {self.renderer} | {
+            profile["renderer"] for profile in RENDER_PROFILES.values()
+        }
+        warming = {
+            "render workers": self.scheduler.warm(
+                [f"render.{name}_renderer" for name in renderers]
+            ),
+            "backgrounds": self.scheduler.run_io(self.backgrounds.prepare_all),
+            "browsers": self.scheduler.run_io(self.drivers.warm, drivers),
+            "OpenAI client": self.scheduler.run_io(lambda: self.api.client),
+        }
+        results = await asyncio.gather(*warming.values(), return_exceptions=True)
+        for name, result in zip(warming, results):
+            # what failed here fails again, with its error, on the job that needs it
+            if isinstance(result, Exception):
+                log.warn(f"Could not warm up the {name}:", result)
+        log.info(f"Warmed up in {time.time() - started:.2f}s")
+
+    def stats(self) -> dict:
+        from media.cut import stats as cut_stats
+
+        return {
+            "render": self.scheduler.stats(),
+            "cut": cut_stats.stats(),
+            "api": self.api.metrics.stats(),
+            "llm_cache": self.llm_cache.stats(),
+            "window_ranking": self.ranker.stats(),
+            "upload": self.publisher.stats(),
+            "watch": self.watcher.stats(),
+        }
+
+    async def run_clip_job(self, job):
+        """Runs the checkpointed stages of one clip job in order."""
+        for name in JOB_STAGES:
+            job = await self._checkpointed(name, getattr(self, f"{name}_stage"))(job)
+            if job is None:
+                raise RuntimeError(f"{name} ran out of attempts")
+        return job
+
+    async def handle_job(self, daemon_job):
+        """Turns a daemon job into clip jobs and runs them, side by side."""
+        request = daemon_job.request
+        if request.window is not None:
+            start, end = request.window
+            clips = [
+                ClipJob(
+                    request.url,
+                    video_id(request.url),
+                    start,
+                    end,
+                    profile=request.profile,
+                )
+            ]
+            # asked for explicitly, so it runs even if the ledger knows it
+            await self.scheduler.run_io(self.ledger.add, clips[0])
+            self._transcribe_source(clips[0])
+        else:
+            urls = [request.url]
+            if request.channel is not None:
+                urls = await self.discover_stage(request.channel)
+            found = await asyncio.gather(
+                *[self.engagement_stage(url, request.profile) for url in urls]
+            )
+            clips = [clip for jobs in found for clip in jobs]
+        daemon_job.clips = [clip.key for clip in clips]
 
-        if not os.path.exists(srt_path):
-            transcript = self._get_video_transcript(full_clip_path)
+        tasks = [asyncio.ensure_future(self.run_clip_job(clip)) for clip in clips]
+        try:
+            done = await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            # a shutdown leaves them to resume, a cancel takes them out for good
+            if daemon_job.status == "cancelling":
+                await self.scheduler.run_io(self.ledger.cancel, clips)
+            raise
+        finally:
+            # one failed clip fails the job, its siblings stop with it
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        daemon_job.outputs = [clip.output_path for clip in done if clip.output_path]
+
+    def _download(self, job, path):
+        from pytube import YouTube
+
+        from media.download import download_clip_source
+
+        log.info("Downloading video", job.video_id)
+        stream = (
+            YouTube(job.url)
+            .streams.filter(progressive=True, file_extension="mp4")
+            .order_by("resolution")
+            .desc()
+            .first()
+        )
+        if DOWNLOAD_MODE == "range":
+            download_clip_source(stream.url, path, job.start_time, job.end_time)
+        else:
+            stream.download(
+                output_path=os.path.dirname(path), filename=os.path.basename(path)
+            )
+            metrics.count("bytes_downloaded_total", os.path.getsize(path), kind="full")
+        log.info("Download done")
+
+    def _title_from_transcript(self, lines):
+        for line in lines:
+            if (
+                len(line.strip()) > 0
+                and len(line.strip()) < 25
+                and not line.strip().isdigit()
+            ):
+                title = line.strip()
+                return title.split(". ")[0][:-1] + "👀"
+        return None
+
+    def _cut_window(self, job):
+        path = self.store.get(job.video_id, "cut", self._clip_params(job))
+        if path is None:
+            return job.start_time, job.end_time
+        with open(path, "r") as file:
+            return tuple(json.load(file))
+
+    async def _transcribe(self, job):
+        # the cut mode decides where the clip really starts, so it is part of the key
+        params = self._clip_params(job)
+        job.srt_path = self.store.get(job.video_id, "transcript", params)
+
+        if job.srt_path is None:
+            start, end = self._cut_window(job)
+            transcript = await self.transcripts.clip_srt(
+                job.video_id, start, end, job.url
+            )
             try:
-                lines = transcript.split("\n")
-                for line in lines:
-                    if (
-                        len(line.strip()) > 0
-                        and len(line.strip()) < 25
-                        and not line.strip().isdigit()
-                    ):
-                        title = line.strip()
-                        title = title.split(". ")[0][:-1] + "👀"
-                        break
+                job.title = (
+                    self._title_from_transcript(transcript.split("\n")) or job.title
+                )
             except Exception as e:
-                print(e)
-            with open(srt_path, "w") as file:
-                file.write(transcript)
+                log.warn("No title in the transcript:", e)
+            job.srt_path = self.store.put(
+                job.video_id, "transcript", params, transcript, ".srt"
+            )
         else:
-            print("--- Transcript already exists")
-            with open(srt_path, "r") as file:
-                lines = file.readlines()
-                for line in lines:
-                    if (
-                        len(line.strip()) > 0
-                        and len(line.strip()) < 25
-                        and not line.strip().isdigit()
-                    ):
-                        title = line.strip()
-                        title = title.split(". ")[0][:-1] + "👀"
-                        break
-
-        print("--- Creating subtitled video")
-        video_path = f"{self.video_folder}/{clip_filename}.mp4"
-        output_path = f"{self.out_folder}/{clip_filename}.mp4"
-
-        self.create_video_with_subtitles(video_path, srt_path, output_path)
-        print("--- Subtitled video done")
-
-        successful_upload = not DEV
-
-        # post to TikTok
-        print(f"\n--- [TIKTOK]\nUploading {title} to TikTok\n({clip_filename})")
-
-        # post to YouTube
-        print(
-            f"\n--- [YOUTUBE]\nUploading {title} to YouTube Shorts\n({clip_filename})"
-        )
+            log.info("Transcript already exists")
+            with open(job.srt_path, "r") as file:
+                job.title = self._title_from_transcript(file.readlines()) or job.title
 
-        # post to Instagram
-        print(
-            f"\n--- [INSTAGRAM]\nUploading {title} to Instagram Reels\n({clip_filename})"
-        )
+    async def _publish(self, job):
+        from uploader.base import UploadError
 
-        # clean up
-        if successful_upload:
-            print("--- Removing video and transcript files")
-            try:
-                os.remove(f"{self.video_folder}/{clip_filename}.mp4")
-                os.remove(f"{self.transcript_folder}/{clip_filename}.srt")
-                os.remove(f"{self.out_folder}/{clip_filename}.mp4")
-            except Exception as e:
-                print(e)
+        clip_filename = f"{job.video_id}_{job.start_time}_{job.end_time}"
+        title = job.title
+
+        if DEV or len(self.publisher.uploaders) == 0:
+            # nothing is posted, the short stays in the store
+            for platform in ["TikTok", "YouTube Shorts", "Instagram Reels"]:
+                log.info(
+                    f"[DRY RUN] Would upload {title} to {platform} ({clip_filename})"
+                )
+            return
 
-        return full_clip_path
+        log.info(
+            f"Uploading {title} to {', '.join(self.publisher.platforms)} ({clip_filename})"
+        )
+        results = await self.publisher.publish(job.output_path, title, job.key)
+        failed = [
+            name for name, result in results.items() if isinstance(result, Exception)
+        ]
+        if failed:
+            # the uploaders remember finished posts, a retry only redoes these
+            raise UploadError(f"Uploading to {', '.join(failed)} failed")
+
+        # clip and transcript stay in the store for reruns, evicted under its budget
+        log.info("Removing uploaded video")
+        self.store.remove(job.video_id, "short", self._short_params(job))
 
     async def get_video_engagement(self, url: str):
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(
-            self.executor, self._get_video_engagement, url
+            self.executor, trace.in_context(self._get_video_engagement, url)
         )
 
     def _get_video_engagement(self, url: str):
-        try:
-            print("--- Fetching video engagement")
-            self.driver.get(url)
-            print("--- Title:", self.driver.title)
-            self.driver.implicitly_wait(2)
-            print("--- Waited 1/2")
+        from selenium.webdriver.common.by import By
 
-            try:
-                aria_label = "Reject the use of cookies and other data for the purposes described"
+        from engagement.page import engagement_from_page
 
-                button = self.driver.find_element(
-                    By.XPATH, f"//button[@aria-label='{aria_label}']"
-                )
-                button.click()
-                print("--- Clicked button")
-            except Exception as e:
-                print(e)
-
-            soup = BeautifulSoup(self.driver.page_source, "html.parser")
+        with self.drivers.driver() as driver:
+            try:
+                log.info("Fetching video engagement")
+                driver.get(url)
+                log.info("Title:", driver.title)
+                driver.implicitly_wait(2)
+                log.info("Waited 1/2")
 
-            self.driver.implicitly_wait(2)
-            print("--- Waited 2/2")
+                try:
+                    aria_label = "Reject the use of cookies and other data for the purposes described"
 
-            duration = soup.find("span", class_="ytp-time-duration").text
-            duration = sum(
-                int(x) * 60**i for i, x in enumerate(reversed(duration.split(":")))
-            )
-            print("--- Duration:", duration, "seconds")
+                    button = driver.find_element(
+                        By.XPATH, f"//button[@aria-label='{aria_label}']"
+                    )
+                    button.click()
+                    log.info("Clicked button")
+                except Exception as e:
+                    log.warn("No consent button to reject:", e)
 
-            wave = soup.find("path", class_="ytp-heat-map-path")
+                driver.implicitly_wait(2)
+                log.info("Waited 2/2")
 
-            if wave is None:
-                print("--- No wave found")
+                # engagement (0-100) for every second of the video
+                engagement = engagement_from_page(driver.page_source)
+                if engagement is None:
+                    log.warn("No wave found")
+                    return None
+                log.info("Duration:", len(engagement), "seconds")
+                return engagement
+            except Exception as e:
+                log.error(f"Could not read the engagement of {url}:", e)
                 return None
 
-            wave = wave.get("d")
-
-            bezier_pattern = re.compile(
-                r"C (\d+\.?\d*),(\d+\.?\d*) (\d+\.?\d*),(\d+\.?\d*) (\d+\.?\d*),(\d+\.?\d*)"
-            )
-            bezier_segments = bezier_pattern.findall(wave)
-
-            width = 1000
-            height = 100
-
-            engagement: list[Engagement] = []
-
-            for segment in bezier_segments:
-                x1, y1, x2, y2, x3, y3 = [float(num) for num in segment]
-
-                y1 = int(height - y1)
-                y2 = int(height - y2)
-                y3 = int(height - y3)
-
-                if (
-                    y1 > ENGAGEMENT_THRESHOLD
-                    or y2 > ENGAGEMENT_THRESHOLD
-                    or y3 > ENGAGEMENT_THRESHOLD
-                ):
-                    x, y = max([x1, x2, x3]), max([y1, y2, y3])
-                    seconds = int(x * duration / width)
-
-                    engagement.append(
-                        Engagement(
-                            seconds=seconds, minutes=int(seconds / 60), engagement=y
-                        )
-                    )
+    async def get_viral_sections(self, transcript: str):
+        return await self.viral.score(transcript)
 
-            return engagement
+    async def choose_windows(self, url: str, engagement) -> list:
+        """Ranks the candidate windows locally, asks the LLM only on close calls."""
+        vid = video_id(url)
+        ranked = self.ranker.rank(engagement, CLIP_LENGTH, None, ENGAGEMENT_THRESHOLD)
+        if self.ranker.is_clear(ranked, CLIPS_PER_VIDEO):
+            self.ranker.record(escalated=False)
+            return [candidate.window for candidate in ranked[:CLIPS_PER_VIDEO]]
 
+        # only a close call needs the words, to rank on speech and for the LLM
+        try:
+            words = await self.transcripts.words(vid, url)
         except Exception as e:
-            print(e)
-            return None
-        finally:
-            self.driver.quit()
-
-    def _get_video_transcript(self, filepath: str):
-        if not os.path.exists(filepath):
-            raise Exception(f"(404) Invalid filepath {filepath} does not exist")
-
-        print("--- Transcribing", filepath)
-        with open(filepath, "rb") as audio_file:
-            transcript = self.client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                response_format="srt",
-                prompt="Create a transcript of this video, one word at a time. There should be a new line for each word with the exact time it was spoken.",
-            )
-            return transcript
-
-    async def get_viral_sections(self, transcript: str):
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(
-            self.executor, self._get_viral_sections, transcript
+            log.warn("No transcript to break the close call with:", e)
+            return [candidate.window for candidate in ranked[:CLIPS_PER_VIDEO]]
+
+        ranked = self.ranker.rank(engagement, CLIP_LENGTH, words, ENGAGEMENT_THRESHOLD)
+        if self.ranker.is_clear(ranked, CLIPS_PER_VIDEO):
+            self.ranker.record(escalated=False)
+            return [candidate.window for candidate in ranked[:CLIPS_PER_VIDEO]]
+
+        # close call: the LLM picks among the candidates, reading only their words
+        cutoff = ranked[CLIPS_PER_VIDEO - 1].score - self.ranker.margin
+        close = [candidate for candidate in ranked if candidate.score >= cutoff]
+        log.info(f"Close call between {len(close)} windows, asking the LLM")
+        self.ranker.record(escalated=True)
+
+        transcript = words_to_srt(
+            [
+                word
+                for word in words
+                if any(c.window.start <= word.start < c.window.end for c in close)
+            ]
         )
-
-    def _get_viral_sections(self, transcript: str):
-        prompt = f"""
-            Given this transcript of a YouTube video: 
-            How engaging and shareable is the following content? 
-            Provide a very concise top 3 list of sections (a few sentences) 
-            that could go viral on YouTube shorts and TikTok 
-            \n\n'{transcript}'"""
-
-        response = self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {
-                    "role": "assistant",
-                    "content": "You are a highly intelligent and helpful assistant. You are a skilled marketer. You create tiktoks and youtube shorts with a high chance of going viral.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.2,
-            max_tokens=256,
-            frequency_penalty=0.0,
+        chosen = []
+        for part in await self.get_viral_sections(transcript):
+            overlaps = [
+                min(part.end_time, c.window.end) - max(part.start_time, c.window.start)
+                for c in close
+            ]
+            best = close[overlaps.index(max(overlaps))]
+            if max(overlaps) > 0 and best.window not in chosen:
+                chosen.append(best.window)
+
+        for candidate in ranked:
+            if candidate.window not in chosen:
+                chosen.append(candidate.window)
+        return chosen[:CLIPS_PER_VIDEO]
+
+    async def create_video_with_subtitles(
+        self, video_path, srt_path, output_path, renderer_name=None
+    ):
+        renderer_name = renderer_name or self.renderer
+        duration = (await self.scheduler.run_io(probe, video_path)).duration
+        background = await self.scheduler.run_io(self.backgrounds.window, duration)
+        log.info(f"Background {background.path} from {background.offset}s")
+
+        from render import ffmpeg_renderer, moviepy_renderer
+
+        renderer = ffmpeg_renderer if renderer_name == "ffmpeg" else moviepy_renderer
+        start = time.time()
+        await self.scheduler.run_cpu(
+            renderer.render_short,
+            video_path,
+            srt_path,
+            output_path,
+            background.path,
+            background.offset,
         )
-        return response.choices[0].message.content
-
-    def create_video_with_subtitles(self, video_path, srt_path, output_path):
-        main_video = VideoFileClip(video_path)
-        subway_surfers = VideoFileClip("video/subway_surfers.mp4").set_duration(
-            main_video.duration
-        )
-        # subway_surfers = subway_surfers.set_audio(None)
-
-        video = clips_array(
-            [[main_video.resize(height=360)], [subway_surfers.resize(height=360)]]
+        rendered = await self.scheduler.run_io(probe, output_path)
+        metrics.observe(
+            "encode_fps",
+            rendered.duration * rendered.fps / (time.time() - start),
+            buckets=metrics.FPS_BUCKETS,
+            renderer=renderer_name,
         )
-
-        subtitles = pysrt.open(srt_path)
-        subtitle_clips = []
-        for sub in subtitles:
-            start_time = sub.start.ordinal / 1000
-            end_time = sub.end.ordinal / 1000
-
-            wrapped_text = textwrap.fill(sub.text, width=30)
-            subtitle_clips.append(
-                TextClip(
-                    wrapped_text,
-                    fontsize=40,
-                    color="white",
-                    font="Impact",
-                    stroke_color="black",
-                    stroke_width=2,
-                    method="caption",
-                    size=(video.w * 0.6, 300),
-                )
-                .set_position(("center", video.h / 2 - 50))
-                .set_duration(end_time - start_time)
-                .set_start(start_time)
-            )
-
-        video_with_subtitles = CompositeVideoClip([video] + subtitle_clips)
-
-        final_video = video_with_subtitles.fx(resize.resize, height=720)
-        final_video = video_with_subtitles.fx(vfx.speedx, 1.1)
-        final_video.write_videofile(output_path, codec="libx264", audio_codec="aac")
-        final_video.close()
-        print("--- Sleeping for 2 seconds")
-        time.sleep(2)
-        print("--- Subtitled video created")
+        log.info("Subtitled video created")
 
         return output_path
 
 
-async def main():
-    marketeer = Marketeer()
-
-    urls = await marketeer.get_video_urls("BetaSquad")
-    if len(urls) == 0:
-        print("--- No videos found, returning...")
-        return
+_startup_reported = False
 
-    urls = urls[:3]
 
-    tasks = []
-    for url in urls:
-        tasks.append(marketeer.create_video_clip(url, 150, 180))
+def report_startup(ready_at: float, first_job_at: float = None):
+    """Logs how long the imports took and how long until the first job ran.
 
-    await asyncio.gather(*tasks)
+    Startup is reported once, a command that keeps running reports it early.
+    """
+    global _startup_reported
+    if _startup_reported:
+        return
+    _startup_reported = True
+    metrics.observe("startup_seconds", IMPORT_SECONDS, phase="import")
+    metrics.observe("startup_seconds", ready_at - STARTED_AT, phase="ready")
+    report = (
+        f"Startup: imports {IMPORT_SECONDS:.2f}s, "
+        f"ready after {ready_at - STARTED_AT:.2f}s"
+    )
+    if first_job_at is not None:
+        metrics.observe("startup_seconds", first_job_at - STARTED_AT, phase="first_job")
+        report += f", first job after {first_job_at - STARTED_AT:.2f}s"
+    log.info(report)
+
+
+async def run(marketeer, args):
+    from media.cut import stats as cut_stats
+
+    pipeline = marketeer.pipeline()
+    try:
+        await pipeline.run(
+            args.channels, resumed={"download": marketeer.resumable_jobs()}
+        )
+    finally:
+        log.info("Pipeline stats:", pipeline.stats())
+        log.info("Render stats:", marketeer.scheduler.stats())
+        log.info("Cut stats:", cut_stats.stats())
+        log.info("API stats:", marketeer.api.metrics.stats())
+        log.info("LLM cache stats:", marketeer.llm_cache.stats())
+        log.info("Window ranking stats:", marketeer.ranker.stats())
+        log.info("Upload stats:", marketeer.publisher.stats())
+        log.info("Watch stats:", marketeer.watcher.stats())
+    # the first job is out once any stage after discovery finished an item,
+    # resumed jobs skip the engagement stage
+    done = [stage.first_done_at for stage in pipeline.stages[1:] if stage.first_done_at]
+    return min(done, default=None)
+
+
+async def watch(marketeer, args):
+    """Runs the pipeline every interval, each round only takes what is new."""
+    first_round = True
+    while True:
+        first_job_at = await run(marketeer, args)
+        if first_round:
+            report_startup(marketeer.ready_at, first_job_at)
+            first_round = False
+        log.info(f"Polling again in {args.interval:.0f}s")
+        await asyncio.sleep(args.interval)
+
+
+async def serve(marketeer, args):
+    from daemon.jobs import JobRequest, JobRunner
+    from daemon.server import DAEMON_HOST, DAEMON_PORT, DAEMON_SOCKET, create_app
+    from daemon.server import serve as serve_app
+
+    await marketeer.warm()
+    runner = JobRunner(marketeer.handle_job, concurrency=DAEMON_JOBS)
+    for job in marketeer.resumable_jobs():
+        runner.submit(JobRequest(url=job.url, window=job.window, profile=job.profile))
+
+    app = create_app(runner, RENDER_PROFILES, marketeer.stats)
+    try:
+        await serve_app(
+            app,
+            args.host or DAEMON_HOST,
+            DAEMON_PORT if args.port is None else args.port,
+            args.socket or DAEMON_SOCKET,
+        )
+    finally:
+        await runner.shutdown()
+        log.info("Daemon stats:", runner.stats(), marketeer.stats())
+    return runner.first_done_at
+
+
+async def list_channel(marketeer, args):
+    for url in await marketeer.get_video_urls(args.channel):
+        print(url)
+    return time.time()
+
+
+async def transcribe(marketeer, args):
+    print(await marketeer.transcripts.srt(video_id(args.url), args.url))
+    return time.time()
+
+
+async def render(marketeer, args):
+    await marketeer.create_video_with_subtitles(args.clip, args.srt, args.output)
+    return time.time()
+
+
+COMMANDS = {
+    "run": run,
+    "watch": watch,
+    "serve": serve,
+    "channel": list_channel,
+    "transcribe": transcribe,
+    "render": render,
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py")
+    commands = parser.add_subparsers(dest="command")
+
+    run_parser = commands.add_parser("run", help="channels to shorts, the default")
+    run_parser.add_argument("channels", nargs="*", default=["BetaSquad"])
+    watch_parser = commands.add_parser("watch", help="poll channels for new videos")
+    watch_parser.add_argument("channels", nargs="*", default=["BetaSquad"])
+    watch_parser.add_argument("--interval", type=float, default=WATCH_INTERVAL)
+    serve_parser = commands.add_parser("serve", help="run as a daemon taking jobs")
+    # left unset here so only serve loads the daemon, which brings in aiohttp
+    serve_parser.add_argument("--host", help="default: $DAEMON_HOST or 127.0.0.1")
+    serve_parser.add_argument("--port", type=int, help="default: $DAEMON_PORT or 8765")
+    serve_parser.add_argument("--socket", help="unix socket, default: $DAEMON_SOCKET")
+    channel_parser = commands.add_parser("channel", help="list a channel's videos")
+    channel_parser.add_argument("channel")
+    transcribe_parser = commands.add_parser("transcribe", help="print a video's SRT")
+    transcribe_parser.add_argument("url")
+    render_parser = commands.add_parser("render", help="render a subtitled short")
+    render_parser.add_argument("clip")
+    render_parser.add_argument("srt")
+    render_parser.add_argument("output")
+
+    argv = sys.argv[1:] if argv is None else argv
+    # "main.py" and "main.py SomeChannel" keep running the pipeline
+    if not argv or argv[0] not in COMMANDS and not argv[0].startswith("-"):
+        argv = ["run", *argv]
+    return parser.parse_args(argv)
+
+
+async def main(args=None):
+    args = args or parse_args([])
+    trace.export_to(trace.TRACE_PATH)
+    marketeer = Marketeer()
 
-    print("--- Done")
+    first_job_at = None
+    try:
+        first_job_at = await COMMANDS[args.command](marketeer, args)
+    finally:
+        report_startup(marketeer.ready_at, first_job_at)
+        await marketeer.close()
+        metrics.write_prometheus()
+        trace.close()
+        log.info(f"Metrics in {metrics.METRICS_PATH}, trace in {trace.TRACE_PATH}")
+    log.info("Done")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,187 @@
+import os
+import re
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from logger import log
+from media.ffmpeg import run_ffmpeg
+from media.mp4 import Mp4Error, keyframe_times
+
+# "moviepy" re-encodes the whole window, "copy" stream-copies it from the
+# nearest keyframe and "smart" re-encodes only up to the first keyframe
+CUT_MODES = ("moviepy", "copy", "smart")
+
+# seconds MoviePy takes per second of clip, from the cut.moviepy benchmark
+# (30s of a 480p source in 23s); measured MoviePy cuts replace it
+MOVIEPY_CUT_RATE = float(os.environ.get("MOVIEPY_CUT_RATE", 0.75))
+
+_PTS_TIME = re.compile(r"pts_time:(\d+\.?\d*)")
+
+
+@dataclass
+class CutResult:
+    path: str
+    mode: str
+    start: float
+    end: float
+    elapsed: float
+
+
+class CutStats:
+    """Keeps the encode time per second of clip for every cut mode.
+
+    Cuts run in worker processes, so the process that schedules them records
+    the results they return.
+    """
+
+    def __init__(self, moviepy_rate: float = MOVIEPY_CUT_RATE):
+        self.moviepy_rate = moviepy_rate
+        self._lock = threading.Lock()
+        self._totals = {mode: [0.0, 0.0] for mode in CUT_MODES}
+        self.saved_seconds = 0.0
+
+    def record(self, result: CutResult):
+        with self._lock:
+            totals = self._totals[result.mode]
+            totals[0] += result.elapsed
+            totals[1] += result.end - result.start
+            self.saved_seconds += self.saved(result) or 0.0
+
+    def rate(self, mode: str):
+        elapsed, seconds = self._totals[mode]
+        return elapsed / seconds if seconds else None
+
+    def saved(self, result: CutResult):
+        """Estimated seconds saved against the MoviePy path, None for MoviePy cuts."""
+        if result.mode == "moviepy":
+            return None
+        moviepy_rate = self.rate("moviepy") or self.moviepy_rate
+        return moviepy_rate * (result.end - result.start) - result.elapsed
+
+    def stats(self) -> dict:
+        return {
+            "cuts": {
+                mode: round(self.rate(mode), 3)
+                for mode in CUT_MODES
+                if self.rate(mode) is not None
+            },
+            "saved_seconds": round(self.saved_seconds, 1),
+        }
+
+
+stats = CutStats()
+
+
+def find_keyframes(path: str) -> np.ndarray:
+    try:
+        return keyframe_times(path)
+    except (Mp4Error, OSError):
+        pass
+
+    # not an indexable MP4, let ffmpeg decode only the keyframes instead
+    output = run_ffmpeg(
+        ["-skip_frame", "nokey", "-i", path, "-map", "0:v:0"]
+        + ["-vf", "showinfo", "-f", "null", "-"]
+    )
+    return np.array([float(t) for t in _PTS_TIME.findall(output)])
+
+
+def nearest_keyframe(keyframes: np.ndarray, t: float) -> float:
+    if len(keyframes) == 0:
+        return t
+    return float(keyframes[np.argmin(np.abs(keyframes - t))])
+
+
+def next_keyframe(keyframes: np.ndarray, t: float):
+    later = keyframes[keyframes >= t]
+    return float(later[0]) if len(later) else None
+
+
+def cut_moviepy(src: str, dst: str, start: float, end: float, threads: int = None):
+    from moviepy.editor import VideoFileClip
+
+    with VideoFileClip(src) as video:
+        new = video.subclip(start, end)
+        new.write_videofile(dst, codec="libx264", audio_codec="aac", threads=threads)
+    return start, end
+
+
+def cut_copy(src: str, dst: str, start: float, end: float, threads: int = None):
+    """Stream-copies the window, moving the start onto the nearest keyframe."""
+    start = nearest_keyframe(find_keyframes(src), start)
+    run_ffmpeg(
+        ["-ss", start, "-i", src, "-t", end - start, "-map", "0:v:0", "-map", "0:a?"]
+        + ["-c", "copy", "-avoid_negative_ts", "make_zero"]
+        + ["-movflags", "+faststart", dst]
+    )
+    return start, end
+
+
+def cut_smart(src: str, dst: str, start: float, end: float, threads: int = None):
+    """Re-encodes the frames up to the first keyframe and stream-copies the rest.
+
+    Audio is cheap to encode, so it is re-encoded over the whole window to
+    avoid a seam where the two video parts meet.
+    """
+    keyframe = next_keyframe(find_keyframes(src), start)
+    if keyframe is None or keyframe >= end:
+        return cut_moviepy(src, dst, start, end, threads)
+    if keyframe - start < 0.05:
+        return cut_copy(src, dst, keyframe, end)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        head = os.path.join(tmp, "head.mp4")
+        tail = os.path.join(tmp, "tail.mp4")
+        video = os.path.join(tmp, "video.mp4")
+        concat = os.path.join(tmp, "concat.txt")
+
+        run_ffmpeg(
+            ["-ss", start, "-i", src, "-t", keyframe - start, "-map", "0:v:0"]
+            + ["-c:v", "libx264", "-an", head],
+            threads=threads,
+        )
+        run_ffmpeg(
+            ["-ss", keyframe, "-i", src, "-t", end - keyframe, "-map", "0:v:0"]
+            + ["-c:v", "copy", "-an", "-avoid_negative_ts", "make_zero", tail]
+        )
+        with open(concat, "w") as file:
+            file.write(f"file '{head}'\nfile '{tail}'\n")
+
+        run_ffmpeg(["-f", "concat", "-safe", 0, "-i", concat, "-c", "copy", video])
+        run_ffmpeg(
+            ["-i", video, "-ss", start, "-t", end - start, "-i", src]
+            + ["-map", "0:v:0", "-map", "1:a?", "-c:v", "copy", "-c:a", "aac"]
+            + ["-shortest", "-movflags", "+faststart", dst],
+            threads=threads,
+        )
+    return start, end
+
+
+CUTTERS = {"moviepy": cut_moviepy, "copy": cut_copy, "smart": cut_smart}
+
+
+def cut_clip(
+    src: str, dst: str, start: float, end: float, mode: str = "copy", threads=None
+):
+    """Cuts [start, end] out of src with the given mode and logs the time it took."""
+    if mode not in CUTTERS:
+        raise ValueError(f"Unknown cut mode {mode}, expected one of {CUT_MODES}")
+
+    began = time.time()
+    start, end = CUTTERS[mode](src, dst, start, end, threads)
+    result = CutResult(dst, mode, start, end, time.time() - began)
+    stats.record(result)
+
+    saved = stats.saved(result)
+    if result.mode == "moviepy":
+        log.info(f"Cut {end - start:.1f}s with {mode} in {result.elapsed:.2f}s")
+    else:
+        log.info(
+            f"Cut {end - start:.1f}s with {mode} in {result.elapsed:.2f}s, "
+            f"{saved:.2f}s faster than MoviePy"
+        )
+    return result
@@ -0,0 +1,220 @@
+import os
+import re
+from dataclasses import dataclass
+
+import requests
+
+from logger import log, metrics
+from media.mp4 import Mp4Error, byte_range, parse_moov, read_box_header
+
+# how much video before/after the window is fetched so the cut has a keyframe
+KEYFRAME_MARGIN = 5
+# the first bytes hold ftyp, usually moov and the samples ffmpeg probes
+HEAD_BYTES = 1024 * 1024
+PROBE_BYTES = 512 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+
+
+class PartialDownloadUnsupported(Exception):
+    def __init__(self, message: str, response: requests.Response = None):
+        super().__init__(message)
+        # a server that ignored Range answered with the whole file, still unread
+        self.response = response
+
+
+@dataclass
+class DownloadResult:
+    path: str
+    total_bytes: int
+    fetched_bytes: int
+    partial: bool
+
+    @property
+    def saved_bytes(self) -> int:
+        return max(self.total_bytes - self.fetched_bytes, 0)
+
+
+class RangeFetcher:
+    """Fetches byte ranges of a remote file and counts what it downloaded."""
+
+    def __init__(self, url: str, session: requests.Session = None):
+        self.url = url
+        self.session = session or requests.Session()
+        self.total = None
+        self.fetched = 0
+
+    def _get(self, start: int, end: int):
+        # streamed, so nothing but the headers is read before the status is checked
+        response = self.session.get(
+            self.url,
+            headers={"Range": f"bytes={start}-{end}"},
+            stream=True,
+            timeout=30,
+        )
+        if response.status_code == 200:
+            raise PartialDownloadUnsupported(
+                "Server ignored the Range header", response
+            )
+        if response.status_code != 206:
+            response.close()
+            response.raise_for_status()
+            raise PartialDownloadUnsupported(
+                f"Unexpected status {response.status_code} for a range"
+            )
+
+        match = _CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+        if match is None:
+            response.close()
+            raise PartialDownloadUnsupported("No usable Content-Range header")
+        self.total = int(match.group(3))
+        return response
+
+    def fetch(self, start: int, end: int) -> bytes:
+        with self._get(start, end) as response:
+            data = response.content
+        self.fetched += len(data)
+        return data
+
+    def copy(self, start: int, end: int, file):
+        """Streams bytes start..end (inclusive) into file at the same offset."""
+        file.seek(start)
+        with self._get(start, end) as response:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                file.write(chunk)
+                self.fetched += len(chunk)
+
+
+def _find_moov(fetcher: RangeFetcher, head: bytes):
+    """Walks the top-level boxes until moov is found, returns (offset, box)."""
+    offset = 0
+    while offset < fetcher.total:
+        if offset + 16 <= len(head):
+            header = head[offset : offset + 16]
+        else:
+            header = fetcher.fetch(offset, min(offset + 15, fetcher.total - 1))
+
+        kind, _, size = read_box_header(header)
+        if kind == "moof":
+            raise Mp4Error("Fragmented MP4 files are not supported")
+        if kind == "moov":
+            if offset + size <= len(head):
+                return offset, head[offset : offset + size]
+            return offset, fetcher.fetch(offset, offset + size - 1)
+        if size == 0:
+            break
+        offset += size
+
+    raise Mp4Error("No moov box found")
+
+
+def _merge(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _subtract(ranges, known):
+    """Removes the already downloaded `known` ranges from `ranges`."""
+    missing = []
+    for start, end in ranges:
+        for known_start, known_end in known:
+            if known_end < start or known_start > end:
+                continue
+            if known_start > start:
+                missing.append((start, known_start - 1))
+            start = max(start, known_end + 1)
+        if start <= end:
+            missing.append((start, end))
+    return missing
+
+
+def download_window(
+    url: str, path: str, start: float, end: float, margin: float = KEYFRAME_MARGIN
+) -> DownloadResult:
+    """Downloads only the parts of an MP4 needed to cut [start, end] from it.
+
+    The result is a sparse file of the original size: the container index,
+    the first samples and the samples of the window are at their original
+    offsets, everything else is left as a hole. Decoders seeking into the
+    window never read the holes.
+    """
+    fetcher = RangeFetcher(url)
+    head = fetcher.fetch(0, HEAD_BYTES - 1)
+
+    try:
+        moov_offset, moov = _find_moov(fetcher, head)
+        tracks = parse_moov(moov)
+        window = byte_range(tracks, max(start - margin, 0), end + margin)
+    except Mp4Error as e:
+        raise PartialDownloadUnsupported(str(e)) from e
+
+    first_sample = min(int(track.offsets[0]) for track in tracks)
+    known = _merge([(0, len(head) - 1), (moov_offset, moov_offset + len(moov) - 1)])
+    missing = _subtract(
+        _merge(
+            [
+                (first_sample, min(first_sample + PROBE_BYTES, fetcher.total) - 1),
+                window,
+            ]
+        ),
+        known,
+    )
+
+    tmp_path = path + ".part"
+    with open(tmp_path, "wb") as file:
+        file.truncate(fetcher.total)
+        file.write(head)
+        file.seek(moov_offset)
+        file.write(moov)
+        for range_start, range_end in missing:
+            fetcher.copy(range_start, range_end, file)
+    os.replace(tmp_path, path)
+
+    return DownloadResult(path, fetcher.total, fetcher.fetched, partial=True)
+
+
+def _save(response: requests.Response, path: str) -> DownloadResult:
+    fetched = 0
+    tmp_path = path + ".part"
+    with open(tmp_path, "wb") as file:
+        for chunk in response.iter_content(CHUNK_SIZE):
+            file.write(chunk)
+            fetched += len(chunk)
+    os.replace(tmp_path, path)
+    return DownloadResult(path, fetched, fetched, partial=False)
+
+
+def download_full(url: str, path: str) -> DownloadResult:
+    with requests.get(url, stream=True, timeout=30) as response:
+        response.raise_for_status()
+        return _save(response, path)
+
+
+def download_clip_source(url: str, path: str, start: float, end: float):
+    """Downloads the window with range requests, or the whole file if that fails."""
+    try:
+        result = download_window(url, path, start, end)
+    except (PartialDownloadUnsupported, requests.RequestException) as e:
+        log.warn("Partial download not possible, downloading the whole file:", e)
+        if isinstance(e, PartialDownloadUnsupported) and e.response is not None:
+            # the whole file is already on its way, keep it instead of asking again
+            with e.response as response:
+                result = _save(response, path)
+        else:
+            result = download_full(url, path)
+        metrics.count("bytes_downloaded_total", result.fetched_bytes, kind="full")
+        return result
+
+    metrics.count("bytes_downloaded_total", result.fetched_bytes, kind="range")
+
+    log.info(
+        f"Fetched {result.fetched_bytes / 1e6:.1f}MB of {result.total_bytes / 1e6:.1f}MB, "
+        f"saved {result.saved_bytes / 1e6:.1f}MB"
+    )
+    return result
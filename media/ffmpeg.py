@@ -0,0 +1,100 @@
+import re
+import subprocess
+from dataclasses import dataclass
+from typing import Optional
+
+
+class FFmpegError(Exception):
+    pass
+
+
+_binary = None
+
+
+def use_ffmpeg(path: str):
+    """Sets the ffmpeg binary, MoviePy is told where it runs, in the workers."""
+    global _binary
+    _binary = path
+
+
+def ffmpeg_binary() -> str:
+    """The binary set with `use_ffmpeg`, else the one configured for MoviePy."""
+    if _binary is not None:
+        return _binary
+    from moviepy.config import get_setting
+
+    return get_setting("FFMPEG_BINARY")
+
+
+def run_ffmpeg(args: list, threads: int = None) -> str:
+    """Runs ffmpeg with the given arguments, returns its stderr output."""
+    command = [ffmpeg_binary(), "-hide_banner", "-nostdin", "-y"]
+    if threads is not None:
+        command += ["-threads", str(threads)]
+    command += [str(arg) for arg in args]
+
+    process = subprocess.run(command, capture_output=True, text=True)
+    if process.returncode != 0:
+        raise FFmpegError(
+            f"ffmpeg exited with {process.returncode}: {process.stderr[-2000:]}"
+        )
+    return process.stderr
+
+
+@dataclass
+class MediaInfo:
+    duration: float
+    width: int
+    height: int
+    fps: float
+    sample_rate: Optional[int] = None
+
+    @property
+    def has_audio(self) -> bool:
+        return self.sample_rate is not None
+
+
+_DURATION = re.compile(r"Duration: (\d+):(\d+):(\d+\.?\d*)")
+_VIDEO = re.compile(
+    r"Stream #.*?Video: .*?\b(\d{2,5})x(\d{2,5})\b(?:.*?(\d+\.?\d*) fps)?"
+)
+_AUDIO = re.compile(r"Stream #.*?Audio: .*?(\d+) Hz")
+
+
+def duration(path: str) -> float:
+    """Reads only the duration, works for audio-only files as well."""
+    process = subprocess.run(
+        [ffmpeg_binary(), "-hide_banner", "-nostdin", "-i", path],
+        capture_output=True,
+        text=True,
+    )
+    match = _DURATION.search(process.stderr)
+    if match is None:
+        raise FFmpegError(f"Could not probe {path}: {process.stderr[-2000:]}")
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def probe(path: str) -> MediaInfo:
+    """Reads duration, size, frame rate and audio sample rate from `ffmpeg -i`."""
+    process = subprocess.run(
+        [ffmpeg_binary(), "-hide_banner", "-nostdin", "-i", path],
+        capture_output=True,
+        text=True,
+    )
+    output = process.stderr
+
+    duration = _DURATION.search(output)
+    video = _VIDEO.search(output)
+    if duration is None or video is None:
+        raise FFmpegError(f"Could not probe {path}: {output[-2000:]}")
+    audio = _AUDIO.search(output)
+
+    hours, minutes, seconds = duration.groups()
+    return MediaInfo(
+        duration=int(hours) * 3600 + int(minutes) * 60 + float(seconds),
+        width=int(video.group(1)),
+        height=int(video.group(2)),
+        fps=float(video.group(3) or 30),
+        sample_rate=int(audio.group(1)) if audio else None,
+    )
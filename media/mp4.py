@@ -0,0 +1,212 @@
+import os
+import struct
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+
+class Mp4Error(Exception):
+    pass
+
+
+@dataclass
+class Track:
+    handler: str
+    timescale: int
+    times: np.ndarray
+    offsets: np.ndarray
+    sizes: np.ndarray
+    # sample indices of sync samples, None when every sample is a keyframe
+    keyframes: Optional[np.ndarray] = None
+
+    def seconds(self, index: int) -> float:
+        return float(self.times[index]) / self.timescale
+
+
+def iter_boxes(data: bytes, start: int = 0, end: int = None):
+    """Yields (type, payload start, box end) for the boxes in data[start:end]."""
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        kind, header, size = read_box_header(data, offset)
+        if size == 0:
+            size = end - offset
+        if size < header:
+            raise Mp4Error(f"Invalid box size {size} at {offset}")
+
+        yield kind, offset + header, offset + size
+        offset += size
+
+
+def read_box_header(data: bytes, offset: int = 0):
+    """Returns (type, header size, box size) of the box starting at data[offset].
+
+    A box size of 0 means the box runs to the end of the file.
+    """
+    try:
+        size, kind = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header = 16
+    except struct.error as e:
+        raise Mp4Error(f"Truncated box header at {offset}") from e
+    if 0 < size < header:
+        raise Mp4Error(f"Invalid box size {size} at {offset}")
+    return kind.decode("latin-1"), header, size
+
+
+def _children(data: bytes, start: int, end: int) -> dict:
+    return {kind: (s, e) for kind, s, e in iter_boxes(data, start, end)}
+
+
+def _table(data: bytes, start: int, dtype: str, count: int, skip: int = 8):
+    # full boxes start with version/flags and an entry count
+    return np.frombuffer(data, dtype=dtype, count=count, offset=start + skip)
+
+
+def _parse_trak(data: bytes, start: int, end: int) -> Optional[Track]:
+    mdia = _children(data, start, end).get("mdia")
+    if mdia is None:
+        return None
+    mdia = _children(data, *mdia)
+
+    mdhd = mdia["mdhd"][0]
+    if data[mdhd] == 1:
+        timescale = struct.unpack_from(">I", data, mdhd + 20)[0]
+    else:
+        timescale = struct.unpack_from(">I", data, mdhd + 12)[0]
+    handler = data[mdia["hdlr"][0] + 8 : mdia["hdlr"][0] + 12].decode("latin-1")
+
+    stbl = _children(data, *_children(data, *mdia["minf"])["stbl"])
+
+    # decode times from the run-length encoded sample deltas
+    s = stbl["stts"][0]
+    count = struct.unpack_from(">I", data, s + 4)[0]
+    stts = _table(data, s, ">u4", count * 2).reshape(-1, 2).astype(np.int64)
+    deltas = np.repeat(stts[:, 1], stts[:, 0])
+    times = np.concatenate([[0], np.cumsum(deltas)[:-1]])
+
+    s = stbl["stsz"][0]
+    uniform, n_samples = struct.unpack_from(">II", data, s + 4)
+    if uniform:
+        sizes = np.full(n_samples, uniform, dtype=np.int64)
+    else:
+        sizes = _table(data, s, ">u4", n_samples, skip=12).astype(np.int64)
+
+    if "co64" in stbl:
+        s = stbl["co64"][0]
+        dtype = ">u8"
+    else:
+        s = stbl["stco"][0]
+        dtype = ">u4"
+    count = struct.unpack_from(">I", data, s + 4)[0]
+    chunk_offsets = _table(data, s, dtype, count).astype(np.int64)
+
+    # expand the sample-to-chunk runs into a chunk index per sample
+    s = stbl["stsc"][0]
+    count = struct.unpack_from(">I", data, s + 4)[0]
+    stsc = _table(data, s, ">u4", count * 3).reshape(-1, 3).astype(np.int64)
+    first_chunks = stsc[:, 0] - 1
+    run_lengths = np.diff(np.append(first_chunks, len(chunk_offsets)))
+    per_chunk = np.repeat(stsc[:, 1], run_lengths)
+    chunk_of_sample = np.repeat(np.arange(len(chunk_offsets)), per_chunk)[:n_samples]
+
+    if len(chunk_of_sample) != n_samples or len(times) != n_samples:
+        raise Mp4Error("Sample tables do not agree on the sample count")
+
+    # byte position of every sample relative to the first sample of its chunk
+    starts = np.cumsum(sizes) - sizes
+    first_in_chunk = np.searchsorted(chunk_of_sample, np.arange(len(chunk_offsets)))
+    first_in_chunk = np.minimum(first_in_chunk, n_samples - 1)
+    within = starts - starts[first_in_chunk[chunk_of_sample]]
+    offsets = chunk_offsets[chunk_of_sample] + within
+
+    keyframes = None
+    if "stss" in stbl:
+        s = stbl["stss"][0]
+        count = struct.unpack_from(">I", data, s + 4)[0]
+        keyframes = _table(data, s, ">u4", count).astype(np.int64) - 1
+
+    return Track(handler, timescale, times, offsets, sizes, keyframes)
+
+
+def parse_moov(moov: bytes) -> list[Track]:
+    """Builds the sample index of every audio and video track in a moov box."""
+    kind, header, size = read_box_header(moov)
+    if kind != "moov":
+        raise Mp4Error(f"Expected a moov box, got {kind}")
+
+    boxes = list(iter_boxes(moov, header, size))
+    if any(kind == "mvex" for kind, _, _ in boxes):
+        raise Mp4Error("Fragmented MP4 files are not supported")
+
+    tracks = []
+    try:
+        for kind, start, end in boxes:
+            if kind != "trak":
+                continue
+            track = _parse_trak(moov, start, end)
+            if track is not None and track.handler in ("vide", "soun"):
+                tracks.append(track)
+    except (KeyError, struct.error, ValueError) as e:
+        raise Mp4Error(f"Malformed sample table: {e}") from e
+
+    if len(tracks) == 0:
+        raise Mp4Error("No audio or video tracks found")
+    return tracks
+
+
+def byte_range(tracks: list[Track], start: float, end: float):
+    """Returns the (first, last) byte offsets holding the samples of [start, end].
+
+    The start is snapped back to the video keyframe at or before it, so the
+    range always starts with a decodable frame.
+    """
+    for track in tracks:
+        if track.handler == "vide" and track.keyframes is not None:
+            index = np.searchsorted(track.times, start * track.timescale, "right") - 1
+            k = np.searchsorted(track.keyframes, max(index, 0), "right") - 1
+            start = min(start, track.seconds(track.keyframes[max(k, 0)]))
+
+    first, last = None, None
+    for track in tracks:
+        a = max(np.searchsorted(track.times, start * track.timescale, "right") - 1, 0)
+        b = max(np.searchsorted(track.times, end * track.timescale, "left"), a + 1)
+        offsets = track.offsets[a:b]
+        ends = offsets + track.sizes[a:b]
+
+        first = int(offsets.min()) if first is None else min(first, int(offsets.min()))
+        last = int(ends.max()) if last is None else max(last, int(ends.max()))
+
+    return first, last - 1
+
+
+def read_moov(path: str) -> bytes:
+    """Reads the moov box of a local MP4 file without reading the media data."""
+    with open(path, "rb") as file:
+        file.seek(0, os.SEEK_END)
+        total = file.tell()
+        offset = 0
+        while offset + 8 <= total:
+            file.seek(offset)
+            kind, _, size = read_box_header(file.read(16))
+            if kind == "moov":
+                file.seek(offset)
+                return file.read(size)
+            if size == 0:
+                break
+            offset += size
+    raise Mp4Error(f"No moov box found in {path}")
+
+
+def keyframe_times(path: str) -> np.ndarray:
+    """Returns the keyframe decode times (seconds) of the video track."""
+    for track in parse_moov(read_moov(path)):
+        if track.handler != "vide":
+            continue
+        if track.keyframes is None:
+            return track.times / track.timescale
+        return track.times[track.keyframes] / track.timescale
+    raise Mp4Error(f"No video track found in {path}")
@@ -0,0 +1,161 @@
+import asyncio
+import time
+
+from logger import log, metrics, trace
+
+# marks the end of the input, every worker of a stage gets one
+_DONE = object()
+
+
+def _describe(item) -> str:
+    return getattr(item, "key", None) or str(item)[:200]
+
+
+class Stage:
+    """One step of a pipeline: `workers` coroutines running `fn` over a bounded queue.
+
+    `fn` takes an item and returns the next stage's item, a list of items to
+    fan out, or None to drop it. A full queue blocks the stage feeding it,
+    so a slow stage holds back its producers instead of piling up work.
+    """
+
+    def __init__(self, name: str, fn, workers: int = 1, queue_size: int = 2):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.running = 0
+        self.busy_seconds = 0.0
+        self.first_done_at = None
+        self.tasks = []
+
+    async def _work(self, emit):
+        while True:
+            item = await self.queue.get()
+            if item is _DONE:
+                return
+
+            self.running += 1
+            start = time.time()
+            try:
+                with trace.span(f"stage.{self.name}", item=_describe(item)):
+                    result = await self.fn(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                log.error(f"{self.name} failed:", e)
+                continue
+            finally:
+                self.running -= 1
+                elapsed = time.time() - start
+                self.busy_seconds += elapsed
+                metrics.observe("stage_seconds", elapsed, stage=self.name)
+
+            self.processed += 1
+            if self.first_done_at is None and result:
+                self.first_done_at = time.time()
+            if result is None:
+                self.dropped += 1
+            for out in result if isinstance(result, list) else [result]:
+                if out is not None:
+                    await emit(out)
+
+    def start(self, emit):
+        self.tasks = [
+            asyncio.ensure_future(self._work(emit)) for _ in range(self.workers)
+        ]
+
+    def stats(self, elapsed: float) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize(),
+            "running": self.running,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "throughput": self.processed / elapsed if elapsed > 0 else 0.0,
+            "utilization": (
+                self.busy_seconds / (self.workers * elapsed) if elapsed > 0 else 0.0
+            ),
+        }
+
+
+class Pipeline:
+    """Chains stages so that each one works as soon as its input is ready.
+
+    Items flow from stage to stage through bounded queues; slow stages overlap
+    with fast ones instead of serializing every item end to end.
+    """
+
+    def __init__(self, stages: list[Stage], stats_interval: float = None):
+        self.stages = stages
+        self.stats_interval = stats_interval
+        self.results = []
+        self.started_at = None
+
+    def _emitter(self, i: int):
+        if i + 1 < len(self.stages):
+            return self.stages[i + 1].queue.put
+
+        async def collect(item):
+            self.results.append(item)
+
+        return collect
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            for name, stats in self.stats().items():
+                log.info(
+                    f"{name}: {stats['processed']} done, {stats['running']} running, "
+                    f"{stats['queue_depth']} queued, {stats['failed']} failed"
+                )
+
+    async def run(self, items, resumed: dict = None) -> list:
+        """Feeds the items through every stage, returns what the last one emits.
+
+        `resumed` maps stage names to items that enter the pipeline there,
+        like jobs of an earlier run that already got past the first stages.
+        """
+        self.started_at = time.time()
+        for i, stage in enumerate(self.stages):
+            stage.start(self._emitter(i))
+        reporter = (
+            asyncio.ensure_future(self._report()) if self.stats_interval else None
+        )
+
+        try:
+            stages = {stage.name: stage for stage in self.stages}
+            for name, entries in (resumed or {}).items():
+                for item in entries:
+                    await stages[name].queue.put(item)
+            for item in items:
+                await self.stages[0].queue.put(item)
+
+            # a stage is drained once its producers are, so the ends follow the items
+            for stage in self.stages:
+                for _ in range(stage.workers):
+                    await stage.queue.put(_DONE)
+                await asyncio.gather(*stage.tasks)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+
+        return self.results
+
+    def cancel(self):
+        for stage in self.stages:
+            for task in stage.tasks:
+                task.cancel()
+
+    def stats(self) -> dict:
+        elapsed = time.time() - self.started_at if self.started_at else 0.0
+        return {stage.name: stage.stats(elapsed) for stage in self.stages}
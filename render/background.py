@@ -0,0 +1,126 @@
+import hashlib
+import itertools
+import math
+import os
+import random
+import threading
+from dataclasses import dataclass
+
+from logger import log
+from media.ffmpeg import probe, run_ffmpeg
+from render.layout import BACKGROUND_VIDEO, ROW_HEIGHT
+
+FILLER_DIR = os.environ.get("FILLER_DIR", "video/filler")
+PREPARED_DIR = os.environ.get("PREPARED_DIR", "video/.prepared")
+# prepared fillers are looped to at least this long so any window fits
+MIN_LOOP_SECONDS = 600
+# a keyframe every second keeps seeking to a random offset cheap
+KEYFRAME_INTERVAL = 1
+
+
+@dataclass
+class BackgroundWindow:
+    path: str
+    offset: float
+    duration: float
+
+
+def _default_sources() -> list[str]:
+    sources = []
+    if os.path.isdir(FILLER_DIR):
+        sources = [
+            os.path.join(FILLER_DIR, name)
+            for name in sorted(os.listdir(FILLER_DIR))
+            if name.endswith(".mp4")
+        ]
+    if len(sources) == 0:
+        sources = [BACKGROUND_VIDEO]
+    return sources
+
+
+class BackgroundAssets:
+    """Prepares filler clips once and hands out windows into them.
+
+    A prepared filler is scaled to the row height, encoded with short GOPs
+    for fast seeking and looped to `min_length` seconds. Renders then only
+    decode the small frames of their own window.
+    """
+
+    def __init__(
+        self,
+        sources: list[str] = None,
+        height: int = ROW_HEIGHT,
+        directory: str = PREPARED_DIR,
+        min_length: float = MIN_LOOP_SECONDS,
+        rotate: bool = False,
+    ):
+        self.sources = sources or _default_sources()
+        self.height = height
+        self.directory = directory
+        self.min_length = min_length
+        self.rotate = rotate
+
+        self._prepared = {}
+        self._locks = {source: threading.Lock() for source in self.sources}
+        self._lock = threading.Lock()
+        self._next_source = itertools.cycle(self.sources)
+        self._next_offset = {}
+
+    def _prepared_path(self, source: str) -> str:
+        stat = os.stat(source)
+        fingerprint = f"{os.path.abspath(source)}:{stat.st_size}:{stat.st_mtime}"
+        digest = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:12]
+        name = os.path.splitext(os.path.basename(source))[0]
+        return os.path.join(
+            self.directory, f"{name}_{self.height}p_{self.min_length}s_{digest}.mp4"
+        )
+
+    def prepare(self, source: str):
+        """Returns (path, duration) of the prepared filler, preparing it on first use."""
+        with self._locks[source]:
+            if source in self._prepared:
+                return self._prepared[source]
+
+            path = self._prepared_path(source)
+            if not os.path.exists(path):
+                log.info(f"Preparing background {source} at {self.height}p")
+                os.makedirs(self.directory, exist_ok=True)
+                info = probe(source)
+                loops = max(math.ceil(self.min_length / info.duration) - 1, 0)
+                tmp_path = path + ".tmp.mp4"
+                run_ffmpeg(
+                    ["-stream_loop", loops, "-i", source]
+                    + ["-vf", f"scale=-2:{self.height}", "-c:v", "libx264"]
+                    + ["-preset", "veryfast", "-crf", 20]
+                    + ["-g", round(info.fps * KEYFRAME_INTERVAL), "-c:a", "aac"]
+                    + ["-movflags", "+faststart", tmp_path]
+                )
+                os.replace(tmp_path, path)
+
+            self._prepared[source] = path, probe(path).duration
+            return self._prepared[source]
+
+    def prepare_all(self):
+        for source in self.sources:
+            self.prepare(source)
+
+    def window(self, duration: float) -> BackgroundWindow:
+        """Picks a filler and an offset for a render of the given duration."""
+        with self._lock:
+            source = next(self._next_source) if self.rotate else None
+        if source is None:
+            source = random.choice(self.sources)
+
+        path, length = self.prepare(source)
+        latest = max(length - duration, 0)
+
+        if self.rotate:
+            with self._lock:
+                offset = self._next_offset.get(source, 0)
+                if offset > latest:
+                    offset = 0
+                self._next_offset[source] = offset + duration
+        else:
+            offset = random.uniform(0, latest)
+
+        return BackgroundWindow(path, round(offset, 3), duration)
@@ -0,0 +1,132 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from moviepy.editor import ImageClip, TextClip
+
+from logger import log
+
+CAPTION_CACHE_BYTES = int(os.environ.get("CAPTION_CACHE_MB", 256)) * 1024 * 1024
+CAPTION_CACHE_DIR = os.environ.get("CAPTION_CACHE_DIR")
+
+
+class CaptionCache:
+    """A bounded LRU cache of rasterized captions.
+
+    Entries are the RGB frame and the alpha mask of a rendered TextClip, the
+    cache is bounded by the bytes those arrays take. With a directory set,
+    entries are also persisted there and survive restarts.
+    """
+
+    def __init__(self, max_bytes: int = CAPTION_CACHE_BYTES, directory: str = None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(text: str, **style) -> str:
+        parts = [text] + [f"{name}={style[name]}" for name in sorted(style)]
+        return hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        if self.directory is not None and os.path.exists(self._path(key)):
+            try:
+                with np.load(self._path(key)) as data:
+                    entry = data["frame"], data["mask"]
+            except (OSError, ValueError, KeyError) as e:
+                log.warn("Ignoring unreadable caption cache entry:", e)
+            else:
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, entry)
+                return entry
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, frame: np.ndarray, mask: np.ndarray):
+        # masks are 0-1 floats, a byte per pixel is plenty for captions
+        entry = frame.astype(np.uint8), np.round(mask * 255).astype(np.uint8)
+        self._remember(key, entry)
+
+        if self.directory is not None:
+            tmp_path = self._path(key) + f".{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as file:
+                np.savez(file, frame=entry[0], mask=entry[1])
+            os.replace(tmp_path, self._path(key))
+        return entry
+
+    def _remember(self, key: str, entry):
+        nbytes = entry[0].nbytes + entry[1].nbytes
+        if nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = entry
+            self.size += nbytes
+            while self.size > self.max_bytes:
+                _, (frame, mask) = self._entries.popitem(last=False)
+                self.size -= frame.nbytes + mask.nbytes
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+# shared by every render in the process
+cache = CaptionCache(directory=CAPTION_CACHE_DIR)
+
+
+def caption_clip(text: str, **style) -> ImageClip:
+    """Returns the caption as an ImageClip, rasterizing it only on a cache miss.
+
+    Takes the same keyword arguments as TextClip.
+    """
+    key = cache.key(text, **style)
+    entry = cache.get(key)
+    if entry is None:
+        rendered = TextClip(text, **style)
+        frame = rendered.get_frame(0)
+        if rendered.mask is None:
+            mask = np.ones(frame.shape[:2])
+        else:
+            mask = rendered.mask.get_frame(0)
+        entry = cache.put(key, frame, mask)
+        rendered.close()
+
+    frame, mask = entry
+    return ImageClip(frame).set_mask(ImageClip(mask / 255.0, ismask=True))
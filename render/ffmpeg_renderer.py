@@ -0,0 +1,87 @@
+import os
+import tempfile
+
+from media.ffmpeg import probe, run_ffmpeg
+from render.layout import BACKGROUND_VIDEO, ROW_HEIGHT, SPEED
+from render.subtitles import srt_to_ass
+
+
+def _scaled_width(width: int, height: int) -> int:
+    # libx264 needs even dimensions
+    return max(2, int(width * ROW_HEIGHT / height) // 2 * 2)
+
+
+def _escape_filter_path(path: str) -> str:
+    return path.replace("\\", "/").replace(":", "\\:").replace("'", "\\'")
+
+
+def build_filter_graph(main, background, ass_path: str, speed: float = SPEED):
+    """Returns the filter graph and output labels for the split-screen short.
+
+    Mirrors the MoviePy renderer: both clips scaled to the row height, centred
+    on a black canvas as wide as the wider one, stacked, captions burnt in and
+    everything (audio included, pitch and all, like `speedx`) sped up.
+    """
+    top_width = _scaled_width(main.width, main.height)
+    bottom_width = _scaled_width(background.width, background.height)
+    width = max(top_width, bottom_width)
+
+    graph = [
+        f"[0:v]scale={top_width}:{ROW_HEIGHT},setsar=1,"
+        f"pad={width}:{ROW_HEIGHT}:(ow-iw)/2:0[top]",
+        f"[1:v]scale={bottom_width}:{ROW_HEIGHT},setsar=1,"
+        f"pad={width}:{ROW_HEIGHT}:(ow-iw)/2:0[bottom]",
+        f"[top][bottom]vstack=inputs=2:shortest=1,"
+        f"ass='{_escape_filter_path(ass_path)}',"
+        f"setpts=PTS/{speed},fps={main.fps}[v]",
+    ]
+
+    audio = None
+    if main.has_audio:
+        rate = main.sample_rate
+        inputs = "[0:a]"
+        if background.has_audio:
+            inputs = "[0:a][1:a]amix=inputs=2:duration=first:normalize=0,"
+        else:
+            inputs += "anull,"
+        graph.append(
+            f"{inputs}aresample={rate},asetrate={int(rate * speed)},aresample={rate}[a]"
+        )
+        audio = "[a]"
+
+    return ";".join(graph), "[v]", audio
+
+
+def render_short(
+    video_path,
+    srt_path,
+    output_path,
+    background_path=BACKGROUND_VIDEO,
+    background_offset=0,
+    threads=None,
+):
+    """Renders the subtitled split-screen short in a single ffmpeg pass."""
+    main = probe(video_path)
+    background = probe(background_path)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ass_path = srt_to_ass(
+            srt_path,
+            os.path.join(tmp, "captions.ass"),
+            max(
+                _scaled_width(main.width, main.height),
+                _scaled_width(background.width, background.height),
+            ),
+            ROW_HEIGHT * 2,
+        )
+        graph, video, audio = build_filter_graph(main, background, ass_path)
+
+        args = ["-i", video_path]
+        args += ["-stream_loop", -1, "-ss", background_offset, "-i", background_path]
+        args += ["-filter_complex", graph, "-map", video]
+        args += ["-map", audio, "-c:a", "aac"] if audio else ["-an"]
+        args += ["-c:v", "libx264", "-pix_fmt", "yuv420p"]
+        args += ["-t", main.duration / SPEED, "-movflags", "+faststart", output_path]
+        run_ffmpeg(args, threads=threads)
+
+    return output_path
@@ -0,0 +1,17 @@
+# the short is the source clip stacked on top of a filler clip, with the
+# captions in a box just below the middle, sped up a little
+BACKGROUND_VIDEO = "video/subway_surfers.mp4"
+ROW_HEIGHT = 360
+SPEED = 1.1
+
+CAPTION_FONT = "Impact"
+CAPTION_FONTSIZE = 40
+CAPTION_COLOR = "white"
+CAPTION_STROKE_COLOR = "black"
+CAPTION_STROKE_WIDTH = 2
+CAPTION_WRAP = 30
+# the caption box is 60% of the video width and 300px high, its top edge
+# sits 50px above the middle of the video
+CAPTION_BOX_WIDTH = 0.6
+CAPTION_BOX_HEIGHT = 300
+CAPTION_BOX_OFFSET = -50
@@ -0,0 +1,94 @@
+import textwrap
+
+import pysrt
+from moviepy.editor import (
+    VideoFileClip,
+    CompositeVideoClip,
+    clips_array,
+)
+import moviepy.video.fx.all as vfx
+
+from logger import log
+from render.caption_cache import cache, caption_clip
+from render.layout import (
+    BACKGROUND_VIDEO,
+    CAPTION_BOX_HEIGHT,
+    CAPTION_BOX_OFFSET,
+    CAPTION_BOX_WIDTH,
+    CAPTION_COLOR,
+    CAPTION_FONT,
+    CAPTION_FONTSIZE,
+    CAPTION_STROKE_COLOR,
+    CAPTION_STROKE_WIDTH,
+    CAPTION_WRAP,
+    ROW_HEIGHT,
+    SPEED,
+)
+
+
+def _fit_height(clip):
+    # prepared backgrounds already have the row height, skip the per-frame resize
+    if clip.h == ROW_HEIGHT:
+        return clip
+    return clip.resize(height=ROW_HEIGHT)
+
+
+def render_short(
+    video_path,
+    srt_path,
+    output_path,
+    background_path=BACKGROUND_VIDEO,
+    background_offset=0,
+    threads=None,
+):
+    """Composites the subtitled split-screen short frame by frame with MoviePy."""
+    main_video = VideoFileClip(video_path)
+    subway_surfers = VideoFileClip(background_path)
+    end = background_offset + main_video.duration
+    if end <= subway_surfers.duration:
+        subway_surfers = subway_surfers.subclip(background_offset, end)
+    else:
+        subway_surfers = subway_surfers.fx(vfx.loop, duration=main_video.duration)
+    # subway_surfers = subway_surfers.set_audio(None)
+
+    video = clips_array([[_fit_height(main_video)], [_fit_height(subway_surfers)]])
+
+    subtitles = pysrt.open(srt_path)
+    subtitle_clips = []
+    for sub in subtitles:
+        start_time = sub.start.ordinal / 1000
+        end_time = sub.end.ordinal / 1000
+
+        wrapped_text = textwrap.fill(sub.text, width=CAPTION_WRAP)
+        subtitle_clips.append(
+            caption_clip(
+                wrapped_text,
+                fontsize=CAPTION_FONTSIZE,
+                color=CAPTION_COLOR,
+                font=CAPTION_FONT,
+                stroke_color=CAPTION_STROKE_COLOR,
+                stroke_width=CAPTION_STROKE_WIDTH,
+                method="caption",
+                size=(video.w * CAPTION_BOX_WIDTH, CAPTION_BOX_HEIGHT),
+            )
+            .set_position(("center", video.h / 2 + CAPTION_BOX_OFFSET))
+            .set_duration(end_time - start_time)
+            .set_start(start_time)
+        )
+
+    video_with_subtitles = CompositeVideoClip([video] + subtitle_clips)
+
+    final_video = video_with_subtitles.fx(vfx.speedx, SPEED)
+    final_video.write_videofile(
+        output_path, codec="libx264", audio_codec="aac", threads=threads
+    )
+    final_video.close()
+    main_video.close()
+    subway_surfers.close()
+
+    stats = cache.stats()
+    log.info(
+        f"Caption cache: {stats['hits'] + stats['disk_hits']} hits, "
+        f"{stats['misses']} misses, {stats['bytes'] / 1e6:.1f}MB"
+    )
+    return output_path
@@ -0,0 +1,125 @@
+import asyncio
+import importlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from logger import trace
+from media.ffmpeg import ffmpeg_binary
+
+CPU_COUNT = os.cpu_count() or 1
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", max(1, CPU_COUNT // 2)))
+IO_WORKERS = int(os.environ.get("IO_WORKERS", 8))
+
+
+def _init_worker(ffmpeg_path: str):
+    # spawned workers start from a fresh interpreter without our settings
+    from moviepy.config import change_settings
+
+    change_settings({"FFMPEG_BINARY": ffmpeg_path})
+
+
+def _preload(*modules: str):
+    for name in modules:
+        importlib.import_module(name)
+
+
+class RenderScheduler:
+    """Runs CPU-bound jobs in a process pool and I/O-bound ones in a thread pool.
+
+    Every CPU job is called with a `threads` keyword so the encoders of the
+    jobs running side by side share the cores instead of oversubscribing them.
+    """
+
+    def __init__(
+        self, render_workers: int = RENDER_WORKERS, io_workers: int = IO_WORKERS
+    ):
+        self.render_workers = max(1, render_workers)
+        self.threads_per_job = max(1, CPU_COUNT // self.render_workers)
+
+        self._cpu = None
+        self.io = ThreadPoolExecutor(max_workers=io_workers)
+
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.started_at = time.time()
+        self._slots = None
+
+    @property
+    def cpu(self) -> ProcessPoolExecutor:
+        # started on the first CPU job, runs that only list or upload never pay for it
+        if self._cpu is None:
+            self._cpu = ProcessPoolExecutor(
+                max_workers=self.render_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(ffmpeg_binary(),),
+            )
+        return self._cpu
+
+    async def warm(self, modules: list[str] = ()):
+        """Starts the worker processes and imports `modules` in them."""
+        futures = [
+            self.cpu.submit(_preload, *modules) for _ in range(self.render_workers)
+        ]
+        await asyncio.gather(*[asyncio.wrap_future(future) for future in futures])
+
+    async def run_io(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.io, trace.in_context(fn, *args, **kwargs)
+        )
+
+    async def run_cpu(self, fn, *args, **kwargs):
+        # created lazily so it binds to the running event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.render_workers)
+
+        loop = asyncio.get_running_loop()
+        self.queued += 1
+        async with self._slots:
+            self.queued -= 1
+            self.running += 1
+            start = time.time()
+            try:
+                # the worker process has no context, the span is kept out here
+                with trace.span(f"cpu.{fn.__name__}"):
+                    result = await loop.run_in_executor(
+                        self.cpu,
+                        partial(fn, *args, threads=self.threads_per_job, **kwargs),
+                    )
+            except Exception:
+                self.failed += 1
+                raise
+            else:
+                self.completed += 1
+                return result
+            finally:
+                self.running -= 1
+                self.busy_seconds += time.time() - start
+
+    def stats(self) -> dict:
+        elapsed = time.time() - self.started_at
+        return {
+            "workers": self.render_workers,
+            "threads_per_job": self.threads_per_job,
+            "queue_depth": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "utilization": (
+                self.busy_seconds / (self.render_workers * elapsed)
+                if elapsed > 0
+                else 0.0
+            ),
+        }
+
+    def shutdown(self, wait: bool = True):
+        if self._cpu is not None:
+            self._cpu.shutdown(wait=wait)
+        self.io.shutdown(wait=wait)
@@ -0,0 +1,68 @@
+import textwrap
+
+import pysrt
+
+from render.layout import (
+    CAPTION_BOX_HEIGHT,
+    CAPTION_BOX_OFFSET,
+    CAPTION_FONT,
+    CAPTION_FONTSIZE,
+    CAPTION_STROKE_WIDTH,
+    CAPTION_WRAP,
+)
+
+ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: {width}
+PlayResY: {height}
+WrapStyle: 2
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Caption,{font},{fontsize},&H00FFFFFF,&H00FFFFFF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,{outline},0,5,0,0,0,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+
+def _timestamp(ms: int) -> str:
+    centiseconds = ms // 10
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    seconds, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02d}:{seconds:02d}.{centiseconds:02d}"
+
+
+def _escape(text: str) -> str:
+    # braces start override blocks and backslashes escapes in ASS
+    return text.replace("\\", "/").replace("{", "(").replace("}", ")")
+
+
+def srt_to_ass(srt_path: str, ass_path: str, width: int, height: int) -> str:
+    """Writes the SRT cues as an ASS script styled and placed like the MoviePy captions."""
+    # centre of the caption box, the text is centred in it like ImageMagick's caption
+    x = width // 2
+    y = height // 2 + CAPTION_BOX_OFFSET + CAPTION_BOX_HEIGHT // 2
+
+    lines = [
+        ASS_HEADER.format(
+            width=width,
+            height=height,
+            font=CAPTION_FONT,
+            fontsize=CAPTION_FONTSIZE,
+            # ImageMagick strokes straddle the glyph edge, ASS outlines do not
+            outline=CAPTION_STROKE_WIDTH / 2,
+        )
+    ]
+    for sub in pysrt.open(srt_path):
+        text = "\\N".join(textwrap.wrap(_escape(sub.text), width=CAPTION_WRAP))
+        lines.append(
+            f"Dialogue: 0,{_timestamp(sub.start.ordinal)},{_timestamp(sub.end.ordinal)},"
+            f"Caption,,0,0,0,,{{\\pos({x},{y})}}{text}\n"
+        )
+
+    with open(ass_path, "w", encoding="utf-8") as file:
+        file.writelines(lines)
+    return ass_path
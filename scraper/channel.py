@@ -0,0 +1,368 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+import xml.etree.ElementTree as ElementTree
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+import aiohttp
+
+from logger import log
+
+YOUTUBE_URL = "https://www.youtube.com"
+
+# skips the EU consent interstitial that would otherwise replace the page
+CONSENT_COOKIES = {"CONSENT": "YES+cb", "SOCS": "CAI"}
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+INITIAL_DATA_RE = re.compile(
+    r"(?:var ytInitialData|window\[\"ytInitialData\"\])\s*=\s*({.*?});\s*</script>",
+    re.DOTALL,
+)
+API_KEY_RE = re.compile(r'"INNERTUBE_API_KEY"\s*:\s*"([^"]+)"')
+CLIENT_VERSION_RE = re.compile(r'"INNERTUBE_CLIENT_VERSION"\s*:\s*"([^"]+)"')
+
+VIDEO_RENDERERS = ("videoRenderer", "gridVideoRenderer")
+
+FEED_NAMESPACES = {
+    "atom": "http://www.w3.org/2005/Atom",
+    "yt": "http://www.youtube.com/xml/schemas/2015",
+    "media": "http://search.yahoo.com/mrss/",
+}
+VIEWS_RE = re.compile(r"([\d.,]+)\s*([KMB]?)", re.IGNORECASE)
+AGO_RE = re.compile(r"(\d+)\s+(second|minute|hour|day|week|month|year)s?\s+ago")
+MULTIPLIERS = {"": 1, "k": 1e3, "m": 1e6, "b": 1e9}
+UNIT_SECONDS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+    "week": 7 * 86400,
+    "month": 30 * 86400,
+    "year": 365 * 86400,
+}
+
+
+class ChannelListingError(Exception):
+    pass
+
+
+@dataclass
+class ChannelVideo:
+    video_id: str
+    title: str
+    published: Optional[str] = None
+    views: Optional[str] = None
+    length: Optional[str] = None
+
+    @property
+    def url(self) -> str:
+        return f"{YOUTUBE_URL}/watch?v={self.video_id}"
+
+
+@dataclass
+class ChannelPage:
+    """One poll of a channel, empty and `not_modified` when it answered 304."""
+
+    channel: str
+    videos: list[ChannelVideo] = field(default_factory=list)
+    channel_id: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    not_modified: bool = False
+
+    @property
+    def digest(self) -> str:
+        """Changes only when the listed videos or their view counts do."""
+        listed = [(video.video_id, video.views) for video in self.videos]
+        return hashlib.sha1(json.dumps(listed).encode()).hexdigest()
+
+
+def parse_views(text: Optional[str]) -> Optional[int]:
+    """Reads "1,234 views", "1.2M views" or a bare count, None without a number."""
+    match = VIEWS_RE.search(text or "")
+    if match is None:
+        return None
+    number, suffix = match.groups()
+    if suffix:
+        # abbreviated counts use a decimal point, full ones thousands separators
+        return int(float(number.replace(",", "")) * MULTIPLIERS[suffix.lower()])
+    return int(number.replace(",", "").replace(".", ""))
+
+
+def parse_published(text: Optional[str], now: float = None) -> Optional[float]:
+    """Timestamp of "3 days ago" style or ISO publish times, None if unreadable."""
+    if not text:
+        return None
+    match = AGO_RE.search(text)
+    if match is not None:
+        amount, unit = match.groups()
+        return (now or time.time()) - int(amount) * UNIT_SECONDS[unit]
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        return None
+
+
+def channel_videos_url(channel: str) -> str:
+    """Turns a channel name, handle or URL into the URL of its videos tab."""
+    if channel.startswith("http"):
+        url = channel.rstrip("/")
+    elif channel.startswith("@"):
+        url = f"{YOUTUBE_URL}/{channel}"
+    else:
+        url = f"{YOUTUBE_URL}/c/{channel}"
+
+    if not url.endswith("/videos"):
+        url += "/videos"
+    return url
+
+
+def extract_initial_data(html: str) -> dict:
+    match = INITIAL_DATA_RE.search(html)
+    if match is None:
+        raise ChannelListingError("No ytInitialData found in page")
+    try:
+        return json.loads(match.group(1))
+    except json.JSONDecodeError as e:
+        raise ChannelListingError(f"Unreadable ytInitialData: {e}") from e
+
+
+def extract_channel_id(data: dict) -> Optional[str]:
+    for node in _walk(data):
+        metadata = node.get("channelMetadataRenderer")
+        if isinstance(metadata, dict) and metadata.get("externalId"):
+            return metadata["externalId"]
+    return None
+
+
+def parse_feed(xml: str) -> list[ChannelVideo]:
+    """Reads the videos of a channel's Atom feed, newest first like the page."""
+    try:
+        root = ElementTree.fromstring(xml)
+    except ElementTree.ParseError as e:
+        raise ChannelListingError(f"Unreadable feed: {e}") from e
+
+    videos = []
+    for entry in root.findall("atom:entry", FEED_NAMESPACES):
+        video_id = entry.findtext("yt:videoId", namespaces=FEED_NAMESPACES)
+        if not video_id:
+            continue
+        statistics = entry.find(
+            "media:group/media:community/media:statistics", FEED_NAMESPACES
+        )
+        videos.append(
+            ChannelVideo(
+                video_id=video_id,
+                title=entry.findtext("atom:title", "", FEED_NAMESPACES),
+                published=entry.findtext("atom:published", None, FEED_NAMESPACES),
+                views=statistics.get("views") if statistics is not None else None,
+            )
+        )
+    return videos
+
+
+def extract_client_config(html: str):
+    api_key = API_KEY_RE.search(html)
+    version = CLIENT_VERSION_RE.search(html)
+    if api_key is None or version is None:
+        return None, None
+    return api_key.group(1), version.group(1)
+
+
+def _text(node: Optional[dict]) -> Optional[str]:
+    if not node:
+        return None
+    if "simpleText" in node:
+        return node["simpleText"]
+    return "".join(run.get("text", "") for run in node.get("runs", []))
+
+
+def _walk(node):
+    """Yields every dict nested anywhere in the given JSON value."""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            yield node
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+
+
+def parse_videos(data: dict):
+    """Returns the videos and the continuation token found in a browse response.
+
+    Works for both the initial page data and the `youtubei/v1/browse`
+    continuation responses since they share the same renderers.
+    """
+    videos: list[ChannelVideo] = []
+    seen = set()
+    continuation = None
+
+    for node in _walk(data):
+        for key in VIDEO_RENDERERS:
+            renderer = node.get(key)
+            if not isinstance(renderer, dict) or "videoId" not in renderer:
+                continue
+            if renderer["videoId"] in seen:
+                continue
+            seen.add(renderer["videoId"])
+            videos.append(
+                ChannelVideo(
+                    video_id=renderer["videoId"],
+                    title=_text(renderer.get("title")) or "",
+                    published=_text(renderer.get("publishedTimeText")),
+                    views=_text(renderer.get("viewCountText")),
+                    length=_text(renderer.get("lengthText")),
+                )
+            )
+
+        item = node.get("continuationItemRenderer")
+        if isinstance(item, dict) and continuation is None:
+            command = item.get("continuationEndpoint", {}).get(
+                "continuationCommand", {}
+            )
+            continuation = command.get("token")
+
+    return videos, continuation
+
+
+class ChannelLister:
+    """Lists channel videos over plain HTTP, without starting a browser."""
+
+    def __init__(self, base_url: str = YOUTUBE_URL, concurrency: int = 8):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+
+    def session(self) -> aiohttp.ClientSession:
+        return aiohttp.ClientSession(
+            headers=HEADERS,
+            cookies=CONSENT_COOKIES,
+            timeout=aiohttp.ClientTimeout(total=30),
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+        )
+
+    def _url(self, channel: str) -> str:
+        return channel_videos_url(channel).replace(YOUTUBE_URL, self.base_url, 1)
+
+    async def _continue(self, session, api_key, client_version, token) -> dict:
+        payload = {
+            "context": {
+                "client": {"clientName": "WEB", "clientVersion": client_version}
+            },
+            "continuation": token,
+        }
+        async with session.post(
+            f"{self.base_url}/youtubei/v1/browse",
+            params={"key": api_key, "prettyPrint": "false"},
+            json=payload,
+        ) as response:
+            response.raise_for_status()
+            try:
+                return await response.json(content_type=None)
+            except json.JSONDecodeError as e:
+                raise ChannelListingError(f"Unreadable browse response: {e}") from e
+
+    async def list_channel(
+        self, session: aiohttp.ClientSession, channel: str, max_pages: int = 1
+    ) -> list[ChannelVideo]:
+        async with session.get(self._url(channel)) as response:
+            response.raise_for_status()
+            html = await response.text()
+
+        videos, token = parse_videos(extract_initial_data(html))
+        api_key, client_version = extract_client_config(html)
+
+        pages = 1
+        while token and pages < max_pages and api_key:
+            data = await self._continue(session, api_key, client_version, token)
+            more, token = parse_videos(data)
+            videos.extend(more)
+            pages += 1
+
+        log.info(f"{len(videos)} videos found on {pages} page(s) of {channel}")
+        return videos
+
+    async def poll(
+        self,
+        session: aiohttp.ClientSession,
+        channel: str,
+        channel_id: str = None,
+        etag: str = None,
+        last_modified: str = None,
+    ) -> ChannelPage:
+        """Fetches the channel's feed, or its videos page while its ID is unknown.
+
+        The validators of the previous poll make the request conditional, an
+        unchanged feed answers 304 without a body.
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        url = self._url(channel)
+        if channel_id:
+            url = f"{self.base_url}/feeds/videos.xml?channel_id={channel_id}"
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304:
+                return ChannelPage(
+                    channel, [], channel_id, etag, last_modified, not_modified=True
+                )
+            if response.status == 404 and channel_id:
+                log.warn(f"No feed for {channel} at {channel_id}, reading its page")
+                return await self.poll(session, channel)
+            response.raise_for_status()
+            body = await response.text()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+
+        if channel_id:
+            return ChannelPage(
+                channel, parse_feed(body), channel_id, etag, last_modified
+            )
+
+        data = extract_initial_data(body)
+        videos, _ = parse_videos(data)
+        channel_id = extract_channel_id(data)
+        if channel_id:
+            # the next poll reads the feed, the page's validators don't apply to it
+            etag = last_modified = None
+        return ChannelPage(channel, videos, channel_id, etag, last_modified)
+
+    async def list_channels(self, channels: list[str], max_pages: int = 1):
+        """Lists several channels concurrently, returns a dict keyed by channel.
+
+        A channel that fails to list maps to an empty list.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def list_one(session, channel):
+            async with semaphore:
+                try:
+                    return await self.list_channel(session, channel, max_pages)
+                except (
+                    aiohttp.ClientError,
+                    asyncio.TimeoutError,
+                    ChannelListingError,
+                ) as e:
+                    log.error(f"Failed to list {channel}:", e)
+                    return []
+
+        async with self.session() as session:
+            results = await asyncio.gather(
+                *[list_one(session, channel) for channel in channels]
+            )
+        return dict(zip(channels, results))
+
+    async def video_urls(self, channel: str, max_pages: int = 1) -> list[str]:
+        videos = (await self.list_channels([channel], max_pages))[channel]
+        return [video.url for video in videos]
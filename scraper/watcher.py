@@ -0,0 +1,159 @@
+import asyncio
+import os
+
+import aiohttp
+
+from logger import log, metrics, trace
+from scraper.channel import (
+    ChannelLister,
+    ChannelListingError,
+    ChannelPage,
+    ChannelVideo,
+)
+from store.artifacts import video_id
+
+WATCH_CONCURRENCY = int(os.environ.get("WATCH_CONCURRENCY", 8))
+
+
+class ChannelWatcher:
+    """Polls channels and hands out only the videos worth clipping.
+
+    Every poll is recorded in a `VideoIndex`: a channel's feed is fetched
+    conditionally with the validators of its previous poll, an unchanged
+    listing is dropped without looking at its videos, and of a changed one
+    only the new and the re-trending videos come back. Videos handed out
+    earlier that the caller never queued come back with every poll. `fallback`
+    lists a channel's video URLs some other way, like a browser, for when the
+    HTTP poll fails or finds nothing.
+    """
+
+    def __init__(
+        self,
+        index,
+        lister: ChannelLister = None,
+        fallback=None,
+        concurrency: int = WATCH_CONCURRENCY,
+    ):
+        self.index = index
+        self.lister = lister or ChannelLister(concurrency=concurrency)
+        self.fallback = fallback
+        self.concurrency = concurrency
+
+        self._session = None
+        # created inside the loop that runs the polls
+        self._slots = None
+
+        self.polls = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.new = 0
+        self.trending = 0
+        self.retried = 0
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            self._session = self.lister.session()
+        return self._session
+
+    async def _fetch(self, channel: str) -> ChannelPage:
+        known = await asyncio.to_thread(self.index.channel, channel)
+        if known is None:
+            return await self.lister.poll(self.session, channel)
+        return await self.lister.poll(
+            self.session,
+            channel,
+            known["channel_id"],
+            known["etag"],
+            known["last_modified"],
+        )
+
+    async def _fall_back(self, channel: str) -> ChannelPage:
+        urls = await self.fallback(channel)
+        return ChannelPage(channel, [ChannelVideo(video_id(url), "") for url in urls])
+
+    async def poll_channel(self, channel: str) -> list[ChannelVideo]:
+        """The channel's videos that are new or trending since the last poll."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+
+        async with self._slots:
+            with trace.span("watch.poll", channel=channel) as span:
+                self.polls += 1
+                try:
+                    page = await self._fetch(channel)
+                except (
+                    aiohttp.ClientError,
+                    asyncio.TimeoutError,
+                    ChannelListingError,
+                ) as e:
+                    log.error(f"Failed to poll {channel}:", e)
+                    self.failed += 1
+                    page = None
+
+                if page is not None and page.not_modified:
+                    return await self._unchanged(page, "not modified")
+                known = await asyncio.to_thread(self.index.channel, channel)
+                if page is not None and known and page.digest == known["digest"]:
+                    return await self._unchanged(page, "unchanged")
+
+                if (page is None or not page.videos) and self.fallback is not None:
+                    log.warn(f"Polling {channel} found nothing, using the fallback")
+                    page = await self._fall_back(channel)
+                if page is None:
+                    return await self._retries(channel)
+
+                found = await asyncio.to_thread(
+                    self.index.observe, channel, page.videos
+                )
+                await asyncio.to_thread(self.index.polled, page, True)
+                for video, reason in found:
+                    metrics.count("watched_videos_total", reason=reason)
+                    log.info(f"{channel}: queuing {reason} video {video.video_id}")
+                self.new += sum(reason == "new" for _, reason in found)
+                self.trending += sum(reason == "trending" for _, reason in found)
+                span.set(listed=len(page.videos), queued=len(found))
+                videos = [video for video, _ in found]
+                return videos + await self._retries(channel, videos)
+
+    async def _unchanged(self, page: ChannelPage, why: str) -> list:
+        self.unchanged += 1
+        await asyncio.to_thread(self.index.polled, page, False)
+        metrics.count("channel_polls_unchanged_total")
+        log.info(f"{page.channel}: {why} since the last poll")
+        return await self._retries(page.channel)
+
+    async def _retries(self, channel: str, found: list = ()) -> list:
+        """Videos handed out before whose clip jobs never reached the ledger."""
+        handed_out = {video.video_id for video in found}
+        videos = [
+            video
+            for video in await asyncio.to_thread(self.index.pending, channel)
+            if video.video_id not in handed_out
+        ]
+        for video in videos:
+            metrics.count("watched_videos_total", reason="retry")
+            log.info(f"{channel}: queuing video {video.video_id} again")
+        self.retried += len(videos)
+        return videos
+
+    async def poll(self, channels: list[str]) -> dict:
+        """Polls the channels concurrently, returns what each of them queued."""
+        found = await asyncio.gather(*[self.poll_channel(c) for c in channels])
+        return dict(zip(channels, found))
+
+    def stats(self) -> dict:
+        return {
+            "polls": self.polls,
+            "unchanged": self.unchanged,
+            "failed": self.failed,
+            "new": self.new,
+            "trending": self.trending,
+            "retried": self.retried,
+            **self.index.stats(),
+        }
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from logger import log
+
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", "artifacts")
+ARTIFACT_BUDGET = int(float(os.environ.get("ARTIFACT_BUDGET_GB", 20)) * 1024**3)
+# reads only move access times, the manifest takes them at most this often
+MANIFEST_SAVE_INTERVAL = float(os.environ.get("MANIFEST_SAVE_SECONDS", 30))
+
+_VIDEO_ID = re.compile(r"(?:v=|youtu\.be/|shorts/|embed/)([\w-]{11})")
+
+
+def video_id(url: str) -> str:
+    """Extracts the video ID from a YouTube URL without any network call."""
+    match = _VIDEO_ID.search(url)
+    if match is None:
+        raise ValueError(f"No video ID in {url}")
+    return match.group(1)
+
+
+class ArtifactStore:
+    """Content-addressed store for everything a run produces.
+
+    Artifacts are keyed by video ID, stage and the parameters that produced
+    them (window, render settings, ...). A JSON manifest indexes them, writes
+    are atomic and the least recently used artifacts are evicted once the
+    store grows past its disk budget, except those a stage has pinned.
+    """
+
+    def __init__(
+        self,
+        root: str = ARTIFACT_DIR,
+        budget: int = ARTIFACT_BUDGET,
+        save_interval: float = MANIFEST_SAVE_INTERVAL,
+    ):
+        self.root = root
+        self.budget = budget
+        self.save_interval = save_interval
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self._lock = threading.RLock()
+        # artifact key -> number of readers holding it
+        self._pins = {}
+        self._dirty = False
+        self._saved_at = time.time()
+
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+        self._entries = self._load()
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            log.warn("Artifact manifest unreadable, starting empty:", e)
+            return {}
+
+    def _save(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self._entries, file)
+        os.replace(tmp_path, self.manifest_path)
+        self._dirty = False
+        self._saved_at = time.time()
+
+    def _touched(self):
+        self._dirty = True
+        if time.time() - self._saved_at >= self.save_interval:
+            self._save()
+
+    @staticmethod
+    def key(video_id: str, stage: str, params: dict = None) -> str:
+        blob = json.dumps([video_id, stage, params or {}], sort_keys=True)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _path(self, video_id: str, stage: str, key: str, ext: str) -> str:
+        return os.path.join(self.root, video_id, f"{stage}-{key[:16]}{ext}")
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return sum(entry["size"] for entry in self._entries.values())
+
+    def get(self, video_id: str, stage: str, params: dict = None):
+        """Returns the path of the artifact, or None if it is not stored."""
+        key = self.key(video_id, stage, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            path = os.path.join(self.root, entry["path"])
+            if not os.path.exists(path) or os.path.getsize(path) != entry["size"]:
+                log.warn(f"Dropping missing or damaged artifact {stage} of {video_id}")
+                self._entries.pop(key)
+                self._save()
+                return None
+
+            entry["accessed"] = time.time()
+            self._touched()
+            return path
+
+    @contextmanager
+    def pinned(self, video_id: str, stage: str, params: dict = None):
+        """Yields the artifact's path like `get`, keeps it from eviction meanwhile."""
+        key = self.key(video_id, stage, params)
+        with self._lock:
+            path = self.get(video_id, stage, params)
+            if path is not None:
+                self._pins[key] = self._pins.get(key, 0) + 1
+        try:
+            yield path
+        finally:
+            if path is not None:
+                with self._lock:
+                    self._pins[key] -= 1
+                    if self._pins[key] == 0:
+                        del self._pins[key]
+
+    @contextmanager
+    def writer(self, video_id: str, stage: str, params: dict = None, ext: str = ""):
+        """Yields a temporary path to write the artifact to.
+
+        The artifact is moved into place and recorded only if the block
+        finishes without an exception, so readers never see partial files.
+        """
+        key = self.key(video_id, stage, params)
+        tmp_path = os.path.join(
+            self.root, "tmp", f"{key[:16]}-{uuid.uuid4().hex[:8]}{ext}"
+        )
+        try:
+            yield tmp_path
+            if not os.path.exists(tmp_path):
+                raise FileNotFoundError(f"{stage} of {video_id} was not written")
+            self._commit(video_id, stage, params, key, tmp_path, ext)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def put(self, video_id: str, stage: str, params: dict, data, ext: str = ""):
+        """Stores text or bytes as an artifact, returns its path."""
+        mode = "w" if isinstance(data, str) else "wb"
+        with self.writer(video_id, stage, params, ext) as tmp_path:
+            with open(tmp_path, mode) as file:
+                file.write(data)
+        return self.get(video_id, stage, params)
+
+    def _commit(self, video_id, stage, params, key, tmp_path, ext):
+        path = self._path(video_id, stage, key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+
+        now = time.time()
+        with self._lock:
+            self._entries[key] = {
+                "video_id": video_id,
+                "stage": stage,
+                "params": params or {},
+                "path": os.path.relpath(path, self.root),
+                "size": os.path.getsize(path),
+                "created": now,
+                "accessed": now,
+            }
+            self._evict(keep=key)
+            self._save()
+
+    def remove(self, video_id: str, stage: str, params: dict = None):
+        key = self.key(video_id, stage, params)
+        with self._lock:
+            if key in self._pins:
+                # still read elsewhere, eviction takes it once it is released
+                return
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._delete(entry)
+                self._save()
+
+    def _delete(self, entry: dict):
+        try:
+            os.remove(os.path.join(self.root, entry["path"]))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, keep: str = None):
+        total = sum(entry["size"] for entry in self._entries.values())
+        by_age = sorted(self._entries.items(), key=lambda item: item[1]["accessed"])
+        for key, entry in by_age:
+            if total <= self.budget:
+                break
+            if key == keep or key in self._pins:
+                continue
+            log.info(f"Evicting {entry['stage']} of {entry['video_id']}")
+            self._delete(self._entries.pop(key))
+            total -= entry["size"]
+
+    def close(self):
+        with self._lock:
+            if self._dirty:
+                self._save()
@@ -0,0 +1,201 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from logger import log
+
+LEDGER_PATH = os.environ.get("LEDGER_PATH", "ledger.sqlite3")
+MAX_ATTEMPTS = int(os.environ.get("MAX_ATTEMPTS", 3))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    start_time INTEGER NOT NULL,
+    end_time INTEGER NOT NULL,
+    title TEXT,
+    stage TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attempts (
+    job_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    PRIMARY KEY (job_id, stage)
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    job_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    path TEXT,
+    size INTEGER,
+    sha256 TEXT,
+    completed REAL NOT NULL,
+    PRIMARY KEY (job_id, stage)
+);
+"""
+
+
+def sha256sum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _locked(method):
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+def job_key(video_id: str, start_time: int, end_time: int) -> str:
+    return f"{video_id}:{start_time}:{end_time}"
+
+
+class Ledger:
+    """SQLite record of every clip job and how far it got.
+
+    Each finished stage leaves a checkpoint with the path, size and checksum
+    of its artifact. A restarted run resumes from the last checkpoint whose
+    artifact is still intact and retries failed stages up to `max_attempts`.
+    """
+
+    def __init__(
+        self,
+        stages: list[str],
+        path: str = LEDGER_PATH,
+        max_attempts: int = MAX_ATTEMPTS,
+    ):
+        self.stages = stages
+        self.max_attempts = max_attempts
+        # checksums are computed off the event loop, so threads share the connection
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self._lock = threading.RLock()
+
+    @_locked
+    def add(self, job) -> bool:
+        """Records the job, returns False if the ledger already knows it."""
+        now = time.time()
+        cursor = self.db.execute(
+            "INSERT OR IGNORE INTO jobs (job_id, url, video_id, start_time, end_time,"
+            " created, updated) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job.key, job.url, job.video_id, job.start_time, job.end_time, now, now),
+        )
+        return cursor.rowcount == 1
+
+    @_locked
+    def unfinished(self) -> list[sqlite3.Row]:
+        return self.db.execute(
+            "SELECT * FROM jobs WHERE status IN ('pending', 'running') ORDER BY created"
+        ).fetchall()
+
+    def _valid(self, row: sqlite3.Row) -> bool:
+        if row["path"] is None:
+            return True
+        if (
+            os.path.exists(row["path"])
+            and os.path.getsize(row["path"]) == row["size"]
+            and sha256sum(row["path"]) == row["sha256"]
+        ):
+            return True
+        log.warn(f"Checkpoint {row['stage']} of {row['job_id']} is gone or damaged")
+        with self._lock:
+            self.db.execute(
+                "DELETE FROM checkpoints WHERE job_id = ? AND stage = ?",
+                (row["job_id"], row["stage"]),
+            )
+        return False
+
+    def completed(self, job, stage: str) -> bool:
+        """True if this stage, or a later one, finished and its artifact is intact."""
+        # artifacts are hashed outside the lock, other jobs keep using the ledger
+        with self._lock:
+            rows = {
+                row["stage"]: row
+                for row in self.db.execute(
+                    "SELECT * FROM checkpoints WHERE job_id = ?", (job.key,)
+                )
+            }
+        return any(
+            later in rows and self._valid(rows[later])
+            for later in reversed(self.stages[self.stages.index(stage) :])
+        )
+
+    @_locked
+    def begin(self, job, stage: str) -> bool:
+        """Counts an attempt, returns False once the stage ran out of them."""
+        self.db.execute(
+            "INSERT INTO attempts (job_id, stage, attempts) VALUES (?, ?, 1)"
+            " ON CONFLICT (job_id, stage) DO UPDATE SET attempts = attempts + 1",
+            (job.key, stage),
+        )
+        attempts = self.db.execute(
+            "SELECT attempts FROM attempts WHERE job_id = ? AND stage = ?",
+            (job.key, stage),
+        ).fetchone()["attempts"]
+
+        if attempts > self.max_attempts:
+            self._update(job, stage, "failed")
+            return False
+        self._update(job, stage, "running")
+        return True
+
+    def checkpoint(self, job, stage: str, path: str = None):
+        size = sha = None
+        if path is not None:
+            size, sha = os.path.getsize(path), sha256sum(path)
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO checkpoints (job_id, stage, path, size,"
+                " sha256, completed) VALUES (?, ?, ?, ?, ?, ?)",
+                (job.key, stage, path, size, sha, time.time()),
+            )
+            done = stage == self.stages[-1]
+            self._update(job, stage, "done" if done else "running")
+
+    @_locked
+    def fail(self, job, stage: str, error: Exception):
+        self.db.execute(
+            "UPDATE attempts SET error = ? WHERE job_id = ? AND stage = ?",
+            (repr(error), job.key, stage),
+        )
+        self._update(job, stage, "pending")
+
+    @_locked
+    def cancel(self, jobs: list):
+        """Leaves the jobs out of the resumable ones until they are run again."""
+        now = time.time()
+        self.db.executemany(
+            "UPDATE jobs SET status = 'cancelled', updated = ? WHERE job_id = ?",
+            [(now, job.key) for job in jobs],
+        )
+
+    def _update(self, job, stage: str, status: str):
+        self.db.execute(
+            "UPDATE jobs SET stage = ?, status = ?, title = ?, updated = ?"
+            " WHERE job_id = ?",
+            (stage, status, job.title, time.time(), job.key),
+        )
+
+    @_locked
+    def title(self, job) -> Optional[str]:
+        row = self.db.execute(
+            "SELECT title FROM jobs WHERE job_id = ?", (job.key,)
+        ).fetchone()
+        return row["title"] if row else None
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,242 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from scraper.channel import ChannelPage, ChannelVideo, parse_published, parse_views
+
+VIDEO_INDEX_PATH = os.environ.get("VIDEO_INDEX_PATH", "videos.sqlite3")
+# on a channel's first poll only its newest videos count as new, the rest is backlog
+FIRST_POLL_VIDEOS = int(os.environ.get("FIRST_POLL_VIDEOS", 3))
+# re-trending: views coming in this many times faster than the video's average
+RETREND_FACTOR = float(os.environ.get("RETREND_FACTOR", 3))
+RETREND_MIN_VIEWS = int(os.environ.get("RETREND_MIN_VIEWS", 10000))
+# a queued video is not queued again for trending within this many seconds
+RETREND_COOLDOWN = float(os.environ.get("RETREND_COOLDOWN_HOURS", 72)) * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (
+    channel TEXT PRIMARY KEY,
+    channel_id TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    digest TEXT,
+    polled REAL NOT NULL,
+    changed REAL
+);
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY,
+    channel TEXT NOT NULL,
+    title TEXT,
+    published REAL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    offered REAL,
+    queued REAL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    video_id TEXT NOT NULL,
+    taken REAL NOT NULL,
+    views INTEGER NOT NULL,
+    PRIMARY KEY (video_id, taken)
+);
+"""
+
+
+def _locked(method):
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class VideoIndex:
+    """SQLite record of every video the channel polls have seen.
+
+    Each video keeps its publish time and a view count snapshot per poll,
+    each channel the validators of its last poll. A poll then only yields
+    the videos that are new or whose views started coming in much faster
+    than their average so far. A video handed out counts as queued only once
+    its clip jobs are in the ledger, until then it is handed out again.
+    """
+
+    def __init__(
+        self,
+        path: str = VIDEO_INDEX_PATH,
+        first_poll_videos: int = FIRST_POLL_VIDEOS,
+        retrend_factor: float = RETREND_FACTOR,
+        retrend_min_views: int = RETREND_MIN_VIEWS,
+        retrend_cooldown: float = RETREND_COOLDOWN,
+    ):
+        self.first_poll_videos = first_poll_videos
+        self.retrend_factor = retrend_factor
+        self.retrend_min_views = retrend_min_views
+        self.retrend_cooldown = retrend_cooldown
+        # polls of several channels share the connection
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        columns = [row["name"] for row in self.db.execute("PRAGMA table_info(videos)")]
+        if "offered" not in columns:
+            self.db.execute("ALTER TABLE videos ADD COLUMN offered REAL")
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def _transaction(self):
+        self.db.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    @_locked
+    def channel(self, channel: str) -> Optional[sqlite3.Row]:
+        return self.db.execute(
+            "SELECT * FROM channels WHERE channel = ?", (channel,)
+        ).fetchone()
+
+    @_locked
+    def polled(self, page: ChannelPage, changed: bool):
+        """Records a poll and the validators to send with the next one."""
+        now = time.time()
+        self.db.execute(
+            "INSERT INTO channels (channel, channel_id, etag, last_modified, digest,"
+            " polled, changed) VALUES (?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (channel) DO UPDATE SET"
+            " channel_id = COALESCE(excluded.channel_id, channel_id),"
+            " etag = excluded.etag, last_modified = excluded.last_modified,"
+            " digest = COALESCE(excluded.digest, digest), polled = excluded.polled,"
+            " changed = COALESCE(excluded.changed, changed)",
+            (
+                page.channel,
+                page.channel_id,
+                page.etag,
+                page.last_modified,
+                page.digest if changed else None,
+                now,
+                now if changed else None,
+            ),
+        )
+
+    @_locked
+    def observe(self, channel: str, videos: list[ChannelVideo]) -> list[tuple]:
+        """Records the listed videos, returns (video, "new" or "trending") to queue."""
+        now = time.time()
+        with self._transaction():
+            found = self._observe(channel, videos, now)
+            self.db.executemany(
+                "UPDATE videos SET offered = ? WHERE video_id = ?",
+                [(now, video.video_id) for video, _ in found],
+            )
+        return found
+
+    def _observe(self, channel: str, videos: list[ChannelVideo], now: float) -> list:
+        known = self.channel(channel)
+        first_poll = known is None or known["changed"] is None
+
+        found = []
+        for i, video in enumerate(videos):
+            row = self.db.execute(
+                "SELECT * FROM videos WHERE video_id = ?", (video.video_id,)
+            ).fetchone()
+            published = parse_published(video.published, now)
+            if row is None:
+                self.db.execute(
+                    "INSERT INTO videos (video_id, channel, title, published,"
+                    " first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?)",
+                    (video.video_id, channel, video.title, published, now, now),
+                )
+            else:
+                # relative times drift, the first estimate is kept
+                self.db.execute(
+                    "UPDATE videos SET title = ?, published = COALESCE(published, ?),"
+                    " last_seen = ? WHERE video_id = ?",
+                    (video.title or row["title"], published, now, video.video_id),
+                )
+
+            views = parse_views(video.views)
+            if views is not None:
+                self.db.execute(
+                    "INSERT OR IGNORE INTO snapshots (video_id, taken, views)"
+                    " VALUES (?, ?, ?)",
+                    (video.video_id, now, views),
+                )
+
+            if row is None:
+                if not first_poll or i < self.first_poll_videos:
+                    found.append((video, "new"))
+            elif self._trending(row, now):
+                found.append((video, "trending"))
+        return found
+
+    def _trending(self, row: sqlite3.Row, now: float) -> bool:
+        if row["queued"] is not None and now - row["queued"] < self.retrend_cooldown:
+            return False
+        snapshots = self.db.execute(
+            "SELECT taken, views FROM snapshots WHERE video_id = ?"
+            " ORDER BY taken DESC LIMIT 2",
+            (row["video_id"],),
+        ).fetchall()
+        if len(snapshots) < 2:
+            return False
+        latest, previous = snapshots
+        gained = latest["views"] - previous["views"]
+        if gained < self.retrend_min_views:
+            return False
+
+        recent_rate = gained / max(latest["taken"] - previous["taken"], 1)
+        # the average up to the previous poll, since publishing if that is known
+        since = row["published"] or row["first_seen"]
+        average_rate = previous["views"] / max(previous["taken"] - since, 1)
+        return recent_rate > self.retrend_factor * average_rate
+
+    @_locked
+    def pending(self, channel: str) -> list[ChannelVideo]:
+        """Videos handed out whose clip jobs never made it into the ledger."""
+        rows = self.db.execute(
+            "SELECT video_id, title FROM videos WHERE channel = ?"
+            " AND offered IS NOT NULL AND (queued IS NULL OR queued < offered)"
+            " ORDER BY offered",
+            (channel,),
+        ).fetchall()
+        return [ChannelVideo(row["video_id"], row["title"]) for row in rows]
+
+    @_locked
+    def queue(self, video_id: str):
+        """Marks the video queued, once the ledger has its clip jobs."""
+        self.db.execute(
+            "UPDATE videos SET queued = ? WHERE video_id = ?", (time.time(), video_id)
+        )
+
+    @_locked
+    def snapshots(self, video_id: str) -> list[sqlite3.Row]:
+        return self.db.execute(
+            "SELECT taken, views FROM snapshots WHERE video_id = ? ORDER BY taken",
+            (video_id,),
+        ).fetchall()
+
+    def _count(self, table: str, where: str = "1") -> int:
+        return self.db.execute(
+            f"SELECT COUNT(*) FROM {table} WHERE {where}"
+        ).fetchone()[0]
+
+    @_locked
+    def stats(self) -> dict:
+        return {
+            "channels": self._count("channels"),
+            "videos": self._count("videos"),
+            "queued": self._count("videos", "queued IS NOT NULL"),
+            "pending": self._count(
+                "videos", "offered IS NOT NULL AND (queued IS NULL OR queued < offered)"
+            ),
+            "snapshots": self._count("snapshots"),
+        }
+
+    def close(self):
+        self.db.close()
@@ -1,46 +1,29 @@
+import asyncio
 import os
 import sys
 from threading import Thread
-from dataclasses import dataclass
 import time
 from dotenv import load_dotenv
 
-from openai import OpenAI
-from pytube import YouTube
-from moviepy.config import change_settings
-
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-
+# pytube, moviepy, bs4 and selenium are imported where they are used
 
 # internal imports
+from llm.api import OpenAIApi
+from llm.cache import ResponseCache
+from llm.viral import ViralPart, ViralScorer
 from logger import log
+from scraper.watcher import ChannelWatcher
+from store.artifacts import ArtifactStore, video_id
+from store.videos import VideoIndex
+from transcription.service import TranscriptService
+from transcription.words import words_to_srt
 
-# from uploader import tiktok, yt_shorts
+# from uploader.fanout import Publisher, uploaders_from_env
 
-log.emphasize("Starting program...")
 load_dotenv()
 DEV = os.environ.get("ENV") == "development"
 
 ffmpeg_path = "/usr/local/bin/ffmpeg" if DEV else "/usr/bin/ffmpeg"
-change_settings({"FFMPEG_BINARY": ffmpeg_path})
-
-if DEV:
-    from selenium.webdriver.firefox.options import Options as FirefoxOptions
-else:
-    from selenium.webdriver.chrome.service import Service
-    from selenium.webdriver.chrome.options import Options as ChromeOptions
-
-
-@dataclass
-class ViralPart:
-    start_time: int
-    end_time: int
-    title: str
-    path_to_transcript: str
-
 
 VIDEO_DIR = "video"
 OUT_DIR = "out"
@@ -48,61 +31,100 @@ TRANSCRIPT_DIR = "transcripts"
 AUDIO_DIR = "audio"
 
 N_VIDEOS = 1
+N_VIRAL_PARTS = 10
 
 API_KEY = os.environ.get("OPENAI_API_KEY")
 
-if not os.path.exists(VIDEO_DIR):
-    log.warn("Creating video directory...")
-    os.makedirs(VIDEO_DIR)
+# set up by setup(), so importing this module does no work
+api = None
+store = None
+transcripts = None
+scorer = None
+seen = None
+api_loop = None
+
 
-if not os.path.exists(OUT_DIR):
-    log.warn("Creating output directory...")
-    os.makedirs(OUT_DIR)
+def setup():
+    """Creates the directories, the API client and the loop the API calls run on."""
+    global api, store, transcripts, scorer, seen, api_loop
+    from moviepy.config import change_settings
 
-if not os.path.exists(TRANSCRIPT_DIR):
-    log.warn("Creating transcript directory...")
-    os.makedirs(TRANSCRIPT_DIR)
+    change_settings({"FFMPEG_BINARY": ffmpeg_path})
 
-if not os.path.exists(AUDIO_DIR):
-    log.warn("Creating audio directory...")
-    os.makedirs(AUDIO_DIR)
+    for name, directory in [
+        ("video", VIDEO_DIR),
+        ("output", OUT_DIR),
+        ("transcript", TRANSCRIPT_DIR),
+        ("audio", AUDIO_DIR),
+    ]:
+        if not os.path.exists(directory):
+            log.warn(f"Creating {name} directory...")
+            os.makedirs(directory)
 
-if API_KEY is None:
-    log.error("No OpenAI API key found")
-    sys.exit(1)
+    if API_KEY is None:
+        log.error("No OpenAI API key found")
+        sys.exit(1)
 
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    api = OpenAIApi(api_key=API_KEY)
+    store = ArtifactStore()
+    transcripts = TranscriptService(api, store)
+    scorer = ViralScorer(api, ResponseCache(), model="gpt-4-turbo-preview")
+    # what earlier runs already listed, shared by the browser threads
+    seen = VideoIndex()
 
-options = FirefoxOptions()
-# if no arguments are passed
-# arg can be anything
-if len(sys.argv) == 1:
-    options.add_argument("--headless")
-options.add_argument("--no-sandbox")
-options.add_argument("--disable-dev-shm-usage")
+    # every thread's API calls run on one loop, sharing the limiter and connections
+    api_loop = asyncio.new_event_loop()
+    Thread(target=api_loop.run_forever, daemon=True).start()
+
+
+def call_api(coroutine):
+    return asyncio.run_coroutine_threadsafe(coroutine, api_loop).result()
+
+
+def browser_options():
+    from selenium.webdriver.firefox.options import Options as FirefoxOptions
+
+    options = FirefoxOptions()
+    # if no arguments are passed
+    # arg can be anything
+    if len(sys.argv) == 1:
+        options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    return options
 
 
 @log.logger
 def download_video(url: str):
     """Uses PyTube to download the video."""
-    yt = YouTube(url)
-    log.info(f"Downloading video: {yt.title}")
+    vid = video_id(url)
+
+    # reruns go straight to the stored audio without touching the network
+    audio_path = store.get(vid, "audio")
+    if audio_path is not None:
+        log.warn(f"Audio already downloaded: {vid}")
+        seen.queue(vid)
+        create_viral_clip(audio_path, vid)
+        return
 
-    filename = yt.title.replace(" ", "_").lower()
+    from pytube import YouTube
 
-    if os.path.exists(os.path.join(VIDEO_DIR, filename)):
-        log.warn(f"Video already exists: {yt.title}")
-        return
+    yt = YouTube(url)
+    log.info(f"Downloading video: {yt.title}")
 
     def download_audio_and_find_viral_parts():
-        yt.streams.filter(only_audio=True).first().download(
-            output_path=AUDIO_DIR, filename=filename + ".mp3"
-        )
+        with store.writer(vid, "audio", ext=".mp3") as tmp_path:
+            yt.streams.filter(only_audio=True).first().download(
+                output_path=os.path.dirname(tmp_path),
+                filename=os.path.basename(tmp_path),
+            )
 
         log.info(f"Audio downloaded: {yt.title}")
-        log.info("Finding viral parts for video:", filename)
+        # stored, so the next poll stops offering it as pending
+        seen.queue(vid)
+        log.info("Finding viral parts for video:", vid)
 
-        create_viral_clip(filename + ".mp3")
+        create_viral_clip(store.get(vid, "audio"), vid)
 
     thread1 = Thread(
         # target=yt.streams.filter(progressive=True, file_extension="mp4", res="720p")
@@ -138,7 +160,7 @@ def create_clip_with_subtitles(viral_part: ViralPart):
 
 
 @log.logger
-def create_viral_clip(filename: str):
+def create_viral_clip(filename: str, vid: str = None):
     """This function will prompt OpenAI to find the viral parts of the video and then create a video clip for each viral part."""
     log.info("Finding viral parts for video:", filename)
 
@@ -146,49 +168,38 @@ def create_viral_clip(filename: str):
         log.error("Invalid file type")
         return
 
-    if not os.path.exists(f"{AUDIO_DIR}/{filename}"):
+    # stored audio comes as a full path, the rest lives in AUDIO_DIR
+    audio_path = filename if vid is not None else f"{AUDIO_DIR}/{filename}"
+    if not os.path.exists(audio_path):
         log.error("Audio file not found")
         return
 
-    transcript_filename = filename.replace(".mp3", ".srt")
     transcript = None
-    if os.path.exists(f"{TRANSCRIPT_DIR}/{transcript_filename}"):
-        log.warn("Transcript already exists")
-        with open(f"{TRANSCRIPT_DIR}/{transcript_filename}", "r") as f:
-            transcript = f.read()
+    if vid is not None:
+        # word-level and stored, main.py slices its clip transcripts from the same one
+        transcript = call_api(transcripts.srt(vid, audio_path=audio_path))
+        transcript_path = store.put(vid, "transcript", None, transcript, ".srt")
+    else:
+        transcript_path = f"{TRANSCRIPT_DIR}/{filename.replace('.mp3', '.srt')}"
+        if os.path.exists(transcript_path):
+            log.warn("Transcript already exists")
+            with open(transcript_path, "r") as f:
+                transcript = f.read()
 
     if transcript is None:
         log.warn("Creating transcript for audio file")
-        with open(f"{AUDIO_DIR}/{filename}", "rb") as audio_file:
-            transcript = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                response_format="srt",
-                prompt="Create a transcript of this video, one word at a time. There should be a new line for each word with the exact time it was spoken.",
-            )
-
-            log.info("Transcript created, saving...")
+        # long podcasts are split at silences and transcribed in parallel
+        transcript = words_to_srt(call_api(transcripts.transcribe(audio_path)))
+        log.info("Transcript created, saving...")
 
-    with open(f"{TRANSCRIPT_DIR}/{filename}.srt", "w") as f:
-        f.write(transcript)
+        with open(transcript_path, "w") as f:
+            f.write(transcript)
 
     log.info("Finding viral parts from transcript")
-    # viral_parts: list[ViralPart] = []
-
-    response = client.completions.create(
-        model="gpt-4-turbo-preview",
-        prompt="Given this transcript, find the parts of this video that will go viral on tiktok on YouTube Shorts, and create a list of viral parts with a title, the start and end time of each part.\n**Transcript**\n{transcript}",
-        max_tokens=100,
-        temperature=0.3,
-        n=10,
+    viral_parts: list[ViralPart] = call_api(
+        scorer.score(transcript, transcript_path, count=N_VIRAL_PARTS)
     )
-
-    print(response)
-
-    # viral_parts: list[ViralPart] = [
-    #     ViralPart(0, 10, "Title 1", "transcript1.srt"),
-    #     ViralPart(10, 20, "Title 2", "transcript2.srt"),
-    # ]
+    log.info(f"Found {len(viral_parts)} viral parts")
 
     # threads: list[Thread] = []
     # for viral_part in viral_parts:
@@ -200,10 +211,30 @@ def create_viral_clip(filename: str):
     #     thread.join()
 
 
-@log.logger
-def run_browser_instance(channel_url: str):
-    """This function will get videos from the channel and download them."""
-    driver = webdriver.Firefox(options=options)
+def list_channel_videos(channel_url: str) -> list[str]:
+    """Lists the channel's new videos over HTTP, falls back to the browser if that finds nothing."""
+
+    async def poll():
+        watcher = ChannelWatcher(
+            seen,
+            fallback=lambda channel: asyncio.to_thread(scrape_channel_videos, channel),
+        )
+        try:
+            return await watcher.poll_channel(channel_url)
+        finally:
+            await watcher.close()
+
+    return [video.url for video in asyncio.run(poll())]
+
+
+def scrape_channel_videos(channel_url: str) -> list[str]:
+    """Uses Selenium to scroll the channel page and collect video links."""
+    from bs4 import BeautifulSoup
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.keys import Keys
+
+    driver = webdriver.Firefox(options=browser_options())
     driver.get(channel_url)
 
     if driver.current_url.startswith("https://consent"):
@@ -214,7 +245,8 @@ def run_browser_instance(channel_url: str):
             button.click()
         except Exception as e:
             log.error("Error submitting consent form: ", e)
-            return
+            driver.quit()
+            return []
 
     log.info(f"Getting videos from channel: {channel_url}")
     log.info("Scrolling to the bottom of the page once...")
@@ -240,9 +272,17 @@ def run_browser_instance(channel_url: str):
         if href.startswith("/watch"):
             video_urls.add("https://www.youtube.com" + href)
 
-    video_urls = list(video_urls)
+    driver.quit()
+    log.info("Browser instance closed")
+    return list(video_urls)
+
+
+@log.logger
+def run_browser_instance(channel_url: str):
+    """This function will get videos from the channel and download them."""
+    video_urls = list_channel_videos(channel_url)
     if len(video_urls) == 0:
-        log.error("No videos found")
+        log.warn("No new videos found")
         return
 
     if len(video_urls) > 3:
@@ -250,8 +290,6 @@ def run_browser_instance(channel_url: str):
         video_urls = video_urls[:end]
 
     log.info(len(video_urls), "videos found")
-    driver.quit()
-    log.info("Browser instance closed")
 
     threads: list[Thread] = []
     for url in video_urls:
@@ -273,7 +311,9 @@ def run_browser_instance(channel_url: str):
 
 
 def main():
+    log.emphasize("Starting program...")
     start_time = time.time()
+    setup()
     urls = [
         "https://www.youtube.com/c/BetaSquad/videos",
         "https://www.youtube.com/c/@Sidemen/videos",
@@ -296,31 +336,18 @@ def main():
     #     return
 
     # files_to_upload = os.listdir(OUT_DIR)
+    # publisher = Publisher(uploaders_from_env())
     # try:
-    #     threads: list[Thread] = []
-    #     for file in files_to_upload:
-    #         thread = Thread(target=yt_shorts.upload, args=(file,))
-    #         threads.append(thread)
-    #         thread.start()
-
-    #     for thread in threads:
-    #         thread.join()
-    # except Exception as e:
-    #     print("Error: ", e)
-    #     return
-
-    # try:
-    #     threads: list[Thread] = []
-    #     for file in files_to_upload:
-    #         thread = Thread(target=tiktok.upload, args=(file,))
-    #         threads.append(thread)
-    #         thread.start()
-
-    #     for thread in threads:
-    #         thread.join()
+    #     call_api(
+    #         publisher.publish_all(
+    #             [os.path.join(OUT_DIR, file) for file in files_to_upload]
+    #         )
+    #     )
     # except Exception as e:
     #     print("Error: ", e)
     #     return
+    # finally:
+    #     call_api(publisher.close())
 
     print()
     log.info(f"Total time: {round(time.time() - start_time, 3)}")
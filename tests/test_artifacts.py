@@ -0,0 +1,40 @@
+import json
+import os
+
+from store.artifacts import ArtifactStore
+
+
+def manifest(store: ArtifactStore) -> dict:
+    with open(store.manifest_path, "r") as file:
+        return json.load(file)
+
+
+def test_reads_do_not_rewrite_the_manifest(tmp_path):
+    store = ArtifactStore(str(tmp_path), save_interval=3600)
+    store.put("dQw4w9WgXcQ", "words", {}, "[]", ".json")
+    saved = os.path.getmtime(store.manifest_path)
+    accessed = manifest(store)[store.key("dQw4w9WgXcQ", "words")]["accessed"]
+
+    os.utime(store.manifest_path, (saved - 10, saved - 10))
+    for _ in range(5):
+        assert store.get("dQw4w9WgXcQ", "words") is not None
+    assert os.path.getmtime(store.manifest_path) == saved - 10
+
+    store.close()
+    entry = manifest(store)[store.key("dQw4w9WgXcQ", "words")]
+    assert entry["accessed"] > accessed
+
+
+def test_pinned_artifacts_are_not_evicted(tmp_path):
+    store = ArtifactStore(str(tmp_path), budget=15)
+    store.put("dQw4w9WgXcQ", "source", {}, b"0123456789", ".mp4")
+
+    with store.pinned("dQw4w9WgXcQ", "source") as path:
+        store.put("9bZkp7q19f0", "source", {}, b"0123456789", ".mp4")
+        store.remove("dQw4w9WgXcQ", "source")
+        assert os.path.exists(path)
+        assert store.get("dQw4w9WgXcQ", "source") == path
+
+    store.put("kJQP7kiw5Fk", "source", {}, b"0123456789", ".mp4")
+    assert not os.path.exists(path)
+    assert store.get("dQw4w9WgXcQ", "source") is None
@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+
+from scraper.channel import (
+    ChannelListingError,
+    extract_channel_id,
+    extract_client_config,
+    extract_initial_data,
+    parse_feed,
+    parse_videos,
+)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def read(name: str) -> str:
+    with open(os.path.join(FIXTURES, name)) as file:
+        return file.read()
+
+
+def test_parse_videos_from_page():
+    videos, continuation = parse_videos(
+        extract_initial_data(read("channel_videos.html"))
+    )
+
+    assert [video.video_id for video in videos] == [
+        "dQw4w9WgXcQ",
+        "9bZkp7q19f0",
+        "kJQP7kiw5Fk",
+    ]
+    assert videos[0].title == "WE SPENT 24 HOURS IN A BOX"
+    assert videos[0].published == "2 days ago"
+    assert videos[1].views == "3.4M views"
+    assert videos[2].length == "18:45"
+    assert continuation == "4qmFsgKlEhhVQ2p"
+
+
+def test_parse_videos_from_continuation():
+    videos, continuation = parse_videos(json.loads(read("browse_continuation.json")))
+
+    assert [video.video_id for video in videos] == ["OPf0YbXqDm0", "dQw4w9WgXcQ"]
+    assert continuation is None
+
+
+def test_client_config():
+    assert extract_client_config(read("channel_videos.html")) == (
+        "AIzaSyFixtureKey",
+        "2.20240101.00.00",
+    )
+
+
+def test_extract_channel_id():
+    data = extract_initial_data(read("channel_videos.html"))
+    assert extract_channel_id(data) == "UCVYamHliCI9rw1tHR1xbkfw"
+    assert extract_channel_id(json.loads(read("browse_continuation.json"))) is None
+
+
+def test_truncated_page():
+    html = read("channel_videos.html")
+    start = html.index("var ytInitialData")
+    # cut inside the JSON but keep the closing script tag the pattern looks for
+    truncated = html[: start + 200] + "};</script></body></html>"
+    with pytest.raises(ChannelListingError):
+        extract_initial_data(truncated)
+
+
+def test_page_without_data():
+    with pytest.raises(ChannelListingError):
+        extract_initial_data("<html><body>consent.youtube.com</body></html>")
+
+
+def test_parse_feed():
+    videos = parse_feed(read("channel_feed.xml"))
+
+    assert [video.video_id for video in videos] == ["dQw4w9WgXcQ", "9bZkp7q19f0"]
+    assert videos[0].title == "WE SPENT 24 HOURS IN A BOX"
+    assert videos[0].published == "2026-10-15T17:00:07+00:00"
+    assert videos[1].views == "3401876"
+
+
+def test_unreadable_feed():
+    with pytest.raises(ChannelListingError):
+        parse_feed(read("channel_feed.xml")[:500])
@@ -0,0 +1,120 @@
+import os
+import re
+import shutil
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from media.download import download_clip_source
+from media.ffmpeg import run_ffmpeg
+
+_RANGE = re.compile(r"bytes=(\d+)-(\d+)")
+
+
+class VideoServer(BaseHTTPRequestHandler):
+    """Serves one file, with or without Range support, and counts the bytes sent."""
+
+    data = b""
+    ranges = True
+    sent = 0
+
+    def do_GET(self):
+        match = _RANGE.match(self.headers.get("Range", ""))
+        if self.ranges and match is not None:
+            start, end = int(match[1]), min(int(match[2]), len(self.data) - 1)
+            body = self.data[start : end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(self.data)}")
+        else:
+            body = self.data
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        # counted first, the client may be done reading before write returns
+        type(self).sent += len(body)
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def video(tmp_path_factory):
+    if shutil.which("ffmpeg") is None:
+        pytest.skip("needs ffmpeg")
+    path = str(tmp_path_factory.mktemp("source") / "source.mp4")
+    run_ffmpeg(
+        ["-f", "lavfi", "-i", "testsrc2=size=640x360:rate=30", "-t", 60]
+        + ["-c:v", "libx264", "-preset", "ultrafast", "-g", 30]
+        + ["-movflags", "+faststart", path]
+    )
+    with open(path, "rb") as file:
+        return file.read()
+
+
+@pytest.fixture
+def serve(video):
+    servers = []
+
+    def start(ranges: bool) -> str:
+        handler = type("Handler", (VideoServer,), {"data": video, "ranges": ranges})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return handler, f"http://127.0.0.1:{server.server_port}/video.mp4"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def test_partial_download(serve, video, tmp_path):
+    handler, url = serve(ranges=True)
+    path = str(tmp_path / "clip.mp4")
+
+    result = download_clip_source(url, path, 30, 35)
+
+    assert result.partial
+    assert result.total_bytes == len(video) == os.path.getsize(path)
+    assert result.fetched_bytes == handler.sent < len(video) / 2
+    with open(path, "rb") as file:
+        # the head with the index is there, the start of the video is a hole
+        assert file.read(1024) == video[:1024]
+
+
+def test_range_ignored_downloads_once(serve, video, tmp_path):
+    handler, url = serve(ranges=False)
+    path = str(tmp_path / "clip.mp4")
+
+    result = download_clip_source(url, path, 30, 35)
+
+    assert not result.partial
+    with open(path, "rb") as file:
+        assert file.read() == video
+    # the 200 answering the first range request is the download, nothing is fetched twice
+    assert handler.sent == len(video)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        # a 64-bit box size cut off after its type
+        b"\x00\x00\x00\x01ftyp",
+        # a box claiming to be shorter than its own header
+        b"\x00\x00\x00\x04ftypisom" + bytes(64),
+    ],
+)
+def test_odd_stream_downloads_in_full(serve, data, tmp_path):
+    handler, url = serve(ranges=True)
+    handler.data = data
+    path = str(tmp_path / "clip.mp4")
+
+    result = download_clip_source(url, path, 30, 35)
+
+    assert not result.partial
+    with open(path, "rb") as file:
+        assert file.read() == data
@@ -0,0 +1,30 @@
+import pytest
+
+from daemon.jobs import JobRequest, JobRequestError
+
+PROFILES = {"fast": {}, "precise": {}}
+
+
+def test_request_for_a_window():
+    request = JobRequest.from_dict(
+        {"url": "https://youtu.be/dQw4w9WgXcQ", "window": ["30", 60]}, PROFILES
+    )
+    assert request.window == (30, 60)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"channel": 42},
+        {"url": ["https://youtu.be/dQw4w9WgXcQ"]},
+        {"channel": "MrBeast", "profile": ["fast"]},
+        {"channel": "MrBeast", "url": "https://youtu.be/dQw4w9WgXcQ"},
+        {"channel": "MrBeast", "window": [0, 30]},
+        {"url": "https://youtu.be/dQw4w9WgXcQ", "window": [60, 30]},
+        {"channel": "MrBeast", "profile": "slow"},
+        {"channel": "MrBeast", "priority": 1},
+    ],
+)
+def test_bad_requests(data):
+    with pytest.raises(JobRequestError):
+        JobRequest.from_dict(data, PROFILES)
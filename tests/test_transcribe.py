@@ -0,0 +1,99 @@
+import asyncio
+import shutil
+
+import pytest
+
+from transcription.chunked import Chunk, plan_chunks, stitch
+from transcription.words import Word
+
+
+def test_short_source_is_one_chunk():
+    assert plan_chunks(100, [(40, 42)], chunk_seconds=600) == [
+        Chunk(0.0, None, 0.0, None)
+    ]
+
+
+def test_split_lands_in_the_nearest_silence():
+    chunks = plan_chunks(
+        2000, [(200, 210), (590, 596), (640, 650)], chunk_seconds=600, overlap=5
+    )
+
+    assert [(chunk.start, chunk.end) for chunk in chunks] == [
+        (0.0, 593.0),
+        (593.0, 1193.0),
+        (1193.0, None),
+    ]
+    assert (chunks[1].read_start, chunks[1].read_end) == (588.0, 1198.0)
+
+
+def test_split_without_silence_near_the_boundary():
+    chunks = plan_chunks(2000, [(100, 110), (900, 910)], chunk_seconds=600)
+
+    assert [chunk.start for chunk in chunks] == [0.0, 600.0, 1200.0]
+
+
+def test_stitch_keeps_overlap_words_once():
+    chunks = plan_chunks(130, [], chunk_seconds=40, overlap=5)
+    assert [chunk.start for chunk in chunks] == [0.0, 40.0, 80.0]
+    heard = [
+        [Word("a", 30, 30.4), Word("b", 39.8, 40.4)],
+        [Word("b", 39.8, 40.4), Word("c", 41, 41.4), Word("d", 79.9, 80.3)],
+        [Word("d", 79.9, 80.3), Word("e", 90, 90.4)],
+    ]
+
+    assert [word.text for word in stitch(chunks, heard)] == ["a", "b", "c", "d", "e"]
+
+
+@pytest.fixture(scope="module")
+def stub_api():
+    pytest.importorskip("openai")
+    if shutil.which("ffmpeg") is None:
+        pytest.skip("needs ffmpeg")
+    from benchmarks.fixtures import serve_stub_openai
+
+    server, base_url = serve_stub_openai()
+    yield base_url
+    server.shutdown()
+
+
+def transcribe(base_url: str, path: str, chunk_seconds: float):
+    from openai import AsyncOpenAI
+
+    from llm.api import OpenAIApi, RateLimit
+    from transcription.service import WHISPER_MODEL, TranscriptService
+
+    async def run():
+        api = OpenAIApi(
+            client=AsyncOpenAI(api_key="stub", base_url=base_url, max_retries=0),
+            limits={WHISPER_MODEL: RateLimit(60000)},
+        )
+        service = TranscriptService(
+            api, store=None, trim_silence=False, chunk_seconds=chunk_seconds
+        )
+        try:
+            return await service.transcribe(path), service.transcriptions
+        finally:
+            await api.close()
+
+    return asyncio.run(run())
+
+
+def test_chunked_transcription_matches_whole(stub_api, tmp_path):
+    from benchmarks.fixtures import WORD_INTERVAL, make_speech
+
+    path = str(tmp_path / "speech.mp3")
+    make_speech(path, 60)
+
+    whole, requests = transcribe(stub_api, path, chunk_seconds=0)
+    assert requests == 1
+    chunked, requests = transcribe(stub_api, path, chunk_seconds=20)
+    assert requests == 3
+
+    # the stub says a word every interval from the start of what it is sent,
+    # so words only line up with the whole file if each chunk's offset is applied
+    assert len(whole) == 60 / WORD_INTERVAL
+    assert [word.start for word in chunked] == pytest.approx(
+        [word.start for word in whole], abs=0.01
+    )
+    # the overlaps were heard twice, each of their words is kept once
+    assert all(a.end <= b.start for a, b in zip(chunked, chunked[1:]))
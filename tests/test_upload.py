@@ -0,0 +1,75 @@
+import asyncio
+import json
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from benchmarks.bench_upload import MockPlatforms
+from uploader.yt_shorts import YouTubeShortsUploader
+
+
+class Platform(MockPlatforms):
+    """The upload mock, also counting the chunks it is sent."""
+
+    chunks = 0
+
+    def do_PUT(self):
+        if not self.headers.get("Content-Range", "").startswith("bytes */"):
+            type(self).chunks += 1
+        super().do_PUT()
+
+
+@pytest.fixture
+def platform():
+    handler = type("Handler", (Platform,), {"sessions": {}})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield handler, f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def upload(base_url: str, state_dir: str, path: str, key: str = None):
+    async def run():
+        uploader = YouTubeShortsUploader(
+            token="mock", base_url=base_url, chunk_size=1024, state_dir=state_dir
+        )
+        try:
+            return await uploader.upload(path, "Short", key)
+        finally:
+            await uploader.close()
+
+    return asyncio.run(run())
+
+
+def test_resume_after_the_last_chunk_landed(platform, tmp_path):
+    handler, base_url = platform
+    path = tmp_path / "short.mp4"
+    path.write_bytes(os.urandom(4096))
+    # the run stopped after the platform took the last chunk, before it answered
+    handler.sessions["done"] = {"kind": "youtube", "size": 4096, "received": 4096}
+    state_dir = tmp_path / "state"
+    uploader = YouTubeShortsUploader(token="mock", state_dir=str(state_dir))
+    with open(uploader._state_path(str(path), "job"), "w") as file:
+        json.dump({"upload_url": f"{base_url}/session/done", "size": 4096}, file)
+
+    result = upload(base_url, str(state_dir), str(path), "job")
+
+    assert result.resumed
+    assert result.post_id.startswith("yt_")
+    assert handler.chunks == 0
+
+
+def test_render_again_is_not_posted_again(platform, tmp_path):
+    handler, base_url = platform
+    path = tmp_path / "short.mp4"
+    path.write_bytes(os.urandom(4096))
+    first = upload(base_url, str(tmp_path), str(path), "job")
+    assert handler.chunks == 4
+
+    path.write_bytes(os.urandom(4096))
+    again = upload(base_url, str(tmp_path), str(path), "job")
+
+    assert again.post_id == first.post_id
+    assert handler.chunks == 4
@@ -0,0 +1,54 @@
+import pytest
+
+from scraper.channel import ChannelPage, ChannelVideo
+from store.videos import VideoIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = VideoIndex(str(tmp_path / "videos.sqlite3"), first_poll_videos=1)
+    yield index
+    index.close()
+
+
+def listing(*video_ids):
+    return [
+        ChannelVideo(video_id, "", "1 day ago", "1,000 views") for video_id in video_ids
+    ]
+
+
+def poll(index, *video_ids):
+    found = index.observe("MrBeast", listing(*video_ids))
+    index.polled(ChannelPage("MrBeast", []), changed=True)
+    return [(video.video_id, reason) for video, reason in found]
+
+
+def test_first_poll_skips_the_backlog(index):
+    assert poll(index, "dQw4w9WgXcQ", "9bZkp7q19f0") == [("dQw4w9WgXcQ", "new")]
+    assert [video.video_id for video in index.pending("MrBeast")] == ["dQw4w9WgXcQ"]
+
+
+def test_unqueued_videos_stay_pending(index):
+    poll(index, "dQw4w9WgXcQ")
+    assert poll(index, "kJQP7kiw5Fk", "dQw4w9WgXcQ") == [("kJQP7kiw5Fk", "new")]
+    assert {video.video_id for video in index.pending("MrBeast")} == {
+        "dQw4w9WgXcQ",
+        "kJQP7kiw5Fk",
+    }
+
+    index.queue("dQw4w9WgXcQ")
+    assert [video.video_id for video in index.pending("MrBeast")] == ["kJQP7kiw5Fk"]
+
+
+def test_failed_observe_records_nothing(index, monkeypatch):
+    def parse_published(published, now, calls=[]):
+        calls.append(published)
+        if len(calls) > 1:
+            raise ValueError(published)
+        return now
+
+    monkeypatch.setattr("store.videos.parse_published", parse_published)
+    with pytest.raises(ValueError):
+        index.observe("MrBeast", listing("dQw4w9WgXcQ", "9bZkp7q19f0"))
+    assert index.stats()["videos"] == 0
+    assert index.stats()["snapshots"] == 0
@@ -0,0 +1,131 @@
+import bisect
+import os
+import re
+from dataclasses import dataclass, field
+
+from logger import log
+from media.ffmpeg import run_ffmpeg
+
+# Whisper resamples to 16 kHz mono anyway, Opus keeps speech clear at low bitrates
+SPEECH_SAMPLE_RATE = 16000
+SPEECH_BITRATE = os.environ.get("SPEECH_BITRATE", "24k")
+TRIM_SILENCE = os.environ.get("TRIM_SILENCE", "0") == "1"
+# pauses longer than SILENCE_DURATION below SILENCE_NOISE are cut, keeping
+# SILENCE_PADDING seconds on both sides so words are not clipped
+SILENCE_NOISE = "-35dB"
+SILENCE_DURATION = 1.0
+SILENCE_PADDING = 0.25
+
+_SILENCE_START = re.compile(r"silence_start: (-?\d+\.?\d*)")
+_SILENCE_END = re.compile(r"silence_end: (-?\d+\.?\d*)")
+
+
+@dataclass
+class TimeMap:
+    """Maps times in the compact audio back onto the original timeline.
+
+    `segments` holds (compact_start, original_start) pairs of the kept parts,
+    sorted by compact_start. Without trimming the map is the identity.
+    """
+
+    segments: list = field(default_factory=lambda: [(0.0, 0.0)])
+
+    def to_original(self, t: float) -> float:
+        i = bisect.bisect_right([s[0] for s in self.segments], t) - 1
+        compact_start, original_start = self.segments[max(i, 0)]
+        return original_start + t - compact_start
+
+
+def _input(path: str, start: float = 0.0, length: float = None) -> list:
+    args = ["-ss", start] if start else []
+    if length is not None:
+        args += ["-t", length]
+    return args + ["-i", path]
+
+
+def detect_silences(path: str, start: float = 0.0, length: float = None):
+    """Returns the (start, end) of every long silence, end is None at the tail.
+
+    Times are relative to `start` when only a part of the file is read.
+    """
+    output = run_ffmpeg(
+        _input(path, start, length)
+        + ["-vn"]
+        + ["-af", f"silencedetect=noise={SILENCE_NOISE}:d={SILENCE_DURATION}"]
+        + ["-f", "null", "-"]
+    )
+    starts = [max(float(t), 0.0) for t in _SILENCE_START.findall(output)]
+    ends = [float(t) for t in _SILENCE_END.findall(output)]
+    return [
+        (start, ends[i] if i < len(ends) else None) for i, start in enumerate(starts)
+    ]
+
+
+def speech_segments(silences: list[tuple], padding: float = SILENCE_PADDING):
+    """Returns the (start, end) parts to keep, end is None for the open tail."""
+    segments = []
+    position = 0.0
+    for start, end in silences:
+        cut_start, cut_end = start + padding, None if end is None else end - padding
+        if cut_end is not None and cut_end <= cut_start:
+            continue
+        if cut_start > position:
+            segments.append((position, cut_start))
+        if cut_end is None:
+            return segments
+        position = cut_end
+    segments.append((position, None))
+    return segments
+
+
+def extract_speech(
+    src: str,
+    dst: str,
+    trim_silence: bool = TRIM_SILENCE,
+    start: float = 0.0,
+    length: float = None,
+) -> TimeMap:
+    """Writes the audio of src to dst as mono low-bitrate Opus for transcription.
+
+    With `trim_silence` long pauses are cut out as well. The returned TimeMap
+    converts timestamps of the transcribed audio back to those of src, also
+    when only `length` seconds from `start` are extracted.
+    """
+    args = _input(src, start, length) + ["-vn", "-ac", 1, "-ar", SPEECH_SAMPLE_RATE]
+    time_map = TimeMap([(0.0, start)])
+
+    if trim_silence:
+        segments = speech_segments(detect_silences(src, start, length))
+        if len(segments) > 1 or segments[0] != (0.0, None):
+            selected = "+".join(
+                (
+                    f"gte(t,{segment_start})"
+                    if segment_end is None
+                    else f"between(t,{segment_start},{segment_end})"
+                )
+                for segment_start, segment_end in segments
+            )
+            args += ["-af", f"aselect='{selected}',asetpts=N/SR/TB"]
+
+            time_map.segments = []
+            compact = 0.0
+            for segment_start, segment_end in segments:
+                time_map.segments.append((compact, start + segment_start))
+                if segment_end is not None:
+                    compact += segment_end - segment_start
+
+    run_ffmpeg(args + ["-c:a", "libopus", "-b:a", SPEECH_BITRATE, dst])
+
+    before, after = os.path.getsize(src), os.path.getsize(dst)
+    if start or length is not None:
+        log.info(
+            f"Compacted {os.path.basename(src)} [{start:.0f}s, +{length or 0:.0f}s] "
+            f"for transcription: {after / 1024:.0f} KB of {before / 1024:.0f} KB"
+        )
+    else:
+        log.info(
+            f"Compacted {os.path.basename(src)} for transcription: "
+            f"{before / 1024:.0f} KB -> {after / 1024:.0f} KB"
+            + (f" ({100 * (1 - after / before):.0f}% less)" if before else "")
+        )
+    return time_map
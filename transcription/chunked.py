@@ -0,0 +1,84 @@
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from transcription.words import Word
+
+# sources longer than this are split into chunks of about this length
+CHUNK_SECONDS = float(os.environ.get("CHUNK_SECONDS", 600))
+# every chunk also reads this much audio of its neighbours on both sides
+CHUNK_OVERLAP = 5.0
+# how far a chunk boundary may move to land in a silence
+SPLIT_SEARCH = 30.0
+TRANSCRIBE_CONCURRENCY = int(os.environ.get("TRANSCRIBE_CONCURRENCY", 4))
+
+
+@dataclass
+class Chunk:
+    """A part of the source. Words in [start, end) belong to it, the audio
+    read for it also covers the overlap into its neighbours."""
+
+    start: float
+    end: Optional[float]
+    read_start: float
+    read_end: Optional[float]
+
+    @property
+    def read_length(self) -> Optional[float]:
+        return None if self.read_end is None else self.read_end - self.read_start
+
+    def owns(self, word: Word) -> bool:
+        middle = (word.start + word.end) / 2
+        return self.start <= middle and (self.end is None or middle < self.end)
+
+
+def _split_point(target: float, silences: list[tuple], search: float) -> float:
+    # the middle of the closest silence, so no word is cut in half
+    middles = [
+        (start + end) / 2
+        for start, end in silences
+        if end is not None and abs((start + end) / 2 - target) <= search
+    ]
+    return min(middles, key=lambda middle: abs(middle - target), default=target)
+
+
+def plan_chunks(
+    duration: float,
+    silences: list[tuple],
+    chunk_seconds: float = CHUNK_SECONDS,
+    overlap: float = CHUNK_OVERLAP,
+    search: float = SPLIT_SEARCH,
+) -> list[Chunk]:
+    """Splits [0, duration] into chunks of about `chunk_seconds`, at silences."""
+    search = min(search, chunk_seconds / 2)
+    boundaries = [0.0]
+    while duration - boundaries[-1] > chunk_seconds * 1.5:
+        boundaries.append(
+            _split_point(boundaries[-1] + chunk_seconds, silences, search)
+        )
+
+    chunks = []
+    for i, start in enumerate(boundaries):
+        end = boundaries[i + 1] if i + 1 < len(boundaries) else None
+        chunks.append(
+            Chunk(
+                start=start,
+                end=end,
+                read_start=max(start - overlap, 0.0),
+                read_end=None if end is None else end + overlap,
+            )
+        )
+    return chunks
+
+
+def stitch(chunks: list[Chunk], words_per_chunk: list[list[Word]]) -> list[Word]:
+    """Joins the words of every chunk, given in source time.
+
+    Words in an overlap are heard by both neighbours; only the chunk the
+    word's middle falls into keeps it, which drops the duplicates.
+    """
+    words = []
+    for chunk, chunk_words in zip(chunks, words_per_chunk):
+        words.extend(word for word in chunk_words if chunk.owns(word))
+    words.sort(key=lambda word: word.start)
+    return words
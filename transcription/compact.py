@@ -0,0 +1,62 @@
+from dataclasses import dataclass
+
+import pysrt
+
+# a span ends at a sentence end, a pause or this length, whichever comes first
+SPAN_SECONDS = 20.0
+SPAN_GAP = 1.0
+SENTENCE_ENDS = (".", "!", "?")
+
+
+@dataclass
+class Span:
+    start: float
+    end: float
+    text: str
+
+
+def _seconds(time: pysrt.SubRipTime) -> float:
+    return time.ordinal / 1000
+
+
+def format_time(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d}"
+
+
+def parse_time(value) -> float:
+    """Reads "m:ss", "h:mm:ss" or plain seconds back into seconds."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    seconds = 0.0
+    for part in str(value).strip().split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def compact_transcript(srt: str) -> list[Span]:
+    """Merges the (often one word) SRT cues into sentence-like spans."""
+    spans = []
+    for cue in pysrt.from_string(srt):
+        text = cue.text.replace("\n", " ").strip()
+        if not text:
+            continue
+        start, end = _seconds(cue.start), _seconds(cue.end)
+
+        last = spans[-1] if spans else None
+        if (
+            last is None
+            or last.text.endswith(SENTENCE_ENDS)
+            or start - last.end > SPAN_GAP
+            or end - last.start > SPAN_SECONDS
+        ):
+            spans.append(Span(start, end, text))
+        else:
+            last.end = end
+            last.text += " " + text
+    return spans
+
+
+def render_spans(spans: list[Span]) -> str:
+    """One line per span, prefixed with its start as a compact time marker."""
+    return "\n".join(f"[{format_time(span.start)}] {span.text}" for span in spans)
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import os
+import tempfile
+
+from llm.api import OpenAIApi
+from logger import log, metrics
+from media.ffmpeg import duration
+from store.artifacts import ArtifactStore
+from transcription.audio import TRIM_SILENCE, detect_silences, extract_speech
+from transcription.chunked import (
+    CHUNK_SECONDS,
+    TRANSCRIBE_CONCURRENCY,
+    Chunk,
+    plan_chunks,
+    stitch,
+)
+from transcription.words import Word, parse_words, slice_words, words_to_srt
+
+WHISPER_MODEL = os.environ.get("WHISPER_MODEL", "whisper-1")
+
+
+class TranscriptService:
+    """Transcribes the audio of every source video once.
+
+    The word-level result is kept in the artifact store and every clip's
+    transcript is sliced out of it, so clips of the same video never go
+    back to Whisper.
+    """
+
+    def __init__(
+        self,
+        api: OpenAIApi,
+        store: ArtifactStore,
+        model: str = WHISPER_MODEL,
+        trim_silence: bool = TRIM_SILENCE,
+        chunk_seconds: float = CHUNK_SECONDS,
+        concurrency: int = TRANSCRIBE_CONCURRENCY,
+    ):
+        self.api = api
+        self.store = store
+        self.model = model
+        self.trim_silence = trim_silence
+        self.chunk_seconds = chunk_seconds
+        self.concurrency = concurrency
+        self.transcriptions = 0
+
+        self._sources = {}
+
+    def audio(self, video_id: str, url: str) -> str:
+        """Returns the path of the source's audio, downloading it if needed."""
+        path = self.store.get(video_id, "audio")
+        if path is not None:
+            return path
+
+        from pytube import YouTube
+
+        log.info(f"Downloading audio of {video_id}")
+        with self.store.writer(video_id, "audio", ext=".mp3") as tmp_path:
+            YouTube(url).streams.filter(only_audio=True).first().download(
+                output_path=os.path.dirname(tmp_path),
+                filename=os.path.basename(tmp_path),
+            )
+        path = self.store.get(video_id, "audio")
+        metrics.count("bytes_downloaded_total", os.path.getsize(path), kind="audio")
+        return path
+
+    async def words(
+        self, video_id: str, url: str = None, audio_path: str = None
+    ) -> list[Word]:
+        """Returns the words of the source, transcribing it on first use."""
+        # one transcription per source even when several clips ask at once
+        lock = self._sources.setdefault(video_id, asyncio.Lock())
+        async with lock:
+            path = self.store.get(video_id, "words", {"model": self.model})
+            if path is not None:
+                with open(path, "r") as file:
+                    return [Word(*word) for word in json.load(file)]
+
+            if audio_path is not None:
+                words = await self.transcribe(audio_path)
+            else:
+                await asyncio.to_thread(self.audio, video_id, url)
+                with self.store.pinned(video_id, "audio") as audio_path:
+                    words = await self.transcribe(audio_path)
+            self.store.put(
+                video_id,
+                "words",
+                {"model": self.model},
+                json.dumps([[w.text, w.start, w.end] for w in words]),
+                ".json",
+            )
+            return words
+
+    async def transcribe(self, audio_path: str) -> list[Word]:
+        """Transcribes a file, in parallel chunks when it is long."""
+        chunks = [Chunk(0.0, None, 0.0, None)]
+        if self.chunk_seconds:
+            length = await asyncio.to_thread(duration, audio_path)
+            if length > self.chunk_seconds * 1.5:
+                silences = await asyncio.to_thread(detect_silences, audio_path)
+                chunks = plan_chunks(length, silences, self.chunk_seconds)
+
+        log.info(f"Transcribing {audio_path} in {len(chunks)} chunk(s)")
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def transcribe_chunk(chunk):
+            async with slots:
+                return await self._transcribe_chunk(audio_path, chunk)
+
+        words_per_chunk = await asyncio.gather(*map(transcribe_chunk, chunks))
+        return stitch(chunks, words_per_chunk)
+
+    async def _transcribe_chunk(self, audio_path: str, chunk: Chunk) -> list[Word]:
+        with tempfile.TemporaryDirectory() as tmp:
+            # only upload the speech, not the video track or full-rate audio
+            speech_path = os.path.join(tmp, "speech.ogg")
+            time_map = await asyncio.to_thread(
+                extract_speech,
+                audio_path,
+                speech_path,
+                self.trim_silence,
+                chunk.read_start,
+                chunk.read_length,
+            )
+            response = await self.api.transcribe(
+                speech_path,
+                self.model,
+                response_format="verbose_json",
+                timestamp_granularities=["word"],
+            )
+        self.transcriptions += 1
+        return [
+            Word(
+                word.text,
+                time_map.to_original(word.start),
+                time_map.to_original(word.end),
+            )
+            for word in parse_words(response)
+        ]
+
+    async def srt(self, video_id: str, url: str = None, audio_path: str = None) -> str:
+        """Returns the transcript of the whole source as SRT."""
+        return words_to_srt(await self.words(video_id, url, audio_path))
+
+    async def clip_srt(
+        self, video_id: str, start: float, end: float, url: str = None
+    ) -> str:
+        """Returns the transcript of [start, end] of the source, timed to the clip."""
+        return words_to_srt(slice_words(await self.words(video_id, url), start, end))
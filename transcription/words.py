@@ -0,0 +1,77 @@
+from dataclasses import dataclass
+
+# a caption shows at most this many words and breaks on longer pauses,
+# one word per cue like the word-by-word subtitles always were
+CUE_WORDS = 1
+CUE_GAP = 0.5
+
+
+@dataclass
+class Word:
+    text: str
+    start: float
+    end: float
+
+
+def _field(item, name):
+    # the SDK hands back objects, raw JSON responses plain dicts
+    return item[name] if isinstance(item, dict) else getattr(item, name)
+
+
+def parse_words(response) -> list[Word]:
+    """Reads the words of a verbose_json transcription with word timestamps."""
+    return [
+        Word(
+            _field(item, "word").strip(),
+            float(_field(item, "start")),
+            float(_field(item, "end")),
+        )
+        for item in _field(response, "words") or []
+    ]
+
+
+def slice_words(words: list[Word], start: float, end: float) -> list[Word]:
+    """Returns the words spoken in [start, end], re-based to start at 0."""
+    length = end - start
+    sliced = []
+    for word in words:
+        if start <= (word.start + word.end) / 2 < end:
+            sliced.append(
+                Word(
+                    word.text,
+                    max(word.start - start, 0.0),
+                    min(word.end - start, length),
+                )
+            )
+    return sliced
+
+
+def _srt_time(seconds: float) -> str:
+    ms = int(round(seconds * 1000))
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}"
+
+
+def words_to_srt(
+    words: list[Word], max_words: int = CUE_WORDS, max_gap: float = CUE_GAP
+) -> str:
+    """Groups the words into short caption cues."""
+    cues = []
+    for word in words:
+        if (
+            len(cues) == 0
+            or len(cues[-1]) >= max_words
+            or word.start - cues[-1][-1].end > max_gap
+        ):
+            cues.append([])
+        cues[-1].append(word)
+
+    blocks = []
+    for i, cue in enumerate(cues, start=1):
+        text = " ".join(word.text for word in cue)
+        blocks.append(
+            f"{i}\n{_srt_time(cue[0].start)} --> {_srt_time(cue[-1].end)}\n{text}\n"
+        )
+    return "\n".join(blocks)
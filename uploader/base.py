@@ -0,0 +1,336 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import aiohttp
+
+from logger import log, metrics, trace
+
+CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_MB", 8)) * 1024 * 1024
+CHUNK_RETRIES = int(os.environ.get("UPLOAD_CHUNK_RETRIES", 5))
+UPLOAD_STATE_DIR = os.environ.get("UPLOAD_STATE_DIR", "uploads")
+RETRY_BASE = 1.0
+RETRY_MAX = 30
+REQUEST_TIMEOUT = 300
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+_RANGE_END = "bytes=0-"
+
+
+class UploadError(Exception):
+    pass
+
+
+class RetryableUploadError(UploadError):
+    pass
+
+
+class UploadExpired(UploadError):
+    """The platform forgot the upload session, it has to start over."""
+
+
+RETRYABLE = (RetryableUploadError, aiohttp.ClientError, asyncio.TimeoutError)
+
+
+@dataclass
+class UploadResult:
+    platform: str
+    path: str
+    post_id: str
+    bytes_sent: int
+    elapsed: float
+    resumed: bool = False
+
+
+def check(response: aiohttp.ClientResponse, *expected: int):
+    if response.status in expected:
+        return
+    error = f"{response.method} {response.url.path} answered {response.status}"
+    if response.status in RETRYABLE_STATUS:
+        raise RetryableUploadError(error)
+    if response.status in (404, 410):
+        raise UploadExpired(error)
+    raise UploadError(error)
+
+
+def committed_offset(response: aiohttp.ClientResponse) -> int:
+    """Reads the next offset out of a `Range: bytes=0-N` header, 0 without one."""
+    committed = response.headers.get("Range", "")
+    if not committed.startswith(_RANGE_END):
+        return 0
+    return int(committed[len(_RANGE_END) :]) + 1
+
+
+class Uploader:
+    """Chunked, resumable upload of a video to one platform.
+
+    The default protocol is the Content-Range one YouTube uses: open a session,
+    PUT the file chunk by chunk and ask the platform for the committed offset
+    after a failure. Platforms override the steps that differ. Open sessions
+    are kept on disk under the key of what is uploaded, so an interrupted run
+    continues where it stopped and a finished upload is never posted twice,
+    even when the file was rendered again in between.
+    """
+
+    name = "platform"
+
+    def __init__(
+        self,
+        token: str,
+        base_url: str,
+        concurrency: int = 2,
+        chunk_size: int = CHUNK_SIZE,
+        retries: int = CHUNK_RETRIES,
+        state_dir: str = UPLOAD_STATE_DIR,
+    ):
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.state_dir = state_dir
+        os.makedirs(state_dir, exist_ok=True)
+
+        self._session = None
+        # per-platform cap, created inside the loop that runs the uploads
+        self._slots = None
+
+        self.uploads = 0
+        self.failed = 0
+        self.resumed = 0
+        self.retried = 0
+        self.bytes_sent = 0
+        self.busy_seconds = 0.0
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency * 2),
+                timeout=aiohttp.ClientTimeout(total=None, sock_read=REQUEST_TIMEOUT),
+                headers={"Authorization": f"Bearer {self.token}"},
+            )
+        return self._session
+
+    # protocol steps
+
+    async def start(self, path: str, title: str, size: int) -> dict:
+        """Opens an upload session, returns what the other steps need."""
+        raise NotImplementedError
+
+    async def offset(self, state: dict, size: int) -> tuple[int, Optional[dict]]:
+        """Asks the platform how many bytes it has, and the answer once complete."""
+        async with self.session.put(
+            state["upload_url"],
+            headers={"Content-Range": f"bytes */{size}", "Content-Length": "0"},
+        ) as response:
+            if response.status in (200, 201):
+                return size, await response.json(content_type=None)
+            check(response, 308)
+            return committed_offset(response), None
+
+    async def send_chunk(
+        self, state: dict, data: bytes, offset: int, size: int
+    ) -> tuple[int, Optional[dict]]:
+        """Sends one chunk, returns the next offset and the answer once complete."""
+        end = offset + len(data) - 1
+        async with self.session.put(
+            state["upload_url"],
+            data=data,
+            headers={"Content-Range": f"bytes {offset}-{end}/{size}"},
+        ) as response:
+            if response.status in (200, 201):
+                return size, await response.json(content_type=None)
+            check(response, 308)
+            return committed_offset(response), None
+
+    async def finish(self, state: dict, answer: dict, title: str) -> str:
+        """Publishes the uploaded video, returns the post id."""
+        return str(answer["id"])
+
+    def chunk_end(self, offset: int, size: int) -> int:
+        return min(offset + self.chunk_size, size)
+
+    # driver
+
+    def _state_path(self, path: str, key: str = None) -> str:
+        if key is None:
+            # nothing names the upload, only this very file is the same one
+            stat = os.stat(path)
+            key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        key = f"{self.name}:{key}"
+        return os.path.join(
+            self.state_dir, hashlib.sha256(key.encode()).hexdigest() + ".json"
+        )
+
+    def _load(self, state_path: str) -> Optional[dict]:
+        try:
+            with open(state_path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, state_path: str, state: dict):
+        tmp = state_path + ".tmp"
+        with open(tmp, "w") as file:
+            json.dump(state, file)
+        os.replace(tmp, state_path)
+
+    @staticmethod
+    def _read(path: str, offset: int, length: int) -> bytes:
+        with open(path, "rb") as file:
+            file.seek(offset)
+            return file.read(length)
+
+    async def _backoff(self, failures: int, what: str, error: Exception):
+        self.retried += 1
+        if failures > self.retries:
+            raise UploadError(f"{self.name} {what} kept failing: {error}") from error
+        delay = min(RETRY_BASE * 2 ** (failures - 1), RETRY_MAX)
+        delay *= random.uniform(0.5, 1.5)
+        log.warn(f"{self.name} {what} failed ({error}), retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+    async def _retrying(self, step, what: str):
+        failures = 0
+        while True:
+            try:
+                return await step()
+            except RETRYABLE as e:
+                failures += 1
+                await self._backoff(failures, what, e)
+
+    async def _transfer(self, path: str, state: dict, state_path: str, size: int):
+        offset = state.get("offset", 0)
+        failures = 0
+        while True:
+            end = self.chunk_end(offset, size)
+            data = await asyncio.to_thread(self._read, path, offset, end - offset)
+            try:
+                next_offset, answer = await self.send_chunk(state, data, offset, size)
+            except RETRYABLE as e:
+                failures += 1
+                await self._backoff(failures, f"chunk at {offset}", e)
+                # part of the chunk may have landed, continue from what the platform has
+                offset, answer = await self._retrying(
+                    lambda: self.offset(state, size), "offset"
+                )
+                if answer is not None:
+                    return answer
+                continue
+
+            failures = 0
+            self.bytes_sent += len(data)
+            metrics.count("bytes_uploaded_total", len(data), platform=self.name)
+            if answer is not None:
+                return answer
+            offset = state["offset"] = next_offset
+            self._save(state_path, state)
+
+    async def _open(self, path: str, title: str, size: int, state_path: str) -> dict:
+        state = await self._retrying(lambda: self.start(path, title, size), "start")
+        state["size"] = size
+        self._save(state_path, state)
+        return state
+
+    async def upload(self, path: str, title: str, key: str = None) -> UploadResult:
+        """Uploads and publishes the video, resuming an earlier attempt if there is one.
+
+        `key` names what is uploaded, like the clip job, the file's path and
+        modification time stand in for it without one.
+        """
+        with trace.span(f"upload.{self.name}", path=path):
+            return await self._upload(path, title, key)
+
+    async def _upload(self, path: str, title: str, key: str = None) -> UploadResult:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        queued = time.time()
+        async with self._slots:
+            started = time.time()
+            size = os.path.getsize(path)
+            sent_before = self.bytes_sent
+            state_path = self._state_path(path, key)
+            state = self._load(state_path)
+
+            if state is not None and "post_id" in state:
+                log.info(f"{self.name} already has {path} as {state['post_id']}")
+                return UploadResult(self.name, path, state["post_id"], 0, 0.0, True)
+            if state is not None and state.get("size") != size:
+                # rendered again since, the open session has the old file's size
+                log.warn(f"{self.name} upload of {path} changed size, starting over")
+                state = None
+            resumed = state is not None
+
+            try:
+                try:
+                    answer = None
+                    if state is None:
+                        state = await self._open(path, title, size, state_path)
+                    else:
+                        self.resumed += 1
+                        state["offset"], answer = await self._retrying(
+                            lambda: self.offset(state, size), "offset"
+                        )
+                        log.info(
+                            f"{self.name} resumes {path} at {state['offset']} bytes"
+                        )
+                    if answer is None:
+                        answer = await self._transfer(path, state, state_path, size)
+                except UploadExpired:
+                    log.warn(f"{self.name} upload session expired, starting over")
+                    state = await self._open(path, title, size, state_path)
+                    answer = await self._transfer(path, state, state_path, size)
+
+                post_id = await self._retrying(
+                    lambda: self.finish(state, answer, title), "publish"
+                )
+            except Exception:
+                self.failed += 1
+                raise
+            finally:
+                self.busy_seconds += time.time() - started
+
+            self._save(state_path, {"post_id": post_id})
+            self.uploads += 1
+            elapsed = time.time() - queued
+            log.info(f"{self.name} posted {title} as {post_id} in {elapsed:.1f}s")
+            return UploadResult(
+                self.name,
+                path,
+                post_id,
+                self.bytes_sent - sent_before,
+                elapsed,
+                resumed,
+            )
+
+    def stats(self) -> dict:
+        return {
+            "uploads": self.uploads,
+            "failed": self.failed,
+            "resumed": self.resumed,
+            "retries": self.retried,
+            "bytes_sent": self.bytes_sent,
+            "throughput_mb_s": (
+                self.bytes_sent / self.busy_seconds / 1e6 if self.busy_seconds else 0.0
+            ),
+        }
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+async def upload_once(uploader: Uploader, path: str, title: str = None) -> UploadResult:
+    """Uploads a single file with a throwaway uploader, for the sync entry points."""
+    title = title or os.path.splitext(os.path.basename(path))[0]
+    try:
+        return await uploader.upload(path, title)
+    finally:
+        await uploader.close()
@@ -0,0 +1,67 @@
+import asyncio
+import os
+from typing import Union
+
+from logger import log
+from uploader.base import Uploader, UploadResult
+from uploader.instagram import (
+    INSTAGRAM_ACCESS_TOKEN,
+    INSTAGRAM_USER_ID,
+    InstagramReelsUploader,
+)
+from uploader.tiktok import TIKTOK_ACCESS_TOKEN, TikTokUploader
+from uploader.yt_shorts import YOUTUBE_ACCESS_TOKEN, YouTubeShortsUploader
+
+
+def uploaders_from_env() -> list[Uploader]:
+    """Every platform that has credentials configured."""
+    uploaders = []
+    if TIKTOK_ACCESS_TOKEN:
+        uploaders.append(TikTokUploader())
+    if YOUTUBE_ACCESS_TOKEN:
+        uploaders.append(YouTubeShortsUploader())
+    if INSTAGRAM_ACCESS_TOKEN and INSTAGRAM_USER_ID:
+        uploaders.append(InstagramReelsUploader())
+    return uploaders
+
+
+class Publisher:
+    """Posts every render to all platforms at once.
+
+    Each uploader caps its own concurrent uploads, so a slow platform queues
+    its renders without holding back the others.
+    """
+
+    def __init__(self, uploaders: list[Uploader]):
+        self.uploaders = uploaders
+
+    @property
+    def platforms(self) -> list[str]:
+        return [uploader.name for uploader in self.uploaders]
+
+    async def publish(
+        self, path: str, title: str, key: str = None
+    ) -> dict[str, Union[UploadResult, Exception]]:
+        """Uploads to every platform, a failed one does not cancel the rest."""
+        results = await asyncio.gather(
+            *(uploader.upload(path, title, key) for uploader in self.uploaders),
+            return_exceptions=True,
+        )
+        for name, result in zip(self.platforms, results):
+            if isinstance(result, Exception):
+                log.error(f"Uploading {path} to {name} failed:", result)
+        return dict(zip(self.platforms, results))
+
+    async def publish_all(self, paths: list[str]) -> list[dict]:
+        return await asyncio.gather(
+            *(
+                self.publish(path, os.path.splitext(os.path.basename(path))[0])
+                for path in paths
+            )
+        )
+
+    def stats(self) -> dict:
+        return {uploader.name: uploader.stats() for uploader in self.uploaders}
+
+    async def close(self):
+        await asyncio.gather(*(uploader.close() for uploader in self.uploaders))
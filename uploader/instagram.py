@@ -0,0 +1,112 @@
+import asyncio
+import os
+import time
+from typing import Optional
+
+from logger import log
+from uploader.base import Uploader, UploadError, check, upload_once
+
+INSTAGRAM_API_URL = os.environ.get(
+    "INSTAGRAM_API_URL", "https://graph.facebook.com/v19.0"
+)
+INSTAGRAM_ACCESS_TOKEN = os.environ.get("INSTAGRAM_ACCESS_TOKEN")
+INSTAGRAM_USER_ID = os.environ.get("INSTAGRAM_USER_ID")
+INSTAGRAM_UPLOADS = int(os.environ.get("INSTAGRAM_UPLOADS", 2))
+# Instagram processes the reel before it can be published
+PROCESSING_POLL = 5
+PROCESSING_TIMEOUT = 600
+
+
+class InstagramReelsUploader(Uploader):
+    """Resumable reel upload through the Instagram Graph API.
+
+    The container is created first, the bytes go to the upload URL it
+    returns with an `offset` header per chunk, and the reel is published
+    once Instagram finished processing it.
+    """
+
+    name = "instagram"
+
+    def __init__(
+        self,
+        token: str = INSTAGRAM_ACCESS_TOKEN,
+        user_id: str = INSTAGRAM_USER_ID,
+        base_url: str = INSTAGRAM_API_URL,
+        concurrency: int = INSTAGRAM_UPLOADS,
+        **kwargs,
+    ):
+        super().__init__(token, base_url, concurrency, **kwargs)
+        self.user_id = user_id
+
+    async def start(self, path: str, title: str, size: int) -> dict:
+        async with self.session.post(
+            f"{self.base_url}/{self.user_id}/media",
+            params={
+                "media_type": "REELS",
+                "upload_type": "resumable",
+                "caption": title,
+            },
+        ) as response:
+            check(response, 200)
+            body = await response.json(content_type=None)
+        return {"upload_url": body["uri"], "container_id": body["id"]}
+
+    def _upload_headers(self) -> dict:
+        return {"Authorization": f"OAuth {self.token}"}
+
+    async def offset(self, state: dict, size: int) -> tuple[int, Optional[dict]]:
+        async with self.session.get(
+            state["upload_url"], headers=self._upload_headers()
+        ) as response:
+            check(response, 200)
+            offset = int((await response.json(content_type=None)).get("offset", 0))
+        return offset, {} if offset == size else None
+
+    async def send_chunk(
+        self, state: dict, data: bytes, offset: int, size: int
+    ) -> tuple[int, Optional[dict]]:
+        async with self.session.post(
+            state["upload_url"],
+            data=data,
+            headers={
+                **self._upload_headers(),
+                "offset": str(offset),
+                "file_size": str(size),
+            },
+        ) as response:
+            check(response, 200)
+        end = offset + len(data)
+        return end, {} if end == size else None
+
+    async def _processed(self, container_id: str):
+        deadline = time.time() + PROCESSING_TIMEOUT
+        while time.time() < deadline:
+            async with self.session.get(
+                f"{self.base_url}/{container_id}", params={"fields": "status_code"}
+            ) as response:
+                check(response, 200)
+                status = (await response.json(content_type=None))["status_code"]
+            if status in ("FINISHED", "PUBLISHED"):
+                return
+            if status in ("ERROR", "EXPIRED"):
+                raise UploadError(f"instagram could not process {container_id}")
+            await asyncio.sleep(PROCESSING_POLL)
+        raise UploadError(f"instagram still processing {container_id}")
+
+    async def finish(self, state: dict, answer: dict, title: str) -> str:
+        await self._processed(state["container_id"])
+        async with self.session.post(
+            f"{self.base_url}/{self.user_id}/media_publish",
+            params={"creation_id": state["container_id"]},
+        ) as response:
+            check(response, 200)
+            return str((await response.json(content_type=None))["id"])
+
+
+@log.logger
+def upload(video_path: str, title: str = None):
+    """This function will upload the video to Instagram Reels."""
+    log.info("Uploading video to Instagram Reels: ", video_path)
+    result = asyncio.run(upload_once(InstagramReelsUploader(), video_path, title))
+    log.info("Video uploaded")
+    return result
@@ -1,10 +1,58 @@
+import asyncio
+import os
+
 from logger import log
-import time
+from uploader.base import Uploader, check, upload_once
+
+YOUTUBE_API_URL = os.environ.get("YOUTUBE_API_URL", "https://www.googleapis.com")
+YOUTUBE_ACCESS_TOKEN = os.environ.get("YOUTUBE_ACCESS_TOKEN")
+YOUTUBE_UPLOADS = int(os.environ.get("YOUTUBE_UPLOADS", 2))
+YOUTUBE_PRIVACY = os.environ.get("YOUTUBE_PRIVACY", "public")
+PEOPLE_AND_BLOGS = "22"
+
+
+class YouTubeShortsUploader(Uploader):
+    """Resumable upload through the YouTube Data API, vertical videos become Shorts."""
+
+    name = "youtube"
+
+    def __init__(
+        self,
+        token: str = YOUTUBE_ACCESS_TOKEN,
+        base_url: str = YOUTUBE_API_URL,
+        concurrency: int = YOUTUBE_UPLOADS,
+        **kwargs,
+    ):
+        super().__init__(token, base_url, concurrency, **kwargs)
+
+    async def start(self, path: str, title: str, size: int) -> dict:
+        async with self.session.post(
+            f"{self.base_url}/upload/youtube/v3/videos",
+            params={"uploadType": "resumable", "part": "snippet,status"},
+            json={
+                "snippet": {
+                    "title": title[:100],
+                    "description": "#shorts",
+                    "categoryId": PEOPLE_AND_BLOGS,
+                },
+                "status": {
+                    "privacyStatus": YOUTUBE_PRIVACY,
+                    "selfDeclaredMadeForKids": False,
+                },
+            },
+            headers={
+                "X-Upload-Content-Length": str(size),
+                "X-Upload-Content-Type": "video/mp4",
+            },
+        ) as response:
+            check(response, 200)
+            return {"upload_url": response.headers["Location"]}
 
 
 @log.logger
-def upload(video_path: str):
+def upload(video_path: str, title: str = None):
     """This function will upload the video to YouTube Shorts."""
     log.info("Uploading video to YouTube Shorts: ", video_path)
-    time.sleep(2)
+    result = asyncio.run(upload_once(YouTubeShortsUploader(), video_path, title))
     log.info("Video uploaded")
+    return result